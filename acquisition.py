@@ -0,0 +1,315 @@
+import heapq
+import os
+import queue
+import threading
+import time
+
+from clock_sync import ClockSync, now, to_epoch
+from instrumentation import metrics
+
+
+class HedgeAcquisition:
+    """Reads every new position packet from a MarvelmindHedge.
+
+    In ``event`` mode the hedge's ultrasound-position callback pushes each
+    packet, stamped with the time.monotonic() it arrived, into a bounded queue that
+    the consumer drains with a blocking get. ``poll`` mode keeps the old
+    behaviour of sampling ``hedge.position()`` on an interval, for library
+    versions without callback support. Both modes drop packets whose beacon
+    timestamp was already seen, so a slow beacon is never recorded twice.
+    """
+
+    MODES = ('event', 'poll')
+
+    def __init__(self, mode='event', poll_interval=0.01, queue_size=4096):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown acquisition mode: {mode}")
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.hedge = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_stamp = {}
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.received = 0     # packets seen from the hedge
+        self.duplicates = 0   # packets discarded because their beacon timestamp repeated
+        self.dropped = 0      # packets lost because the consumer fell behind
+
+    def counters(self):
+        return {
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+        }
+
+    def hedge_kwargs(self):
+        """Extra MarvelmindHedge constructor arguments for the current mode"""
+        if self.mode == 'event':
+            return {'recieveUltrasoundPositionCallback': self.on_position}
+        return {}
+
+    def attach(self, hedge, reset=True):
+        """Read from ``hedge``; counters carry on when ``reset`` is false (reconnects)"""
+        self.hedge = hedge
+        self._last_stamp.clear()
+        if reset:
+            self.reset_counters()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def on_position(self):
+        """Hedge callback, runs on the hedge's reader thread"""
+        hedge = self.hedge
+        if hedge is None:
+            return
+        started = time.perf_counter()
+        stamped = (time.monotonic(), list(hedge.position()))
+        metrics.observe('hedge.position', time.perf_counter() - started)
+        try:
+            self._queue.put_nowait(stamped)
+        except queue.Full:
+            self.dropped += 1
+
+    def _is_new(self, position):
+        # position is [address, x, y, z, angle, timestamp, ...]
+        self.received += 1
+        key = position[0]
+        stamp = position[5]
+        if self._last_stamp.get(key) == stamp:
+            self.duplicates += 1
+            return False
+        self._last_stamp[key] = stamp
+        return True
+
+    def positions(self, keep_running):
+        """Yield (host monotonic time, position) for every new packet while keep_running() is true"""
+        if self.mode == 'event':
+            while keep_running():
+                try:
+                    host_time, position = self._queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                metrics.observe('acquisition.queue_wait', time.monotonic() - host_time)
+                if position and len(position) >= 6 and self._is_new(position):
+                    yield host_time, position
+        else:
+            while keep_running():
+                started = time.perf_counter()
+                position = self.hedge.position() if self.hedge else None
+                metrics.observe('hedge.position', time.perf_counter() - started)
+                if position and len(position) >= 6 and self._is_new(position):
+                    yield time.monotonic(), position
+                time.sleep(self.poll_interval)
+
+
+def device_id(port, address):
+    """Stable id for one hedgehog: its address plus the serial port it is heard on"""
+    return f"{address}@{os.path.basename(port) or port}"
+
+
+class MergedStream:
+    """Merges samples from several acquisition workers into one time-ordered stream.
+
+    Workers push from their own threads; the consumer pops batches in
+    timestamp order, timestamps being on the :func:`clock_sync.now` time
+    base. A sample is released only once it is ``reorder_window`` seconds
+    old, which gives a late packet from a slower worker the chance to be
+    slotted in before newer samples from other devices. ``clock`` is passed
+    through untouched (the workers' (hedge_time, host_time) pair).
+    """
+
+    def __init__(self, reorder_window=0.02, max_pending=65536):
+        self.reorder_window = reorder_window
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._heap = []
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, timestamp, device, position, clock=None):
+        with self._cond:
+            if len(self._heap) >= self.max_pending:
+                self.dropped += 1
+                return
+            heapq.heappush(self._heap, (timestamp, self._seq, device, position, clock))
+            self._seq += 1
+            self._cond.notify()
+
+    def pop_ready(self, timeout=0.2, flush=False):
+        """Return [(timestamp, device, position, clock), ...] that are ready, oldest first"""
+        ready = []
+        with self._cond:
+            if not self._heap:
+                self._cond.wait(timeout)
+            if self._heap and not flush:
+                wait = self._heap[0][0] + self.reorder_window - now()
+                if wait > 0:
+                    self._cond.wait(min(wait, timeout))
+            cutoff = float('inf') if flush else now() - self.reorder_window
+            heap = self._heap
+            while heap and heap[0][0] <= cutoff:
+                timestamp, _, device, position, clock = heapq.heappop(heap)
+                ready.append((timestamp, device, position, clock))
+        return ready
+
+    def clear(self):
+        with self._cond:
+            self._heap.clear()
+
+
+class AcquisitionWorker:
+    """Owns one MarvelmindHedge (one serial port) and feeds a MergedStream.
+
+    Every hedgehog address heard on the port becomes its own device; when
+    ``addresses`` is given, packets from other addresses are ignored.
+
+    The worker is ready once the first new packet arrives, which is when
+    :attr:`ready` is set. If no new packet is seen for ``stall_timeout``
+    seconds, the hedge thread dies or reading raises, the hedge is
+    reopened with exponential backoff (``backoff`` doubling up to
+    ``max_backoff``) until packets flow again. Consumers of the merged
+    stream see only a gap, so a bumped USB cable does not end a collection.
+
+    Samples are timestamped from the beacon clock, mapped onto the host
+    clock by one :class:`clock_sync.ClockSync` per address, rather than from
+    when the host happened to read them. The (hedge_time, host_time) pair
+    behind each timestamp travels with the sample.
+    """
+
+    STATES = ('connecting', 'connected', 'reconnecting', 'stopped')
+
+    def __init__(self, port, merged, addresses=None, mode='event', debug=False,
+                 stall_timeout=3.0, backoff=0.5, max_backoff=10.0):
+        self.port = port
+        self.merged = merged
+        self.addresses = set(addresses) if addresses else None
+        self.debug = debug
+        self.acquisition = HedgeAcquisition(mode=mode)
+        self.stall_timeout = stall_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_factory = None
+        self.hedge = None
+        self.active = False
+        self.thread = None
+        self.state = 'stopped'
+        self.ready = threading.Event()
+        self.last_packet = None     # time.monotonic() of the newest new packet
+        self.ignored = 0            # packets from addresses outside the filter
+        self.reconnects = 0         # hedges reopened after a stall or error
+        self.attempts = 0           # failed attempts since the last packet
+        self.clocks = {}            # address -> ClockSync
+        self._wake = threading.Event()
+
+    def start(self, hedge_factory):
+        self.hedge_factory = hedge_factory
+        self._open_hedge(reset=True)
+        self.active = True
+        self.state = 'connecting'
+        self.last_packet = time.monotonic()
+        self.thread = threading.Thread(target=self.run, name=f"acquisition-{self.port}", daemon=True)
+        self.thread.start()
+        return self
+
+    def _open_hedge(self, reset):
+        try:
+            hedge = self.hedge_factory(tty=self.port, adr=None, debug=self.debug,
+                                       **self.acquisition.hedge_kwargs())
+        except TypeError:
+            # Older marvelmind.py without position callbacks: fall back to polling
+            self.acquisition = HedgeAcquisition(mode='poll')
+            hedge = self.hedge_factory(tty=self.port, adr=None, debug=self.debug)
+        self.acquisition.attach(hedge, reset=reset)
+        hedge.start()
+        self.hedge = hedge
+
+    def _healthy(self):
+        hedge = self.hedge
+        if not self.active or hedge is None:
+            return False
+        if hasattr(hedge, 'is_alive') and not hedge.is_alive():
+            return False
+        return time.monotonic() - self.last_packet < self.stall_timeout
+
+    def run(self):
+        while self.active:
+            try:
+                for host_time, position in self.acquisition.positions(self._healthy):
+                    self.last_packet = time.monotonic()
+                    if not self.ready.is_set() or self.state != 'connected':
+                        self.state = 'connected'
+                        self.attempts = 0
+                        self.ready.set()
+                    address = position[0]
+                    if self.addresses is not None and address not in self.addresses:
+                        self.ignored += 1
+                        continue
+                    sync = self.clocks.get(address)
+                    if sync is None:
+                        sync = self.clocks[address] = ClockSync()
+                    hedge_time, aligned = sync.update(position[5], host_time)
+                    self.merged.push(to_epoch(aligned), device_id(self.port, address), position,
+                                     (hedge_time, host_time))
+            except Exception as e:
+                metrics.incr('acquisition.errors')
+                print(f"Tracking error on {self.port}: {e}")
+            if self.active:
+                self._reconnect()
+
+    def _reconnect(self):
+        """Close the hedge, wait out the backoff, open a fresh one"""
+        self.state = 'reconnecting'
+        hedge = self._close_hedge()
+        if isinstance(hedge, threading.Thread) and hedge is not threading.current_thread():
+            # Let the old reader release the serial port before a new one opens it
+            hedge.join(timeout=5.0)
+        delay = min(self.backoff * 2 ** self.attempts, self.max_backoff)
+        self.attempts += 1
+        print(f"No data from {self.port}; reconnecting in {delay:.1f} s (attempt {self.attempts})")
+        if self._wake.wait(delay) or not self.active:
+            return
+        try:
+            self._open_hedge(reset=False)
+            if not self.active:
+                # stop() ran while the hedge was being opened
+                self._close_hedge()
+                return
+            self.reconnects += 1
+            metrics.incr('acquisition.reconnects')
+        except Exception as e:
+            metrics.incr('acquisition.errors')
+            print(f"Reconnect to {self.port} failed: {e}")
+        # Give the new hedge a full stall_timeout to deliver its first packet
+        self.last_packet = time.monotonic()
+
+    def _close_hedge(self):
+        hedge, self.hedge = self.hedge, None
+        if hedge:
+            hedge.stop()
+        return hedge
+
+    def stop(self):
+        self.active = False
+        self.state = 'stopped'
+        self._wake.set()
+        self._close_hedge()
+
+    def counters(self):
+        counters = self.acquisition.counters()
+        counters['ignored'] = self.ignored
+        counters['reconnects'] = self.reconnects
+        counters['clock_resets'] = sum(sync.resets for sync in self.clocks.values())
+        return counters
+
+    def clock_offsets(self):
+        """{device: (offset, latency)} in seconds from each address's ClockSync"""
+        return {device_id(self.port, address): (sync.offset, sync.latency)
+                for address, sync in list(self.clocks.items()) if sync.offset is not None}
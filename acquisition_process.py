@@ -0,0 +1,256 @@
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+import clock_sync
+from acquisition import AcquisitionWorker, MergedStream, device_id
+from instrumentation import metrics
+from shared_ring import SharedSampleRing
+
+# Seconds between status reports from the acquisition process
+STATUS_INTERVAL = 0.25
+
+
+def _status(workers, merged):
+    return {
+        'workers': {worker.port: {'state': worker.state, 'ready': worker.ready.is_set(),
+                                  'counters': worker.counters(), 'clock_offsets': worker.clock_offsets()}
+                    for worker in workers},
+        'merged_dropped': merged.dropped,
+        'metrics': {key: value for key, value in metrics.snapshot().items() if key in ('counters', 'timings')},
+    }
+
+
+def run_acquisition(ring_name, ports, addresses, mode, debug, hedge_factory, epoch_offset, stop, status):
+    """Body of the acquisition process: one AcquisitionWorker per port, merged into the shared ring"""
+    # Ctrl+C goes to the whole process group; the parent decides when to stop us
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Same time base as the parent even if the system clock was stepped in between
+    clock_sync._EPOCH_OFFSET = epoch_offset
+
+    ring = SharedSampleRing(ring_name)
+    merged = MergedStream()
+    workers = []
+    port_of = {}
+
+    def deliver(batch):
+        for timestamp, device, position, clock in batch:
+            address = position[0]
+            port = port_of.get(device)
+            if port is None:
+                port = port_of[device] = next(i for i, name in enumerate(ports)
+                                              if device_id(name, address) == device)
+            hedge_time, host_time = clock
+            ring.push(timestamp, position[1], position[2], position[3], position[4], position[5],
+                      address, port, hedge_time, host_time)
+
+    try:
+        try:
+            for port in ports:
+                worker = AcquisitionWorker(port, merged, addresses=addresses, mode=mode, debug=debug)
+                workers.append(worker.start(hedge_factory))
+        except Exception as e:
+            status.put(('error', f"{type(e).__name__}: {e}"))
+            return
+        status.put(('started', _status(workers, merged)))
+
+        next_status = time.monotonic() + STATUS_INTERVAL
+        while not stop.is_set():
+            deliver(merged.pop_ready(timeout=0.05))
+            if time.monotonic() >= next_status:
+                status.put(('status', _status(workers, merged)))
+                next_status += STATUS_INTERVAL
+    finally:
+        for worker in workers:
+            worker.stop()
+        deliver(merged.pop_ready(timeout=0, flush=True))
+        status.put(('stopped', _status(workers, merged)))
+        ring.close()
+
+
+class RemoteWorker:
+    """Parent-side view of an AcquisitionWorker running in the acquisition process.
+
+    Offers the attributes TrackerCore reads from a local worker, refreshed
+    from the status reports the process sends.
+    """
+
+    def __init__(self, port, process):
+        self.port = port
+        self.process = process
+        self.hedge = None
+        self.state = 'connecting'
+        self.ready = threading.Event()
+        self._counters = {}
+        self._clock_offsets = {}
+
+    def update(self, status):
+        self.state = status['state']
+        self._counters = status['counters']
+        self._clock_offsets = status['clock_offsets']
+        if status['ready']:
+            self.ready.set()
+
+    def counters(self):
+        return dict(self._counters)
+
+    def clock_offsets(self):
+        return dict(self._clock_offsets)
+
+    def stop(self):
+        self.process.stop()
+
+
+class AcquisitionProcess:
+    """Runs serial reading and timestamping in a child process.
+
+    The child owns the hedges (one AcquisitionWorker per port, merged in
+    timestamp order as usual) and writes every sample into a
+    :class:`shared_ring.SharedSampleRing`, so plotting, saving and the Tk
+    main loop in this process can no longer hold the GIL while a packet
+    waits to be read. :meth:`pop_ready` has the signature of
+    :meth:`acquisition.MergedStream.pop_ready`, and :attr:`workers` stand in
+    for the local workers, so TrackerCore consumes either the same way.
+
+    The ring is polled every ``poll_interval`` seconds while empty; status
+    (worker states, counters, clock offsets, the child's own metrics)
+    arrives over a queue every STATUS_INTERVAL seconds.
+
+    The child is always spawned, never forked: a fork could copy a lock
+    (the metrics registry's, a recorder's) held by one of this process's
+    threads and deadlock on it. ``hedge_factory`` must therefore pickle.
+    """
+
+    def __init__(self, ports, addresses=None, mode='event', debug=False, capacity=65536,
+                 poll_interval=0.002, max_batch=4096):
+        self.ports = list(ports)
+        self.addresses = addresses
+        self.mode = mode
+        self.debug = debug
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self.max_batch = max_batch
+        self.ring = None
+        # Held while the ring is read or freed, so close() can run on any thread
+        self._ring_lock = threading.Lock()
+        self.process = None
+        self.workers = [RemoteWorker(port, self) for port in self.ports]
+        self.child_metrics = {}
+        self._merged_dropped = 0
+        self._ring_dropped = 0      # of the ring, once it is closed
+        self._devices = {}          # (port index, address) -> device id
+        self._stop = None
+        self._status = None
+        self._monitor = None
+
+    def start(self, hedge_factory, timeout=10.0):
+        """Start the process; raises RuntimeError if it cannot open the hedges"""
+        context = multiprocessing.get_context('spawn')
+        self.ring = SharedSampleRing(capacity=self.capacity)
+        self._stop = context.Event()
+        self._status = context.Queue()
+        self.process = context.Process(
+            target=run_acquisition, name="acquisition", daemon=True,
+            args=(self.ring.name, self.ports, self.addresses, self.mode, self.debug, hedge_factory,
+                  clock_sync._EPOCH_OFFSET, self._stop, self._status))
+        self.process.start()
+        try:
+            kind, payload = self._status.get(timeout=timeout)
+        except queue.Empty:
+            kind, payload = 'error', f"no response within {timeout:g} s"
+        if kind == 'error':
+            self._stop.set()
+            self.process.join(timeout=5.0)
+            self.close()
+            raise RuntimeError(f"Acquisition process failed to start: {payload}")
+        self._apply(payload)
+        self._monitor = threading.Thread(target=self._read_status, name="acquisition-status", daemon=True)
+        self._monitor.start()
+        return self
+
+    def _apply(self, status):
+        for worker in self.workers:
+            worker.update(status['workers'][worker.port])
+        self._merged_dropped = status['merged_dropped']
+        self.child_metrics = status['metrics']
+
+    def _read_status(self):
+        while True:
+            try:
+                kind, payload = self._status.get(timeout=0.5)
+            except queue.Empty:
+                if self.process.is_alive():
+                    continue
+                print(f"Acquisition process exited unexpectedly (exit code {self.process.exitcode})")
+                for worker in self.workers:
+                    worker.state = 'stopped'
+                return
+            self._apply(payload)
+            if kind == 'stopped':
+                return
+
+    def pop_ready(self, timeout=0.2, flush=False):
+        """Return [(timestamp, device, position, clock), ...] from the ring, oldest first"""
+        if not flush:
+            deadline = time.monotonic() + timeout
+            while not len(self) and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+        ready = []
+        ports = self.ports
+        devices = self._devices
+        with self._ring_lock:
+            ring = self.ring
+            if ring is None:
+                return ready
+            for view in ring.views(None if flush else self.max_batch):
+                for timestamp, x, y, z, angle, hedge_time, host_time, stamp, address, port in view.tolist():
+                    device = devices.get((port, address))
+                    if device is None:
+                        device = devices[port, address] = device_id(ports[port], address)
+                    ready.append((timestamp, device, [address, x, y, z, angle, stamp], (hedge_time, host_time)))
+                ring.release(len(view))
+        return ready
+
+    def __len__(self):
+        with self._ring_lock:
+            return len(self.ring) if self.ring is not None else 0
+
+    @property
+    def dropped(self):
+        """Samples lost in the child's merge queue or because the ring was full"""
+        with self._ring_lock:
+            ring_dropped = self.ring.dropped if self.ring is not None else self._ring_dropped
+        return self._merged_dropped + ring_dropped
+
+    def clear(self):
+        with self._ring_lock:
+            if self.ring is not None:
+                self.ring.discard()
+
+    def stop(self, timeout=5.0):
+        """Stop the process; samples it still held stay in the ring for :meth:`pop_ready`"""
+        if self.process is None or self._stop.is_set():
+            return
+        self._stop.set()
+        if self._monitor:
+            self._monitor.join(timeout=timeout)
+        self.process.join(timeout=timeout)
+        if self.process.is_alive():
+            print("Acquisition process did not stop; terminating it")
+            self.process.terminate()
+            self.process.join(timeout=1.0)
+        for worker in self.workers:
+            worker.state = 'stopped'
+
+    def close(self):
+        """Free the shared ring, normally once the consumer has drained it; safe to repeat"""
+        with self._ring_lock:
+            ring, self.ring = self.ring, None
+            if ring is None:
+                return
+            self._ring_dropped = ring.dropped
+            if len(ring):
+                print(f"Discarding {len(ring)} samples the tracking thread did not read in time")
+            ring.close()
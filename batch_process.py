@@ -0,0 +1,277 @@
+"""Batch post-processing of saved sessions.
+
+Processes every session file in a directory on a pool of worker processes
+and writes one consolidated output directory:
+
+    sessions.csv      one row of quality metrics per input file
+    label_stats.csv   per (session, label, device) statistics, see label_stats
+    tracks/           tracks resampled to a fixed rate, one raw little-endian
+                      column file per field plus tracks.json; read them with
+                      load_tracks()
+
+Each worker streams its file in chunks, so memory stays bounded by the
+chunk size plus one session's resampled track.
+
+    python batch_process.py sessions/ results/ --workers 8 --resample-hz 10
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import glob
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from label_stats import MAX_INTERVAL, SUMMARY_FIELDNAMES, RunningStats
+from resample import resample
+from sample_store import SampleStore
+from session_format import CHUNK_ROWS, SESSION_EXTENSION, is_sidecar, iter_session_chunks
+
+SESSION_FIELDNAMES = [
+    'session', 'path', 'rows', 'labels', 'devices', 'first_timestamp', 'last_timestamp',
+    'duration_s', 'rate_hz', 'interval_jitter_ms', 'gaps', 'max_gap_s',
+    'repeated_timestamps', 'backward_steps', 'track_rows', 'error',
+]
+
+TRACK_COLUMNS = (
+    ('timestamp', '<f8'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('z', '<f8'),
+    ('session', '<i4'),
+    ('label', '<i4'),
+    ('device', '<i4'),
+)
+
+
+def process_session(path, resample_hz=10.0, chunk_rows=CHUNK_ROWS):
+    """Statistics, quality metrics and resampled tracks for one session file.
+
+    Runs in a worker process; returns plain data that pickles cheaply.
+    """
+    result = {'path': path, 'error': ''}
+    try:
+        step = 1.0 / resample_hz if resample_hz else None
+        stats = {}            # (label, device) -> RunningStats
+        carry = {}            # (label, device) -> last (t, x, y, z)
+        last_device_t = {}    # device -> last timestamp, for quality checks
+        tracks = []
+        rows = 0
+        quality = {'gaps': 0, 'max_gap_s': 0.0, 'repeated_timestamps': 0, 'backward_steps': 0}
+        first_t, last_t = math.inf, -math.inf
+
+        for chunk in iter_session_chunks(path, chunk_rows):
+            t_all = chunk['timestamp']
+            n = len(t_all)
+            rows += n
+            first_t = min(first_t, float(t_all.min()))
+            last_t = max(last_t, float(t_all.max()))
+
+            # Timing quality per device, including the step across the chunk boundary
+            devices = chunk['device_codes']
+            for code in np.unique(devices).tolist():
+                device = chunk['devices'][code]
+                t = t_all[devices == code]
+                previous = last_device_t.get(device)
+                dt = np.diff(t, prepend=previous) if previous is not None else np.diff(t)
+                quality['repeated_timestamps'] += int(np.count_nonzero(dt == 0))
+                quality['backward_steps'] += int(np.count_nonzero(dt < 0))
+                gaps = dt[dt > MAX_INTERVAL]
+                quality['gaps'] += len(gaps)
+                if len(gaps):
+                    quality['max_gap_s'] = max(quality['max_gap_s'], float(gaps.max()))
+                last_device_t[device] = float(t[-1])
+
+            # Group rows by (label, device), keeping file order within a group
+            keys = chunk['label_codes'].astype(np.int64) * 65536 + devices
+            order = np.argsort(keys, kind='stable')
+            bounds = np.flatnonzero(np.diff(keys[order])) + 1
+            for group in np.split(order, bounds):
+                i = group[0]
+                key = (chunk['labels'][chunk['label_codes'][i]], chunk['devices'][devices[i]])
+                sample_type = SampleStore.TYPES[chunk['type_codes'][i]]
+                t, x, y, z = (chunk[name][group] for name in ('timestamp', 'x', 'y', 'z'))
+                if np.any(np.diff(t) < 0):
+                    time_order = np.argsort(t, kind='stable')
+                    t, x, y, z = t[time_order], x[time_order], y[time_order], z[time_order]
+
+                part = RunningStats.from_arrays(t, x, y, z, sample_type)
+                previous = carry.get(key)
+                if key not in stats:
+                    stats[key] = part
+                else:
+                    stats[key].add_interval(t[0] - previous[0])
+                    stats[key].merge(part)
+
+                if step:
+                    if previous is not None:
+                        t, x, y, z = (np.concatenate(([p], v)) for p, v in zip(previous, (t, x, y, z)))
+                    grid, gx, gy, gz = resample(t, x, y, z, step,
+                                                after=previous[0] if previous is not None else None)
+                    if len(grid):
+                        tracks.append((key, grid, gx, gy, gz))
+                carry[key] = (float(t[-1]), float(x[-1]), float(y[-1]), float(z[-1]))
+
+        merged = RunningStats()
+        for part in stats.values():
+            merged.merge(part)
+        duration = last_t - first_t if rows else 0.0
+        result.update(quality)
+        result.update({
+            'rows': rows,
+            'labels': len({label for label, _ in stats}),
+            'devices': len(last_device_t),
+            'first_timestamp': first_t if rows else '',
+            'last_timestamp': last_t if rows else '',
+            'duration_s': duration,
+            'rate_hz': merged.rate_hz,
+            'interval_jitter_ms': merged.interval_jitter * 1000.0,
+            'stats': [(label, device, part.summary()) for (label, device), part in stats.items()],
+            'tracks': tracks,
+        })
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+class ColumnarWriter:
+    """Appends equal-length columns to one raw file each, plus a JSON manifest"""
+
+    def __init__(self, directory, columns):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.columns = columns
+        self.rows = 0
+        self._files = {name: open(os.path.join(directory, f"{name}.bin"), 'wb') for name, _ in columns}
+
+    def append(self, **arrays):
+        n = None
+        for name, dtype in self.columns:
+            values = np.ascontiguousarray(arrays[name], dtype=dtype)
+            n = len(values) if n is None else n
+            if len(values) != n:
+                raise ValueError(f"column {name} has {len(values)} rows, expected {n}")
+            self._files[name].write(values.tobytes())
+        self.rows += n
+
+    def close(self, **tables):
+        for f in self._files.values():
+            f.close()
+        manifest = {'rows': self.rows,
+                    'columns': {name: {'file': f"{name}.bin", 'dtype': dtype} for name, dtype in self.columns}}
+        manifest.update(tables)
+        with open(os.path.join(self.directory, 'tracks.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+
+def load_tracks(directory):
+    """Return (columns, manifest) for a tracks directory; columns are read-only memmaps"""
+    with open(os.path.join(directory, 'tracks.json')) as f:
+        manifest = json.load(f)
+    columns = {}
+    for name, spec in manifest['columns'].items():
+        path = os.path.join(directory, spec['file'])
+        if manifest['rows']:
+            columns[name] = np.memmap(path, dtype=spec['dtype'], mode='r', shape=(manifest['rows'],))
+        else:
+            columns[name] = np.empty(0, dtype=spec['dtype'])
+    return columns, manifest
+
+
+def find_sessions(directory, recursive=False):
+    pattern = os.path.join(directory, '**' if recursive else '', '*')
+    return sorted(path for path in glob.glob(pattern, recursive=recursive)
+                  if path.lower().endswith(('.csv', SESSION_EXTENSION))
+                  and not is_sidecar(path))
+
+
+def run_batch(paths, output_dir, workers=None, resample_hz=10.0, chunk_rows=CHUNK_ROWS):
+    """Process sessions in parallel; returns the number of files that failed"""
+    os.makedirs(output_dir, exist_ok=True)
+    tracks = ColumnarWriter(os.path.join(output_dir, 'tracks'), TRACK_COLUMNS) if resample_hz else None
+    label_index = {}
+    device_index = {}
+    failed = 0
+    started = time.monotonic()
+    workers = workers or os.cpu_count() or 1
+
+    with open(os.path.join(output_dir, 'sessions.csv'), 'w', newline='') as sessions_file, \
+            open(os.path.join(output_dir, 'label_stats.csv'), 'w', newline='') as stats_file, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        sessions_writer = csv.writer(sessions_file)
+        sessions_writer.writerow(SESSION_FIELDNAMES)
+        stats_writer = csv.writer(stats_file)
+        stats_writer.writerow(['session'] + SUMMARY_FIELDNAMES)
+
+        # Keep a bounded number of results in flight so memory does not grow with the file count
+        pending = {}
+        next_index = 0
+        done = 0
+        while next_index < len(paths) or pending:
+            while next_index < len(paths) and len(pending) < 2 * workers:
+                future = pool.submit(process_session, paths[next_index], resample_hz, chunk_rows)
+                pending[future] = next_index
+                next_index += 1
+            finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                session = pending.pop(future)
+                result = future.result()
+                done += 1
+                if result['error']:
+                    failed += 1
+                    print(f"  {result['path']}: {result['error']}")
+                    sessions_writer.writerow([session, result['path']] + [''] * (len(SESSION_FIELDNAMES) - 3)
+                                             + [result['error']])
+                    continue
+
+                track_rows = 0
+                for key, grid, gx, gy, gz in result['tracks'] if tracks else ():
+                    label_code = label_index.setdefault(key[0], len(label_index))
+                    device_code = device_index.setdefault(key[1], len(device_index))
+                    n = len(grid)
+                    tracks.append(timestamp=grid, x=gx, y=gy, z=gz,
+                                  session=np.full(n, session), label=np.full(n, label_code),
+                                  device=np.full(n, device_code))
+                    track_rows += n
+                for label, device, summary in result['stats']:
+                    stats_writer.writerow([session, label, device] + summary)
+                sessions_writer.writerow([session] + [result.get(name, '') for name in SESSION_FIELDNAMES[1:-2]]
+                                         + [track_rows, ''])
+                if done % 100 == 0 or done == len(paths):
+                    print(f"  {done}/{len(paths)} sessions ({time.monotonic() - started:.1f} s)", flush=True)
+
+    if tracks:
+        tracks.close(resample_hz=resample_hz, sessions=paths,
+                     labels=list(label_index), devices=list(device_index))
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-process a directory of Marvelmind sessions")
+    parser.add_argument('input_dir', help="directory with .csv/.mms session files")
+    parser.add_argument('output_dir', help="directory for sessions.csv, label_stats.csv and tracks/")
+    parser.add_argument('--recursive', action='store_true', help="also search subdirectories")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--resample-hz', type=float, default=10.0,
+                        help="rate of the resampled tracks; 0 disables them (default: 10)")
+    parser.add_argument('--chunk-rows', type=int, default=100000,
+                        help="rows parsed at a time per worker (default: 100000)")
+    args = parser.parse_args(argv)
+
+    paths = find_sessions(args.input_dir, args.recursive)
+    if not paths:
+        print(f"No session files found in {args.input_dir}")
+        return 1
+    print(f"Processing {len(paths)} sessions with {args.workers or os.cpu_count()} workers...")
+    failed = run_batch(paths, args.output_dir, args.workers, args.resample_hz, args.chunk_rows)
+    print(f"Done: {len(paths) - failed} processed, {failed} failed. Results in {args.output_dir}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""End-to-end performance benchmarks for the capture pipeline.
+
+Everything runs against SimulatedHedge, so no hardware or display is needed.
+Run from the repository root:
+
+    python benchmarks/bench_capture.py                  # full suite
+    python benchmarks/bench_capture.py --quick          # smaller sizes, shorter runs
+    python benchmarks/bench_capture.py --save base.json
+    python benchmarks/bench_capture.py --compare base.json --tolerance 0.25
+
+With --compare the script exits non-zero when any metric is worse than the
+baseline by more than the tolerance.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ring_buffer import PositionRingBuffer  # noqa: E402
+from sample_store import SampleStore  # noqa: E402
+from session_format import write_session  # noqa: E402
+from simulated_hedge import simulated_hedge_factory  # noqa: E402
+from tracker_core import TrackerCore  # noqa: E402
+
+
+class ManualRoot:
+    """Minimal single-threaded stand-in for Tk's after() event loop"""
+
+    def __init__(self):
+        self._queue = []
+        self._seq = 0
+
+    def after(self, ms, callback):
+        self._seq += 1
+        heapq.heappush(self._queue, (time.monotonic() + ms / 1000.0, self._seq, callback))
+        return self._seq
+
+    def after_cancel(self, after_id):
+        self._queue = [item for item in self._queue if item[1] != after_id]
+        heapq.heapify(self._queue)
+
+    def run_for(self, seconds):
+        end = time.monotonic() + seconds
+        while self._queue and time.monotonic() < end:
+            due, _, callback = heapq.heappop(self._queue)
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            callback()
+
+
+def make_store(count, labels=4):
+    store = SampleStore(initial_capacity=count)
+    t = 1.7e9 + np.arange(count) * 0.01
+    xy = np.cumsum(np.random.default_rng(0).normal(0, 0.01, (count, 3)), axis=0)
+    codes = (np.arange(count) * labels // max(count, 1)).astype(np.int32)
+    store.extend(t, xy[:, 0], xy[:, 1], xy[:, 2], codes,
+                 [f"label_{i}" for i in range(labels)], np.zeros(count, dtype=np.int8))
+    return store
+
+
+def percentile_ms(values, q):
+    return float(np.percentile(np.asarray(values) * 1000.0, q)) if values else float('nan')
+
+
+def bench_process_position(results, quick):
+    """Per-sample cost of the tracking path without threads"""
+    with tempfile.TemporaryDirectory() as session_dir:
+        core = TrackerCore(session_dir=session_dir)
+        core.begin_collection("bench", "dynamic")
+        core.close_recorder()
+        n = 20000 if quick else 200000
+        position = [1, 1.0, 2.0, 0.5, 0.0, 0]
+        start = time.perf_counter()
+        for i in range(n):
+            position[5] = i
+            core.process_position(1.7e9 + i * 0.01, position, "1@sim")
+        elapsed = time.perf_counter() - start
+        results['process_position_us'] = elapsed / n * 1e6
+        results['process_position_per_s'] = n / elapsed
+
+
+def bench_tracking_throughput(results, quick):
+    """Samples/s that reach the store when the simulated hedge runs at 10 Hz .. 1 kHz"""
+    seconds = 2.0 if quick else 5.0
+    for rate in (10, 100, 1000):
+        with tempfile.TemporaryDirectory() as session_dir:
+            core = TrackerCore(session_dir=session_dir)
+            core.hedge_factory = simulated_hedge_factory(rate=rate)
+            connect_started = time.perf_counter()
+            core.connect("sim", debug=False)
+            core.wait_until_ready(timeout=5.0)
+            results[f'connect_{rate}hz_ready_ms'] = (time.perf_counter() - connect_started) * 1000
+            core.begin_collection("bench", "dynamic")
+            # Only count samples generated inside the window, not the connect-time backlog
+            start = time.time()
+            time.sleep(seconds)
+            end = time.time()
+            stamps = core.collected_data.timestamps
+            window = (stamps >= start) & (stamps < end)
+            count = int(np.count_nonzero(window))
+            elapsed = end - start
+            counters = core.acquisition_counters()["sim"]
+            core.shutdown()
+            results[f'tracking_{rate}hz_per_s'] = count / elapsed
+            results[f'tracking_{rate}hz_loss_ratio'] = max(0.0, 1.0 - count / (rate * elapsed))
+            results[f'tracking_{rate}hz_dropped'] = counters['dropped']
+            # Spread of the stored sample intervals; beacon-clock alignment should remove host jitter
+            results[f'tracking_{rate}hz_interval_jitter_us'] = float(np.std(np.diff(stamps[window]))) * 1e6
+
+
+def bench_sample_to_screen(results, quick):
+    """Latency from sample arrival to the blit that shows it"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from render import RenderScheduler
+
+    latencies = []
+
+    class ProbeScheduler(RenderScheduler):
+        def _tick(self):
+            self._probe_batch = list(self.sample_queue)
+            super()._tick()
+
+        def _draw_artists(self):
+            super()._draw_artists()
+            now = time.time()
+            latencies.extend(now - sample[0] for sample in getattr(self, '_probe_batch', ())
+                             if sample[0] >= started)
+            self._probe_batch = ()
+
+    class ProbeCore(TrackerCore):
+        def on_sample(self, timestamp, x, y, z, device):
+            renderer.submit((timestamp, x, y, z, device))
+
+    fig = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    point, = ax.plot([], [], 'ro')
+    trail, = ax.plot([], [], 'b-')
+    ax.set_xlim(-5, 5)
+    ax.set_ylim(-5, 5)
+
+    with tempfile.TemporaryDirectory() as session_dir:
+        core = ProbeCore(session_dir=session_dir)
+
+        def update(samples):
+            view = core.position_history.view()
+            if len(view):
+                point.set_data([view[-1, 1]], [view[-1, 2]])
+                trail.set_data(view[:, 1], view[:, 2])
+            return False
+
+        root = ManualRoot()
+        renderer = ProbeScheduler(root, canvas, [point, trail], update, fps=30)
+        core.hedge_factory = simulated_hedge_factory(rate=100)
+        core.connect("sim", debug=False)
+        started = time.time()
+        renderer.start()
+        root.run_for(2.0 if quick else 5.0)
+        renderer.stop()
+        core.shutdown()
+        results['sample_to_screen_p50_ms'] = percentile_ms(latencies, 50)
+        results['sample_to_screen_p95_ms'] = percentile_ms(latencies, 95)
+        results['frames_per_s'] = renderer.frames_drawn / (2.0 if quick else 5.0)
+
+
+def bench_update_plot(results, quick):
+    """update_plot cost (artist update, and with a full Agg draw) versus history length"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    try:
+        from coverage import CoverageGrid
+        from lod import PointsLOD
+        from tracker_gui import MarvelmindTracker
+    except ImportError as e:
+        print(f"  skipped update_plot benchmark: {e}")
+        return
+
+    class ShowCoverage:
+        def get(self):
+            return True
+
+    class PlotHarness:
+        update_plot = MarvelmindTracker.update_plot
+        update_limits = MarvelmindTracker.update_limits
+        get_device_artists = MarvelmindTracker.get_device_artists
+        update_coverage = MarvelmindTracker.update_coverage
+
+    sizes = (1000, 10000, 50000) if quick else (1000, 10000, 50000, 100000, 1000000)
+    for size in sizes:
+        fig = Figure(figsize=(10, 8))
+        canvas = FigureCanvasAgg(fig)
+        harness = PlotHarness()
+        harness.ax = fig.add_subplot()
+        harness.hedgehog_point, = harness.ax.plot([], [], 'ro')
+        harness.trail_line, = harness.ax.plot([], [], 'b-')
+        harness.collection_points, = harness.ax.plot([], [], 'go')
+        harness.device_artists = {}
+        harness.plot_margin = 0.5
+        harness.max_drawn_vertices = 10000
+        harness.trail_lods = {}
+        harness.points_lod = PointsLOD(harness.max_drawn_vertices)
+        harness.coverage_image = harness.ax.imshow(np.ma.masked_all((1, 1)), origin='lower',
+                                                   extent=(0, 1, 0, 1), zorder=0)
+        harness.coverage_drawn = None
+        harness.show_coverage_var = ShowCoverage()
+        # The live trail is capped by the ring buffer like in TrackerCore; the store is not
+        history = PositionRingBuffer(min(size, 50000))
+        xyz = np.cumsum(np.random.default_rng(1).normal(0, 0.01, (size, 3)), axis=0)
+        for i in range(max(0, size - history.capacity), size):
+            history.append(i * 0.01, xyz[i, 0], xyz[i, 1], xyz[i, 2])
+        harness.device_histories = {"1@sim": history}
+        harness.collected_data = make_store(size)
+        harness.coverage = CoverageGrid.from_store(harness.collected_data)
+
+        repeats = 20
+        start = time.perf_counter()
+        for _ in range(repeats):
+            harness.update_plot()
+        results[f'update_plot_{size}_ms'] = (time.perf_counter() - start) / repeats * 1000
+        results[f'update_plot_{size}_vertices'] = (len(harness.trail_line.get_xdata())
+                                                   + len(harness.collection_points.get_xdata()))
+
+        start = time.perf_counter()
+        for _ in range(5):
+            harness.update_plot()
+            canvas.draw()
+        results[f'update_plot_draw_{size}_ms'] = (time.perf_counter() - start) / 5 * 1000
+
+
+def bench_write(results, quick):
+    """CSV and .mms save time versus session size"""
+    sizes = (10000, 100000) if quick else (10000, 100000, 1000000)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            core = TrackerCore(session_dir=directory)
+            core.collected_data = make_store(size)
+            path = os.path.join(directory, f"bench_{size}.csv")
+            start = time.perf_counter()
+            core.export_csv(path)
+            results[f'write_csv_{size}_s'] = time.perf_counter() - start
+            path = os.path.join(directory, f"bench_{size}.mms")
+            start = time.perf_counter()
+            write_session(path, core.collected_data)
+            results[f'write_mms_{size}_s'] = time.perf_counter() - start
+
+
+def bench_resample(results, quick):
+    """Vectorized uniform-grid resampling of a multi-label session"""
+    from resample import resample_store
+
+    sizes = (100000,) if quick else (100000, 1000000)
+    for size in sizes:
+        store = make_store(size)
+        start = time.perf_counter()
+        resample_store(store, 50.0)
+        results[f'resample_{size}_s'] = time.perf_counter() - start
+
+
+def bench_busy_ui(results, quick):
+    """Packet arrival timing while the main process holds the GIL, as heavy redraws and saves do"""
+    import threading
+
+    seconds = 2.0 if quick else 5.0
+    rate = 200
+    for mode, separate in (('thread', False), ('process', True)):
+        with tempfile.TemporaryDirectory() as session_dir:
+            core = TrackerCore(session_dir=session_dir, acquisition_process=separate)
+            core.hedge_factory = simulated_hedge_factory(rate=rate)
+            core.connect("sim", debug=False)
+            core.wait_until_ready(timeout=5.0)
+            core.begin_collection("bench", "dynamic")
+            busy = threading.Event()
+
+            def hog():
+                values = list(np.random.default_rng(0).random(300000))
+                while not busy.is_set():
+                    sorted(values)  # one long GIL-holding C call, like an Agg redraw
+
+            hogger = threading.Thread(target=hog, daemon=True)
+            hogger.start()
+            time.sleep(seconds)
+            busy.set()
+            hogger.join()
+            core.shutdown()
+            # Host arrival times: late reads show up as intervals longer than 1/rate
+            late = np.abs(np.diff(core.collected_data.column('host_time')) - 1.0 / rate)
+            results[f'busy_ui_{mode}_arrival_p99_ms'] = float(np.percentile(late, 99)) * 1000.0
+            results[f'busy_ui_{mode}_arrival_max_ms'] = float(late.max()) * 1000.0
+            results[f'busy_ui_{mode}_per_s'] = len(core.collected_data) / seconds
+
+
+BENCHMARKS = {
+    'process_position': bench_process_position,
+    'tracking': bench_tracking_throughput,
+    'latency': bench_sample_to_screen,
+    'update_plot': bench_update_plot,
+    'write': bench_write,
+    'resample': bench_resample,
+    'busy_ui': bench_busy_ui,
+}
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages"""
+    regressions = []
+    for metric, value in sorted(results.items()):
+        base = baseline.get(metric)
+        if base is None or not base or metric.endswith(('_dropped', '_loss_ratio', '_vertices')):
+            continue
+        change = (base - value) / base if higher_is_better(metric) else (value - base) / base
+        if change > tolerance:
+            regressions.append(f"{metric}: {base:.4g} -> {value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="smaller sizes and shorter runs")
+    parser.add_argument('--only', choices=sorted(BENCHMARKS), action='append',
+                        help="run only this benchmark (repeatable)")
+    parser.add_argument('--save', help="write results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed relative slowdown before failing (default 0.25)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", flush=True)
+        BENCHMARKS[name](results, args.quick)
+
+    width = max(len(metric) for metric in results) if results else 0
+    for metric, value in sorted(results.items()):
+        print(f"  {metric:<{width}}  {value:12.4f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Results saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Performance regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
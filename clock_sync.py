@@ -0,0 +1,104 @@
+import collections
+import time
+
+# Wall-clock time at monotonic zero, fixed once at startup so that stepping
+# the system clock (NTP, DST fixes, manual changes) cannot reorder samples
+_EPOCH_OFFSET = time.time() - time.monotonic()
+
+
+def now():
+    """POSIX time on the monotonic clock; the time base of aligned sample timestamps"""
+    return _EPOCH_OFFSET + time.monotonic()
+
+
+def to_epoch(monotonic_time):
+    """Convert a time.monotonic() reading to the POSIX time base of :func:`now`"""
+    return _EPOCH_OFFSET + monotonic_time
+
+
+class ClockSync:
+    """Online estimate of a beacon clock's offset from the host monotonic clock.
+
+    Every packet gives ``host - beacon = offset + latency``, where the
+    latency (serial transfer, polling, thread wake-ups) is never negative
+    but varies from packet to packet. The smallest difference seen in the
+    last ``window`` seconds is taken as the offset, so aligned times follow
+    the beacon's own spacing instead of the host's arrival jitter. The
+    estimate rises by at most ``max_slew`` seconds per second, so a minimum
+    leaving the window never steps the timestamps; crystal drift is tracked
+    to within drift * window. When a faster packet shows up it falls by at
+    most ``catch_up`` times the beacon time since the previous packet, fast
+    enough to settle within the first packets but never enough to move an
+    aligned time backwards. Aligned times are additionally clamped to be
+    non-decreasing, even if the beacon stamps are not.
+
+    Beacon timestamps are unsigned 32-bit counts of ``tick`` seconds and are
+    unwrapped. A difference more than ``resync`` seconds above the estimate
+    (beacon restarted, or a reconnect to a fresh clock) starts over.
+    """
+
+    WRAP = 1 << 32
+
+    def __init__(self, window=30.0, max_slew=200e-6, catch_up=0.5, resync=2.0, tick=0.001):
+        if not 0 < catch_up < 1:
+            raise ValueError("catch_up must be between 0 and 1")
+        self.window = window
+        self.max_slew = max_slew
+        self.catch_up = catch_up
+        self.resync = resync
+        self.tick = tick
+        self.resets = 0
+        self._last_aligned = None   # kept across resets, so a device's times never go back
+        self._reset()
+
+    def _reset(self):
+        self.offset = None          # host monotonic time - beacon time, seconds
+        self.latency = 0.0          # of the newest packet, relative to the estimate
+        self._minima = collections.deque()  # (host_time, difference), differences increasing
+        self._last_stamp = None
+        self._wraps = 0
+        self._last_host = None
+        self._last_hedge = None
+
+    def hedge_time(self, stamp):
+        """Beacon timestamp in seconds, continued across 32-bit wraps"""
+        stamp = int(stamp)
+        last = self._last_stamp
+        if last is not None and last - stamp > self.WRAP // 2:
+            self._wraps += 1
+        self._last_stamp = stamp
+        return (stamp + self._wraps * self.WRAP) * self.tick
+
+    def update(self, stamp, host_time):
+        """Feed one packet; returns (hedge_time, aligned time on the host monotonic clock)"""
+        hedge_time = self.hedge_time(stamp)
+        difference = host_time - hedge_time
+        if self.offset is not None and difference - self.offset > self.resync:
+            self.resets += 1
+            self._reset()
+            hedge_time = self.hedge_time(stamp)
+            difference = host_time - hedge_time
+
+        minima = self._minima
+        while minima and minima[-1][1] >= difference:
+            minima.pop()
+        minima.append((host_time, difference))
+        while minima[0][0] < host_time - self.window:
+            minima.popleft()
+
+        target = minima[0][1]
+        if self.offset is None:
+            self.offset = target
+        elif target < self.offset:
+            elapsed = max(hedge_time - self._last_hedge, 0.0)
+            self.offset = max(target, self.offset - self.catch_up * elapsed)
+        else:
+            self.offset = min(target, self.offset + self.max_slew * (host_time - self._last_host))
+        self._last_host = host_time
+        self._last_hedge = hedge_time
+        self.latency = difference - self.offset
+        aligned = hedge_time + self.offset
+        if self._last_aligned is not None and aligned < self._last_aligned:
+            aligned = self._last_aligned
+        self._last_aligned = aligned
+        return hedge_time, aligned
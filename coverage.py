@@ -0,0 +1,200 @@
+import math
+import os
+
+import numpy as np
+
+
+class CoverageGrid:
+    """Dense 2D sample counter over square cells of ``cell_size`` meters.
+
+    Samples are binned as they arrive, so the map never has to be rebuilt
+    from history. The grid starts empty and grows to cover new samples;
+    each growth at least doubles the grown dimension, so the copy cost is
+    amortized O(1) per sample. Cell (row, col) counts samples with
+    ``floor(y / cell_size) == origin_row + row`` and likewise for x.
+
+    Non-finite samples are ignored, and no side grows past ``max_span``
+    cells: a sample further out (usually a glitch) is not binned but
+    counted in :attr:`dropped`, instead of reallocating a huge array.
+    """
+
+    def __init__(self, cell_size=0.1, max_span=2048):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        if max_span <= 0:
+            raise ValueError("max_span must be positive")
+        self.cell_size = float(cell_size)
+        self.max_span = int(max_span)
+        self._layout = 0        # odd while counts and origin are being swapped
+        self.clear()
+
+    def clear(self):
+        self._layout += 1
+        self.counts = np.zeros((0, 0), dtype=np.int32)
+        self.origin_col = 0     # absolute cell index of counts[:, 0]
+        self.origin_row = 0     # absolute cell index of counts[0, :]
+        self.total = 0
+        self.dropped = 0        # samples beyond max_span cells of the others, not binned
+        self.version = 0        # bumped on every change, for cheap redraw checks
+        self._layout += 1
+
+    def __bool__(self):
+        return self.total > 0
+
+    def _reach(self, col_min, col_max, row_min, row_max):
+        """(col_min, col_max, row_min, row_max) of the cell range the grid can cover within max_span"""
+        rows, cols = self.counts.shape
+        if not rows:
+            return (*_reachable(col_min, col_max, col_min, 1, self.max_span),
+                    *_reachable(row_min, row_max, row_min, 1, self.max_span))
+        return (*_reachable(col_min, col_max, self.origin_col, cols, self.max_span),
+                *_reachable(row_min, row_max, self.origin_row, rows, self.max_span))
+
+    def _ensure(self, col_min, col_max, row_min, row_max):
+        """Grow the grid so the absolute cell range is covered"""
+        rows, cols = self.counts.shape
+        if rows and (self.origin_col <= col_min and col_max < self.origin_col + cols
+                     and self.origin_row <= row_min and row_max < self.origin_row + rows):
+            return
+        if rows:
+            new_col0, new_cols = _grown_span(col_min, col_max, self.origin_col, cols, self.max_span)
+            new_row0, new_rows = _grown_span(row_min, row_max, self.origin_row, rows, self.max_span)
+        else:
+            new_col0, new_cols = col_min, col_max - col_min + 1
+            new_row0, new_rows = row_min, row_max - row_min + 1
+        grown = np.zeros((new_rows, new_cols), dtype=np.int32)
+        if rows:
+            r0 = self.origin_row - new_row0
+            c0 = self.origin_col - new_col0
+            grown[r0:r0 + rows, c0:c0 + cols] = self.counts
+        self._layout += 1
+        self.counts = grown
+        self.origin_col = new_col0
+        self.origin_row = new_row0
+        self._layout += 1
+
+    def copy(self):
+        """Independent copy of the counts and their origin"""
+        while True:
+            layout = self._layout
+            counts, origin_col, origin_row = self.counts, self.origin_col, self.origin_row
+            # Retry if another thread grew the grid meanwhile, so the three belong together
+            if layout % 2 == 0 and layout == self._layout:
+                break
+        grid = CoverageGrid(self.cell_size, self.max_span)
+        grid.counts = counts.copy()
+        grid.origin_col, grid.origin_row = origin_col, origin_row
+        grid.total = int(grid.counts.sum())
+        grid.dropped = self.dropped
+        return grid
+
+    def add(self, x, y):
+        """Count one sample, O(1) amortized"""
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return
+        col = math.floor(x / self.cell_size)
+        row = math.floor(y / self.cell_size)
+        col_min, col_max, row_min, row_max = self._reach(col, col, row, row)
+        if not (col_min <= col <= col_max and row_min <= row <= row_max):
+            self.dropped += 1
+            return
+        self._ensure(col, col, row, row)
+        self.counts[row - self.origin_row, col - self.origin_col] += 1
+        self.total += 1
+        self.version += 1
+
+    def add_many(self, x, y):
+        """Count many samples at once (vectorized)"""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        keep = np.isfinite(x) & np.isfinite(y)
+        if not keep.any():
+            return
+        cols = np.floor(x[keep] / self.cell_size).astype(np.int64)
+        rows = np.floor(y[keep] / self.cell_size).astype(np.int64)
+        if not self.counts.size:
+            # Start from the median cell, so a few outliers cannot pull the grid away from the rest
+            col, row = int(np.median(cols)), int(np.median(rows))
+            self._ensure(col, col, row, row)
+        col_min, col_max, row_min, row_max = self._reach(int(cols.min()), int(cols.max()),
+                                                         int(rows.min()), int(rows.max()))
+        reachable = (cols >= col_min) & (cols <= col_max) & (rows >= row_min) & (rows <= row_max)
+        if not reachable.all():
+            self.dropped += len(cols) - int(np.count_nonzero(reachable))
+            cols, rows = cols[reachable], rows[reachable]
+            if not len(cols):
+                return
+        self._ensure(int(cols.min()), int(cols.max()), int(rows.min()), int(rows.max()))
+        height, width = self.counts.shape
+        flat = (rows - self.origin_row) * width + (cols - self.origin_col)
+        self.counts += np.bincount(flat, minlength=height * width).reshape(height, width).astype(np.int32)
+        self.total += len(flat)
+        self.version += 1
+
+    @classmethod
+    def from_store(cls, store, cell_size=0.1, max_span=2048):
+        grid = cls(cell_size, max_span)
+        grid.add_many(store.x, store.y)
+        return grid
+
+    @property
+    def extent(self):
+        """(left, right, bottom, top) in meters, as used by matplotlib's imshow"""
+        rows, cols = self.counts.shape
+        return (self.origin_col * self.cell_size, (self.origin_col + cols) * self.cell_size,
+                self.origin_row * self.cell_size, (self.origin_row + rows) * self.cell_size)
+
+    def covered_area(self):
+        """Area of cells with at least one sample, in square meters"""
+        return int(np.count_nonzero(self.counts)) * self.cell_size ** 2
+
+    def save(self, path):
+        """Write counts, cell size and origin to a compressed .npz file"""
+        np.savez_compressed(path, counts=self.counts, cell_size=self.cell_size,
+                            origin=np.array([self.origin_col, self.origin_row]),
+                            extent=np.array(self.extent))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            grid = cls(float(data['cell_size']))
+            grid.counts = data['counts'].astype(np.int32)
+            grid.origin_col, grid.origin_row = (int(v) for v in data['origin'])
+        grid.total = int(grid.counts.sum())
+        return grid
+
+
+def _reachable(low, high, start, size, limit):
+    """[low, high] narrowed so that together with [start, start + size) it spans at most limit cells"""
+    limit = max(limit, size)
+    low = min(max(low, start + size - limit), start + size - 1)
+    high = max(min(high, start + limit - 1), start)
+    excess = max(high + 1, start + size) - min(low, start) - limit
+    if excess > 0:
+        # Both ends grew; each gives up cells in proportion to how far out it reached
+        below, above = start - low, high - (start + size - 1)
+        cut_low = excess * below // (below + above)
+        low += cut_low
+        high -= excess - cut_low
+    return low, high
+
+
+def _grown_span(low, high, start, size, limit):
+    """(start, size) covering [low, high] and the current span; a grown span at least doubles,
+    up to limit cells"""
+    new_start = min(low, start)
+    new_stop = max(high + 1, start + size)
+    if new_stop - new_start > size:
+        extra = min(2 * size, max(limit, new_stop - new_start)) - (new_stop - new_start)
+        if extra > 0:
+            # Pad on the side that grew, where the next samples are likely to land
+            if new_start < start:
+                new_start -= extra
+            else:
+                new_stop += extra
+    return new_start, new_stop - new_start
+
+
+def coverage_path(data_path):
+    """Coverage file written next to a data file: run1.csv -> run1_coverage.npz"""
+    return f"{os.path.splitext(data_path)[0]}_coverage.npz"
@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+from instrumentation import metrics
+
+# Suffix of a file while an export is writing it
+EXPORT_SUFFIX = '.exporting'
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportJob:
+    """Runs one save on a background thread with progress and cancellation.
+
+    ``work(progress)`` does the writing and calls ``progress(done, total)``
+    between chunks; after :meth:`cancel` the next call raises
+    ExportCancelled, which unwinds ``work``. Tk code polls :attr:`fraction`
+    and :attr:`finished` with ``after()`` instead of waiting on the thread.
+    """
+
+    def __init__(self, work, name="export"):
+        self.work = work
+        self.name = name
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.cancelled = False
+        self.elapsed = None
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def finished(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def wait(self, timeout=None):
+        """Block until the job ends; returns True when it finished in time"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.finished
+
+    def _progress(self, done, total):
+        if self._cancel.is_set():
+            raise ExportCancelled()
+        self.done = done
+        self.total = total
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.work(self._progress)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+            metrics.incr('export.errors')
+            print(f"Export error: {e}")
+        self.elapsed = time.perf_counter() - started
+
+
+def write_atomically(path, write):
+    """Call write(temporary_path), then move the result to ``path``.
+
+    A failed or cancelled export removes its temporary file, so ``path``
+    is never left holding a truncated session.
+    """
+    temporary = path + EXPORT_SUFFIX
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def copy_rows(source, destination, rows, progress=None, chunk_size=1 << 22):
+    """Copy the header and the first ``rows`` lines of a CSV file that may still be growing.
+
+    Stops exactly after the requested line, so rows the writer appends (or
+    is half-way through) while copying are left out. Returns the rows copied.
+    """
+    wanted = rows + 1
+    lines = 0
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while lines < wanted:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            count = chunk.count(b'\n')
+            if lines + count >= wanted:
+                end = -1
+                for _ in range(wanted - lines):
+                    end = chunk.index(b'\n', end + 1)
+                chunk = chunk[:end + 1]
+                count = wanted - lines
+            dst.write(chunk)
+            lines += count
+            if progress:
+                progress(max(lines - 1, 0), rows)
+    return max(lines - 1, 0)
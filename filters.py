@@ -0,0 +1,239 @@
+import argparse
+import collections
+
+import numpy as np
+
+
+def _median(values):
+    """Median of a sorted sequence; the mean of the middle two for even lengths, as np.median"""
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+class OutlierGate:
+    """Median/velocity gate against ultrasonic multipath jumps.
+
+    A sample is rejected when it lies further from the component-wise median
+    of the previous ``window`` raw samples than ``min_jump`` plus the distance
+    the hedgehog could have travelled at ``max_speed`` since the middle of
+    that window. The reference uses raw samples, accepted or not, so the
+    batch form is a plain sliding-window computation and matches the
+    incremental one exactly.
+    """
+
+    def __init__(self, window=5, max_speed=3.0, min_jump=0.3):
+        self.window = window
+        self.max_speed = max_speed
+        self.min_jump = min_jump
+        self.rejected = 0
+        self.reset()
+
+    def reset(self):
+        self._history = collections.deque(maxlen=self.window)
+
+    def update(self, t, xyz):
+        history = self._history
+        accept = True
+        if len(history) == self.window:
+            ref_t, ref_x, ref_y, ref_z = (_median(sorted(column)) for column in zip(*history))
+            dx = xyz[0] - ref_x
+            dy = xyz[1] - ref_y
+            dz = xyz[2] - ref_z
+            allowed = self.min_jump + self.max_speed * max(t - ref_t, 0.0)
+            accept = dx * dx + dy * dy + dz * dz <= allowed * allowed
+        history.append((t, xyz[0], xyz[1], xyz[2]))
+        if not accept:
+            self.rejected += 1
+            return None
+        return xyz
+
+    def batch(self, t, xyz):
+        """Return (xyz, accepted mask) for whole arrays"""
+        n = len(t)
+        mask = np.ones(n, dtype=bool)
+        if n <= self.window:
+            return xyz, mask
+        windows = np.lib.stride_tricks.sliding_window_view
+        # Row i is checked against rows i-window .. i-1
+        ref_t = np.median(windows(t[:-1], self.window), axis=-1)
+        ref_xyz = np.median(windows(xyz[:-1], self.window, axis=0), axis=-1)
+        jump = np.linalg.norm(xyz[self.window:] - ref_xyz, axis=1)
+        allowed = self.min_jump + self.max_speed * np.maximum(t[self.window:] - ref_t, 0.0)
+        mask[self.window:] = jump <= allowed
+        return xyz, mask
+
+
+class KalmanFilterCV:
+    """Constant-velocity Kalman filter, one independent 2-state filter per axis.
+
+    All three axes share the same noise settings and time steps, so they
+    also share one covariance; an update is a handful of float operations.
+    """
+
+    def __init__(self, process_noise=0.5, measurement_noise=0.05):
+        self.q = process_noise          # acceleration noise spectral density, m^2/s^3
+        self.r = measurement_noise ** 2  # measurement variance, m^2
+        self.reset()
+
+    def reset(self):
+        self._t = None
+        self._pos = None
+        self._vel = None
+        self._p = None   # (p00, p01, p11)
+
+    def _predict_and_update(self, dt, pos, vel, p, z):
+        p00, p01, p11 = p
+        q = self.q
+        if dt > 0:
+            pos = [pos[i] + vel[i] * dt for i in range(3)]
+            p00 = p00 + 2 * dt * p01 + dt * dt * p11 + q * dt ** 3 / 3
+            p01 = p01 + dt * p11 + q * dt * dt / 2
+            p11 = p11 + q * dt
+        s = p00 + self.r
+        k0 = p00 / s
+        k1 = p01 / s
+        for i in range(3):
+            innovation = z[i] - pos[i]
+            pos[i] += k0 * innovation
+            vel[i] += k1 * innovation
+        p = ((1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01)
+        return pos, vel, p
+
+    def update(self, t, xyz):
+        if self._t is None:
+            self._t = t
+            self._pos = list(xyz)
+            self._vel = [0.0, 0.0, 0.0]
+            self._p = (self.r, 0.0, 1.0)
+            return tuple(xyz)
+        dt = t - self._t
+        self._t = t
+        self._pos, self._vel, self._p = self._predict_and_update(dt, self._pos, self._vel, self._p, xyz)
+        return tuple(self._pos)
+
+    def batch(self, t, xyz):
+        """Filter whole arrays; returns (filtered xyz, all-True mask)"""
+        out = np.empty_like(xyz, dtype=np.float64)
+        self.reset()
+        rows = xyz.tolist()
+        for i, (ti, row) in enumerate(zip(t.tolist(), rows)):
+            out[i] = self.update(ti, row)
+        return out, np.ones(len(t), dtype=bool)
+
+
+class FilterChain:
+    """Runs samples through filter stages in order; a rejection stops the chain"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.rejected = 0
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def update(self, t, x, y, z):
+        xyz = (x, y, z)
+        for stage in self.stages:
+            xyz = stage.update(t, xyz)
+            if xyz is None:
+                self.rejected += 1
+                return None
+        return xyz
+
+    def batch(self, t, xyz):
+        """Return (filtered xyz with NaN rows for rejections, accepted mask)"""
+        t = np.asarray(t, dtype=np.float64)
+        xyz = np.asarray(xyz, dtype=np.float64)
+        out = np.full_like(xyz, np.nan)
+        index = np.arange(len(t))
+        current_t, current_xyz = t, xyz
+        for stage in self.stages:
+            stage.reset()
+            current_xyz, mask = stage.batch(current_t, current_xyz)
+            index, current_t, current_xyz = index[mask], current_t[mask], current_xyz[mask]
+        out[index] = current_xyz
+        accepted = np.zeros(len(t), dtype=bool)
+        accepted[index] = True
+        return out, accepted
+
+
+FILTER_PRESETS = {
+    'none': lambda: None,
+    'outlier': lambda: FilterChain([OutlierGate()]),
+    'kalman': lambda: FilterChain([KalmanFilterCV()]),
+    'outlier+kalman': lambda: FilterChain([OutlierGate(), KalmanFilterCV()]),
+}
+
+
+def make_filter_chain(name):
+    """Build a fresh FilterChain for a preset name, or None for 'none'"""
+    try:
+        return FILTER_PRESETS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown filter: {name} (choose from {', '.join(FILTER_PRESETS)})")
+
+
+def filter_session(store, name, use_raw=True):
+    """Re-run a filter preset over a SampleStore, per device and in time order.
+
+    Uses the raw_x/raw_y/raw_z columns when present (and ``use_raw``),
+    otherwise x/y/z. Returns (filtered (n, 3) array, accepted mask).
+    """
+    n = len(store)
+    columns = ('raw_x', 'raw_y', 'raw_z') if use_raw and store.has_column('raw_x') else ('x', 'y', 'z')
+    xyz = np.column_stack([store.column(name_) for name_ in columns])
+    t = store.timestamps
+    out = np.full((n, 3), np.nan)
+    accepted = np.zeros(n, dtype=bool)
+    if make_filter_chain(name) is None:
+        return xyz.copy(), np.ones(n, dtype=bool)
+    devices = store.device_codes
+    for code in np.unique(devices):
+        rows = np.flatnonzero(devices == code)
+        rows = rows[np.argsort(t[rows], kind='stable')]
+        filtered, mask = make_filter_chain(name).batch(t[rows], xyz[rows])
+        out[rows] = filtered
+        accepted[rows] = mask
+    return out, accepted
+
+
+def refilter(store, name, use_raw=True):
+    """Return a new SampleStore with filtered x/y/z, raw and clock columns kept and rejected rows dropped"""
+    from sample_store import SampleStore
+
+    filtered, accepted = filter_session(store, name, use_raw)
+    # Raw columns are copied through as they are, whichever columns were filtered
+    raw_names = SampleStore.RAW_COLUMNS if store.has_raw else ('x', 'y', 'z')
+    result = SampleStore(initial_capacity=max(int(accepted.sum()), 1), keep_raw=True,
+                         keep_clock=store.has_clock)
+    clock = tuple(store.column(column)[accepted] for column in SampleStore.CLOCK_COLUMNS) \
+        if store.has_clock else None
+    result.extend(store.timestamps[accepted], filtered[accepted, 0], filtered[accepted, 1],
+                  filtered[accepted, 2], store.label_codes[accepted], store.labels,
+                  store.type_codes[accepted], store.device_codes[accepted], store.devices,
+                  tuple(store.column(column)[accepted] for column in raw_names), clock)
+    return result
+
+
+def main(argv=None):
+    from session_format import load_any, save_any
+
+    parser = argparse.ArgumentParser(description="Re-run a filter over a saved Marvelmind session")
+    parser.add_argument('input', help=".csv or .mms session")
+    parser.add_argument('output', help=".csv or .mms file to write")
+    parser.add_argument('--filter', choices=sorted(FILTER_PRESETS), default='outlier+kalman')
+    parser.add_argument('--use-filtered', action='store_true',
+                        help="filter the stored x/y/z even when raw columns are present")
+    args = parser.parse_args(argv)
+
+    store = load_any(args.input)
+    result = refilter(store, args.filter, use_raw=not args.use_filtered)
+    save_any(args.output, result)
+    print(f"Kept {len(result)} of {len(store)} samples; wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
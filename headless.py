@@ -0,0 +1,98 @@
+import signal
+import sys
+import threading
+import time
+
+from label_stats import format_stats
+from tracker_core import TrackerCore
+
+
+class HeadlessCapture(TrackerCore):
+    """Runs one collection without a display and saves it to a file"""
+
+    def __init__(self, session_dir=None, acquisition_process=False):
+        super().__init__(session_dir=session_dir, acquisition_process=acquisition_process)
+        self.stop_event = threading.Event()
+
+    def run(self, ports, label, collection_type, duration, output, addresses=None):
+        """Connect, collect for ``duration`` seconds (or until Ctrl+C) and save"""
+        def signal_handler(sig, frame):
+            print('\nReceived Ctrl+C, stopping collection...')
+            self.stop_event.set()
+
+        signal.signal(signal.SIGINT, signal_handler)
+
+        print(f"Connecting to {', '.join(ports)}...")
+        self.connect(ports, addresses=addresses or None, debug=False)
+        try:
+            if not self.wait_until_ready(timeout=10.0):
+                waiting = [port for port, state in self.connection_state().items() if state != 'connected']
+                print(f"No data yet from {', '.join(waiting)}; collecting anyway, will keep reconnecting")
+            self.begin_collection(label, collection_type)
+            if duration:
+                print(f"{collection_type.capitalize()} collection '{self.collection_label}' for {duration} seconds")
+            else:
+                print(f"{collection_type.capitalize()} collection '{self.collection_label}' until Ctrl+C")
+
+            # Rewrite one status line on a terminal; piped or logged output gets whole lines
+            interactive = sys.stdout.isatty()
+            deadline = time.monotonic() + duration if duration else None
+            while not self.stop_event.is_set():
+                remaining = deadline - time.monotonic() if deadline else 1.0
+                if remaining <= 0:
+                    break
+                self.stop_event.wait(min(remaining, 1.0))
+                if interactive:
+                    print(f"\rCollected Points: {len(self.collected_data)}", end="", flush=True)
+                else:
+                    print(f"Collected Points: {len(self.collected_data)}", flush=True)
+            if interactive:
+                print()
+
+            count = self.end_collection()
+            print(f"Collection completed. Collected {count} points.")
+            labels = self.collection_labels()
+            for label in labels:
+                stats = self.label_stats.get(label)
+                if stats:
+                    print(f"{label}: {format_stats(stats)}" if len(labels) > 1 else format_stats(stats))
+            if self.zones:
+                counts = self.zones.counters()
+                print(f"Zones: {counts['enter']} entries, {counts['exit']} exits, {counts['dwell']} dwells")
+            if self.coverage:
+                print(f"Covered area: {self.coverage.covered_area():.2f} m^2 "
+                      f"({self.coverage.cell_size} m cells)")
+                if self.coverage.dropped:
+                    print(f"Coverage skipped {self.coverage.dropped} samples too far from the rest.")
+            if self.filter_rejected:
+                print(f"Filter rejected {self.filter_rejected} outlier samples.")
+            if self.collected_data:
+                self.save(output)
+            else:
+                print("No data collected; nothing saved.")
+        finally:
+            self.disconnect()
+            self.shutdown()
+        return 0 if self.collected_data else 1
+
+
+def run_headless(args):
+    capture = HeadlessCapture(session_dir=args.session_dir, acquisition_process=args.acquisition_process)
+    capture.set_filter(args.filter)
+    capture.set_coverage_cell_size(args.coverage_cell)
+    if args.zones:
+        capture.set_zones(args.zones)
+    if args.profile:
+        capture.enable_profiling()
+    if args.publish_udp or args.publish_tcp:
+        capture.start_publisher(udp=args.publish_udp, tcp=args.publish_tcp)
+    if args.simulate or args.replay:
+        from simulated_hedge import simulated_hedge_factory
+        options = {}
+        if args.replay:
+            options['replay'] = args.replay
+        if args.rate:
+            options['rate'] = args.rate
+        capture.hedge_factory = simulated_hedge_factory(**options)
+    return capture.run(args.port, args.label, args.mode, args.duration, args.output,
+                       addresses=args.address)
@@ -0,0 +1,221 @@
+import contextlib
+import cProfile
+import json
+import math
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+class Histogram:
+    """Log-bucketed latency histogram, 4 buckets per decade from 1 us to about 100 s.
+
+    Recording is O(1) and the memory is fixed, so it can sit on per-sample
+    paths; percentiles are accurate to the bucket width (about 78%).
+    """
+
+    BUCKETS_PER_DECADE = 4
+    MIN_SECONDS = 1e-6
+    BUCKET_COUNT = 8 * BUCKETS_PER_DECADE + 1
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds > self.MIN_SECONDS:
+            index = int(math.log10(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_DECADE) + 1
+            index = min(index, self.BUCKET_COUNT - 1)
+        else:
+            index = 0
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def bucket_upper(self, index):
+        return self.MIN_SECONDS * 10 ** (index / self.BUCKETS_PER_DECADE)
+
+    def percentile(self, q):
+        """Approximate q-th percentile in seconds (upper edge of the bucket, capped at max)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Count, mean, min, p50/p95/p99 and max, times in milliseconds"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000,
+            'min_ms': self.min * 1000,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class Metrics:
+    """Thread-safe registry of counters, latency histograms and gauges.
+
+    Counters and histograms are created on first use. Gauges are callables
+    sampled when a snapshot is taken, e.g. queue depths.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Time a block into the histogram ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def gauge(self, name, callback):
+        """Register a zero-argument callable sampled by :meth:`snapshot`"""
+        self.gauges[name] = callback
+
+    def remove_gauge(self, name):
+        self.gauges.pop(name, None)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: h.summary() for name, h in self.histograms.items()}
+        gauges = {}
+        for name, callback in list(self.gauges.items()):
+            try:
+                gauges[name] = callback()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        return {
+            'started': self.started,
+            'uptime_s': time.time() - self.started,
+            'counters': dict(sorted(counters.items())),
+            'gauges': dict(sorted(gauges.items())),
+            'timings': dict(sorted(histograms.items())),
+        }
+
+    def format_table(self):
+        """Human readable multi-line report for the stats panel"""
+        snap = self.snapshot()
+        lines = [f"Uptime: {snap['uptime_s']:.0f} s", "", "Timings (ms)        count     mean      p50      p95      p99      max"]
+        for name, s in snap['timings'].items():
+            if s['count']:
+                lines.append(f"{name:<18}{s['count']:>7}{s['mean_ms']:>9.3f}{s['p50_ms']:>9.3f}"
+                             f"{s['p95_ms']:>9.3f}{s['p99_ms']:>9.3f}{s['max_ms']:>9.3f}")
+        lines += ["", "Counters"]
+        lines += [f"{name:<30}{value:>12}" for name, value in snap['counters'].items()]
+        lines += ["", "Gauges"]
+        lines += [f"{name:<30}{value!s:>12}" for name, value in snap['gauges'].items()]
+        return "\n".join(lines)
+
+    def dump_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2, default=str)
+
+
+# Process-wide registry used by the acquisition, tracking, render and recorder code
+metrics = Metrics()
+
+
+class SessionProfiler:
+    """Optional cProfile + tracemalloc capture for one session.
+
+    cProfile only sees the thread that enabled it, so every thread of
+    interest calls :meth:`profile_current_thread`; :meth:`stop` merges all
+    of them into one ``.prof`` file (open with pstats or snakeviz) and
+    writes the top memory allocation sites to a text file.
+    """
+
+    def __init__(self, directory, prefix="profile"):
+        self.directory = directory
+        self.prefix = prefix
+        self._profiles = []
+        self._lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tracemalloc.start(10)
+        self.running = True
+        self.profile_current_thread()
+        return self
+
+    def profile_current_thread(self):
+        if not self.running:
+            return
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def stop(self):
+        """Stop profiling; returns the (stats path, memory path) written"""
+        if not self.running:
+            return None
+        self.running = False
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        for profile in profiles:
+            profile.disable()
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        stats_path = os.path.join(self.directory, f"{self.prefix}_{stamp}.prof")
+        stats = None
+        for profile in profiles:
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        if stats is not None:
+            stats.dump_stats(stats_path)
+
+        memory_path = os.path.join(self.directory, f"{self.prefix}_{stamp}_memory.txt")
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(memory_path, 'w') as f:
+            f.write(f"Current traced memory: {current / 1e6:.1f} MB, peak: {peak / 1e6:.1f} MB\n\n")
+            for stat in snapshot.statistics('lineno')[:30]:
+                f.write(f"{stat}\n")
+        return stats_path, memory_path
@@ -0,0 +1,269 @@
+import csv
+import math
+import os
+
+import numpy as np
+
+# Gaps longer than this (e.g. between two collections under one label) are not
+# counted as sample intervals
+MAX_INTERVAL = 1.0
+
+SUMMARY_FIELDNAMES = [
+    'label', 'device', 'type', 'count', 'first_timestamp', 'last_timestamp',
+    'mean_x', 'mean_y', 'mean_z', 'std_x', 'std_y', 'std_z', 'cov_xy',
+    'min_x', 'max_x', 'min_y', 'max_y', 'min_z', 'max_z',
+    'cep50', 'drms2', 'rate_hz', 'interval_jitter_ms',
+]
+
+
+class RunningStats:
+    """Welford-style running statistics for one label/device.
+
+    Keeps count, mean and co-moments of x/y/z, bounding box and the mean and
+    spread of sample intervals. Every update is O(1) and numerically stable;
+    two instances can be combined with :meth:`merge`.
+    """
+
+    def __init__(self, sample_type="static"):
+        self.sample_type = sample_type
+        self.n = 0
+        self.mean = [0.0, 0.0, 0.0]
+        # Co-moments: xx, yy, zz, xy
+        self.m2 = [0.0, 0.0, 0.0, 0.0]
+        self.min = [math.inf, math.inf, math.inf]
+        self.max = [-math.inf, -math.inf, -math.inf]
+        self.first_t = None
+        self.last_t = None
+        self.intervals = 0
+        self.interval_mean = 0.0
+        self.interval_m2 = 0.0
+
+    def update(self, t, x, y, z):
+        self.n += 1
+        n = self.n
+        mean = self.mean
+        dx = x - mean[0]
+        dy = y - mean[1]
+        dz = z - mean[2]
+        mean[0] += dx / n
+        mean[1] += dy / n
+        mean[2] += dz / n
+        m2 = self.m2
+        m2[0] += dx * (x - mean[0])
+        m2[1] += dy * (y - mean[1])
+        m2[2] += dz * (z - mean[2])
+        m2[3] += dx * (y - mean[1])
+
+        lo, hi = self.min, self.max
+        for i, value in enumerate((x, y, z)):
+            if value < lo[i]:
+                lo[i] = value
+            if value > hi[i]:
+                hi[i] = value
+
+        if self.first_t is None:
+            self.first_t = t
+        else:
+            self.add_interval(t - self.last_t)
+        self.last_t = t
+
+    def add_interval(self, dt):
+        """Count one sample interval; gaps and non-positive steps are ignored"""
+        if 0 < dt <= MAX_INTERVAL:
+            self.intervals += 1
+            delta = dt - self.interval_mean
+            self.interval_mean += delta / self.intervals
+            self.interval_m2 += delta * (dt - self.interval_mean)
+
+    @classmethod
+    def from_arrays(cls, t, x, y, z, sample_type="static"):
+        """Build statistics for whole columns at once (rows in time order)"""
+        stats = cls(sample_type)
+        n = len(t)
+        if n == 0:
+            return stats
+        xyz = np.column_stack((x, y, z))
+        stats.n = n
+        mean = xyz.mean(axis=0)
+        centered = xyz - mean
+        stats.mean = mean.tolist()
+        stats.m2 = [float(np.dot(centered[:, 0], centered[:, 0])),
+                    float(np.dot(centered[:, 1], centered[:, 1])),
+                    float(np.dot(centered[:, 2], centered[:, 2])),
+                    float(np.dot(centered[:, 0], centered[:, 1]))]
+        stats.min = xyz.min(axis=0).tolist()
+        stats.max = xyz.max(axis=0).tolist()
+        stats.first_t = float(t[0])
+        stats.last_t = float(t[-1])
+        dt = np.diff(t)
+        dt = dt[(dt > 0) & (dt <= MAX_INTERVAL)]
+        if len(dt):
+            stats.intervals = len(dt)
+            stats.interval_mean = float(dt.mean())
+            stats.interval_m2 = float(((dt - stats.interval_mean) ** 2).sum())
+        return stats
+
+    def merge(self, other):
+        """Fold another RunningStats into this one (Chan et al. pairwise update)"""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n = other.n
+            self.mean = list(other.mean)
+            self.m2 = list(other.m2)
+            self.min = list(other.min)
+            self.max = list(other.max)
+            self.first_t, self.last_t = other.first_t, other.last_t
+            self.intervals = other.intervals
+            self.interval_mean, self.interval_m2 = other.interval_mean, other.interval_m2
+            return self
+        n = self.n + other.n
+        delta = [b - a for a, b in zip(self.mean, other.mean)]
+        factor = self.n * other.n / n
+        self.m2 = [self.m2[0] + other.m2[0] + delta[0] * delta[0] * factor,
+                   self.m2[1] + other.m2[1] + delta[1] * delta[1] * factor,
+                   self.m2[2] + other.m2[2] + delta[2] * delta[2] * factor,
+                   self.m2[3] + other.m2[3] + delta[0] * delta[1] * factor]
+        self.mean = [a + d * other.n / n for a, d in zip(self.mean, delta)]
+        self.n = n
+        self.min = [min(a, b) for a, b in zip(self.min, other.min)]
+        self.max = [max(a, b) for a, b in zip(self.max, other.max)]
+        self.first_t = min(self.first_t, other.first_t)
+        self.last_t = max(self.last_t, other.last_t)
+        if other.intervals:
+            count = self.intervals + other.intervals
+            delta_t = other.interval_mean - self.interval_mean
+            self.interval_m2 += other.interval_m2 + delta_t * delta_t * self.intervals * other.intervals / count
+            self.interval_mean += delta_t * other.intervals / count
+            self.intervals = count
+        return self
+
+    @property
+    def variance(self):
+        """Sample variances (x, y, z)"""
+        if self.n < 2:
+            return (0.0, 0.0, 0.0)
+        return tuple(value / (self.n - 1) for value in self.m2[:3])
+
+    @property
+    def std(self):
+        return tuple(math.sqrt(max(value, 0.0)) for value in self.variance)
+
+    @property
+    def cov_xy(self):
+        return self.m2[3] / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def cep50(self):
+        """Horizontal circular error probable (50%), elliptical approximation"""
+        std = self.std
+        return 0.5887 * (std[0] + std[1])
+
+    @property
+    def drms2(self):
+        """Twice the horizontal distance RMS (about 95% of fixes)"""
+        std = self.std
+        return 2.0 * math.sqrt(std[0] ** 2 + std[1] ** 2)
+
+    @property
+    def rate_hz(self):
+        return 1.0 / self.interval_mean if self.interval_mean > 0 else 0.0
+
+    @property
+    def interval_jitter(self):
+        """Standard deviation of the sample interval, seconds"""
+        if self.intervals < 2:
+            return 0.0
+        return math.sqrt(max(self.interval_m2 / (self.intervals - 1), 0.0))
+
+    def summary(self):
+        """Summary values in SUMMARY_FIELDNAMES order, from 'type' onwards"""
+        std = self.std
+        return [self.sample_type, self.n, self.first_t, self.last_t,
+                *self.mean, *std, self.cov_xy,
+                self.min[0], self.max[0], self.min[1], self.max[1], self.min[2], self.max[2],
+                self.cep50, self.drms2, self.rate_hz, self.interval_jitter * 1000.0]
+
+
+class LabelStatistics:
+    """Running statistics for every (label, device) pair of a session"""
+
+    def __init__(self):
+        self.stats = {}
+
+    def __len__(self):
+        return len(self.stats)
+
+    def __bool__(self):
+        return bool(self.stats)
+
+    def clear(self):
+        self.stats = {}
+
+    def update(self, label, device, sample_type, t, x, y, z):
+        stats = self.stats.get((label, device))
+        if stats is None:
+            stats = self.stats[(label, device)] = RunningStats(sample_type)
+        stats.update(t, x, y, z)
+
+    def copy(self):
+        """Independent copy, e.g. to write a summary while updates continue"""
+        result = LabelStatistics()
+        result.stats = {key: RunningStats(stats.sample_type).merge(stats)
+                        for key, stats in list(self.stats.items())}
+        return result
+
+    def get(self, label, device=None):
+        """Statistics for a label; with device=None, all devices merged"""
+        if device is not None:
+            return self.stats.get((label, device))
+        merged = None
+        for (key_label, _), stats in list(self.stats.items()):
+            if key_label == label:
+                if merged is None:
+                    merged = RunningStats(stats.sample_type)
+                merged.merge(stats)
+        return merged
+
+    @classmethod
+    def from_store(cls, store):
+        """Compute statistics for a whole SampleStore in one vectorized pass per group"""
+        result = cls()
+        if not store:
+            return result
+        keys = store.label_codes.astype(np.int64) * 65536 + store.device_codes
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for rows in np.split(order, bounds):
+            first = rows[0]
+            label = store.labels[store.label_codes[first]]
+            device = store.devices[store.device_codes[first]]
+            sample_type = store.TYPES[store.type_codes[first]]
+            rows = rows[np.argsort(store.timestamps[rows], kind='stable')]
+            result.stats[(label, device)] = RunningStats.from_arrays(
+                store.timestamps[rows], store.x[rows], store.y[rows], store.z[rows], sample_type)
+        return result
+
+    def summary_rows(self):
+        return [[label, device, *stats.summary()] for (label, device), stats in list(self.stats.items())]
+
+    def write_summary(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(SUMMARY_FIELDNAMES)
+            writer.writerows(self.summary_rows())
+
+
+def format_stats(stats):
+    """One-line human readable summary for status displays"""
+    mean, std = stats.mean, stats.std
+    return (f"n={stats.n}  mean=({mean[0]:.3f}, {mean[1]:.3f}, {mean[2]:.3f}) m  "
+            f"std=({std[0] * 100:.1f}, {std[1] * 100:.1f}, {std[2] * 100:.1f}) cm  "
+            f"CEP50={stats.cep50 * 100:.1f} cm  rate={stats.rate_hz:.1f} Hz "
+            f"(jitter {stats.interval_jitter * 1000:.1f} ms)")
+
+
+def summary_path(data_path):
+    """Summary file name written next to a data file: run1.csv -> run1_summary.csv"""
+    return f"{os.path.splitext(data_path)[0]}_summary.csv"
@@ -0,0 +1,169 @@
+import numpy as np
+
+
+class _PixelGrid:
+    """Maps data coordinates to integer cells of about ``scale`` screen pixels"""
+
+    def __init__(self, x0, x1, y0, y1, width_px, height_px, scale):
+        self.x0 = x0
+        self.y0 = y0
+        self.cell_w = max((x1 - x0) / max(width_px, 1), 1e-12) * scale
+        self.cell_h = max((y1 - y0) / max(height_px, 1), 1e-12) * scale
+        self.nx = int(np.ceil((x1 - x0) / self.cell_w)) + 1
+        self.ny = int(np.ceil((y1 - y0) / self.cell_h)) + 1
+
+    def cells(self, x, y):
+        """Integer (cx, cy) cell coordinates; cells outside the view are allowed"""
+        cx = np.floor((np.asarray(x) - self.x0) / self.cell_w).astype(np.int64)
+        cy = np.floor((np.asarray(y) - self.y0) / self.cell_h).astype(np.int64)
+        return cx, cy
+
+
+class _LevelOfDetail:
+    """Shared view/budget bookkeeping of the decimators below"""
+
+    def __init__(self, max_vertices=10000):
+        self.max_vertices = max_vertices
+        self.view = None
+        self.scale = 1
+        self.rebuilds = 0
+        self._reset()
+
+    def set_view(self, x0, x1, y0, y1, width_px, height_px):
+        """Describe the visible data range and its size in pixels; a change forces a rebuild"""
+        view = (float(x0), float(x1), float(y0), float(y1), int(width_px), int(height_px))
+        if view != self.view:
+            self.view = view
+            self.scale = 1
+            self._reset()
+
+    def invalidate(self):
+        self._reset()
+
+    def _grid(self):
+        return _PixelGrid(*self.view, self.scale)
+
+
+class PolylineLOD(_LevelOfDetail):
+    """Pixel-grid decimation of a growing polyline, e.g. a movement trail.
+
+    A vertex is only kept when it falls in a different screen cell than the
+    previously kept one, so the drawn line is unchanged at pixel precision.
+    New samples are processed incrementally; the cells are recomputed when
+    the view changes (zoom, pan, resize). If the kept vertices exceed
+    ``max_vertices`` the cells are doubled in size until they fit, which
+    bounds the drawn vertex count regardless of session length.
+
+    Sources are addressed by absolute sequence numbers so ring buffers that
+    drop their oldest samples can be decimated incrementally too.
+    """
+
+    def _reset(self):
+        self._seen = None      # sequence number of the next unprocessed sample
+        self._seq = np.empty(0, dtype=np.int64)
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+        self._last_cell = None
+
+    def update(self, x, y, first_seq=0):
+        """Return decimated (x, y) for the source samples ``x``/``y``.
+
+        ``first_seq`` is the sequence number of ``x[0]``; sources that only
+        grow can leave it at 0.
+        """
+        n = len(x)
+        if self.view is None or n == 0:
+            return x, y
+        end_seq = first_seq + n
+        if self._seen is None or self._seen > end_seq or self._seen < first_seq:
+            # First call, source cleared, or samples dropped that were never seen
+            self._reset()
+            self._seen = first_seq
+            self.rebuilds += 1
+
+        start = self._seen - first_seq
+        if start < n:
+            self._append(x[start:], y[start:], self._seen)
+            self._seen = end_seq
+            while len(self._x) > self.max_vertices:
+                self.scale *= 2
+                self._reset()
+                self._seen = first_seq
+                self._append(x, y, first_seq)
+                self._seen = end_seq
+                self.rebuilds += 1
+
+        if len(self._seq) and self._seq[0] < first_seq:
+            keep = np.searchsorted(self._seq, first_seq)
+            self._seq, self._x, self._y = self._seq[keep:], self._x[keep:], self._y[keep:]
+
+        # Always end the line at the newest sample
+        if not len(self._seq) or self._seq[-1] != end_seq - 1:
+            return np.append(self._x, x[-1]), np.append(self._y, y[-1])
+        return self._x, self._y
+
+    def _append(self, x, y, seq):
+        cx, cy = self._grid().cells(x, y)
+        keys = cx * (1 << 32) + cy
+        keep = np.empty(len(keys), dtype=bool)
+        keep[0] = keys[0] != self._last_cell
+        keep[1:] = keys[1:] != keys[:-1]
+        self._last_cell = int(keys[-1])
+        index = np.flatnonzero(keep)
+        self._seq = np.concatenate((self._seq, index + seq))
+        self._x = np.concatenate((self._x, np.asarray(x)[index]))
+        self._y = np.concatenate((self._y, np.asarray(y)[index]))
+
+
+class PointsLOD(_LevelOfDetail):
+    """Keeps one marker per occupied screen cell of a growing point cloud.
+
+    Points outside the view are skipped (they are not visible), so the
+    result is bounded by the number of cells; the occupancy grid is updated
+    incrementally and rebuilt when the view changes.
+    """
+
+    def _reset(self):
+        self._seen = 0
+        self._occupied = None
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+
+    def update(self, x, y):
+        """Return decimated (x, y) for a source that only grows (e.g. a SampleStore column)"""
+        n = len(x)
+        if self.view is None or n == 0:
+            return x, y
+        if n < self._seen:
+            self._reset()
+        if self._occupied is None:
+            grid = self._grid()
+            self._occupied = np.zeros(grid.nx * grid.ny, dtype=bool)
+            self.rebuilds += 1
+        if self._seen < n:
+            self._append(x[self._seen:], y[self._seen:])
+            self._seen = n
+            while len(self._x) > self.max_vertices:
+                self.scale *= 2
+                self._reset()
+                grid = self._grid()
+                self._occupied = np.zeros(grid.nx * grid.ny, dtype=bool)
+                self._append(x, y)
+                self._seen = n
+                self.rebuilds += 1
+        return self._x, self._y
+
+    def _append(self, x, y):
+        grid = self._grid()
+        cx, cy = grid.cells(x, y)
+        inside = np.flatnonzero((cx >= 0) & (cx < grid.nx) & (cy >= 0) & (cy < grid.ny))
+        if not len(inside):
+            return
+        cells = cx[inside] * grid.ny + cy[inside]
+        cells, first = np.unique(cells, return_index=True)
+        new = ~self._occupied[cells]
+        self._occupied[cells[new]] = True
+        # Keep the earliest point of each new cell, in arrival order
+        index = inside[np.sort(first[new])]
+        self._x = np.concatenate((self._x, np.asarray(x)[index]))
+        self._y = np.concatenate((self._y, np.asarray(y)[index]))
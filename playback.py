@@ -0,0 +1,148 @@
+import hashlib
+import os
+
+import numpy as np
+
+from export import write_atomically
+from session_format import SESSION_EXTENSION, csv_to_session, open_session
+
+
+class SessionIndex:
+    """Time and label index over a .mms session, read lazily from its memory map.
+
+    Opening only scans the timestamp and label columns once, a block of
+    ``block_rows`` rows at a time, recording each block's time range and
+    which labels occur in it, plus a thinned overview track of at most
+    ``overview_points`` samples. Queries then read just the blocks that
+    overlap the requested time range and contain a selected label, so
+    memory stays bounded by the window asked for, not the session size.
+    """
+
+    def __init__(self, path, block_rows=65536, overview_points=20000):
+        self.path = path
+        self.session = open_session(path)
+        self.labels = list(self.session.labels)
+        self.devices = list(self.session.devices)
+        self.block_rows = block_rows
+        records = self.session.records
+        n = len(self.session)
+        blocks = max((n + block_rows - 1) // block_rows, 1)
+        self.block_min = np.full(blocks, np.inf)
+        self.block_max = np.full(blocks, -np.inf)
+        self.block_labels = np.zeros((blocks, max(len(self.labels), 1)), dtype=bool)
+        self.label_counts = np.zeros(len(self.labels), dtype=np.int64)
+        stride = max(n // overview_points, 1)
+        overview = []
+        for block, start in enumerate(range(0, n, block_rows)):
+            chunk = records[start:start + block_rows]
+            timestamps = chunk['timestamp']
+            self.block_min[block] = timestamps.min()
+            self.block_max[block] = timestamps.max()
+            counts = np.bincount(chunk['label'], minlength=len(self.labels))
+            self.block_labels[block, :len(counts)] = counts > 0
+            self.label_counts += counts[:len(self.labels)]
+            # Every stride-th row of the whole session, whatever the block boundaries
+            first = (-start) % stride
+            overview.append(np.array(chunk[first::stride][['timestamp', 'x', 'y', 'label']]))
+        self.overview = np.concatenate(overview) if overview else np.empty(0, dtype=records.dtype)
+        self.start_time = float(self.block_min.min()) if n else 0.0
+        self.end_time = float(self.block_max.max()) if n else 0.0
+        self.selected = np.ones(len(self.labels), dtype=bool)
+
+    def __len__(self):
+        return len(self.session)
+
+    @property
+    def duration(self):
+        return self.end_time - self.start_time
+
+    def select_labels(self, labels=None):
+        """Restrict queries to these labels; None selects all"""
+        self.selected = np.ones(len(self.labels), dtype=bool)
+        if labels is not None:
+            self.selected[:] = False
+            for label in labels:
+                if label in self.labels:
+                    self.selected[self.labels.index(label)] = True
+
+    def overview_xy(self):
+        """Thinned (x, y) of the selected labels over the whole session"""
+        keep = self.selected[self.overview['label']] if len(self.labels) else np.zeros(0, dtype=bool)
+        return self.overview['x'][keep], self.overview['y'][keep]
+
+    def bounds(self):
+        """(xmin, xmax, ymin, ymax) of the overview track, or None when empty"""
+        if not len(self.overview):
+            return None
+        x, y = self.overview['x'], self.overview['y']
+        return float(x.min()), float(x.max()), float(y.min()), float(y.max())
+
+    def window(self, t0, t1):
+        """Selected samples with t0 <= timestamp <= t1, as a structured array in file order"""
+        blocks = np.flatnonzero((self.block_max >= t0) & (self.block_min <= t1)
+                                & (self.block_labels[:, :len(self.selected)] & self.selected).any(axis=1))
+        records = self.session.records
+        parts = []
+        for block in blocks.tolist():
+            chunk = records[block * self.block_rows:(block + 1) * self.block_rows]
+            timestamps = chunk['timestamp']
+            keep = (timestamps >= t0) & (timestamps <= t1) & self.selected[chunk['label']]
+            if keep.any():
+                parts.append(np.array(chunk[keep]))
+        if not parts:
+            return np.empty(0, dtype=records.dtype)
+        window = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if self.session.version < 2:
+            # Undefined bytes in version 1 files; every sample is from the one device
+            window['device'] = 0
+        return window
+
+
+class PlaybackClock:
+    """Session time driven by wall time at ``speed``, with play/pause and seek"""
+
+    def __init__(self, start, end, speed=1.0):
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.time = start
+        self.playing = False
+
+    def play(self):
+        if self.time >= self.end:
+            self.time = self.start
+        self.playing = True
+
+    def pause(self):
+        self.playing = False
+
+    def seek(self, t):
+        self.time = min(max(t, self.start), self.end)
+
+    def advance(self, wall_seconds):
+        """Move on by wall_seconds * speed while playing; stops at the end"""
+        if self.playing:
+            self.seek(self.time + wall_seconds * self.speed)
+            if self.time >= self.end:
+                self.playing = False
+        return self.time
+
+
+def playback_cache_path(csv_path, cache_dir):
+    """Where the .mms copy of a CSV session is cached; changes when the CSV does"""
+    stat = os.stat(csv_path)
+    key = f"{os.path.abspath(csv_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{name}_{digest}{SESSION_EXTENSION}")
+
+
+def prepare_session(path, cache_dir, progress=None):
+    """Path of a .mms file for ``path``, converting (and caching) CSV sessions on first use"""
+    if path.lower().endswith(SESSION_EXTENSION):
+        return path
+    cached = playback_cache_path(path, cache_dir)
+    if not os.path.exists(cached):
+        os.makedirs(cache_dir, exist_ok=True)
+        write_atomically(cached, lambda partial: csv_to_session(path, partial, progress=progress))
+    return cached
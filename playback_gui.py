@@ -0,0 +1,181 @@
+import os
+import time
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from playback import PlaybackClock, SessionIndex
+from render import RenderScheduler
+
+PLAYBACK_SPEEDS = ("0.25", "0.5", "1", "2", "5", "10", "50", "100")
+TRAIL_SECONDS = ("2", "5", "10", "30", "60", "300")
+
+
+class PlaybackWindow:
+    """Replays a saved .mms session in its own window, independent of live tracking.
+
+    Only the trail window around the playback time is read from the
+    session (see :class:`playback.SessionIndex`); the whole-session track is
+    drawn once as a thinned overview behind it. Frames come from the same
+    blitting RenderScheduler as the live plot.
+    """
+
+    def __init__(self, root, path, fps=30):
+        self.root = root
+        self.index = SessionIndex(path)
+        self.clock = PlaybackClock(self.index.start_time, self.index.end_time)
+        self.trail_seconds = 10.0
+        self._last_tick = time.perf_counter()
+        self._dirty = True
+
+        self.window = tk.Toplevel(root)
+        self.window.title(f"Playback - {os.path.basename(path)}")
+        self.window.geometry("1100x750")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.setup_controls()
+        self.setup_plot()
+        artists = [artist for pair in self.device_artists for artist in pair]
+        self.renderer = RenderScheduler(self.window, self.canvas, artists,
+                                        self.on_render_frame, fps=fps, always_update=True)
+        self.renderer.start()
+
+    def setup_controls(self):
+        controls = ttk.Frame(self.window, padding="5")
+        controls.pack(fill=tk.X)
+
+        self.play_btn = ttk.Button(controls, text="Play", command=self.toggle_play, width=8)
+        self.play_btn.pack(side=tk.LEFT, padx=(0, 10))
+
+        ttk.Label(controls, text="Speed:").pack(side=tk.LEFT)
+        self.speed_var = tk.StringVar(value="1")
+        speed_combo = ttk.Combobox(controls, textvariable=self.speed_var, values=PLAYBACK_SPEEDS,
+                                   width=6, state="readonly")
+        speed_combo.pack(side=tk.LEFT, padx=(5, 10))
+        speed_combo.bind('<<ComboboxSelected>>', self.on_speed_selected)
+
+        ttk.Label(controls, text="Trail (s):").pack(side=tk.LEFT)
+        self.trail_var = tk.StringVar(value="10")
+        trail_combo = ttk.Combobox(controls, textvariable=self.trail_var, values=TRAIL_SECONDS,
+                                   width=6, state="readonly")
+        trail_combo.pack(side=tk.LEFT, padx=(5, 10))
+        trail_combo.bind('<<ComboboxSelected>>', self.on_trail_selected)
+
+        self.time_var = tk.StringVar()
+        ttk.Label(controls, textvariable=self.time_var).pack(side=tk.LEFT, padx=(10, 0))
+
+        # Scrub bar in seconds from the start of the session
+        self.scale = tk.Scale(self.window, from_=0, to=max(self.index.duration, 0.01), orient=tk.HORIZONTAL,
+                              resolution=0.01, showvalue=False, command=self.on_scrub)
+        self.scale.pack(fill=tk.X, padx=5)
+
+        body = ttk.Frame(self.window)
+        body.pack(fill=tk.BOTH, expand=True)
+        label_frame = ttk.LabelFrame(body, text="Labels", padding="5")
+        label_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=5, pady=5)
+        self.label_list = tk.Listbox(label_frame, selectmode=tk.MULTIPLE, exportselection=False, width=28)
+        self.label_list.pack(fill=tk.BOTH, expand=True)
+        for label, count in zip(self.index.labels, self.index.label_counts.tolist()):
+            self.label_list.insert(tk.END, f"{label} ({count})")
+        self.label_list.select_set(0, tk.END)
+        self.label_list.bind('<<ListboxSelect>>', self.on_labels_selected)
+        ttk.Button(label_frame, text="All", command=self.select_all_labels).pack(fill=tk.X, pady=(5, 0))
+        self.plot_frame = ttk.Frame(body)
+        self.plot_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    def setup_plot(self):
+        self.fig = Figure(figsize=(9, 7))
+        self.ax = self.fig.add_subplot()
+        self.ax.set_xlabel('X Position (m)')
+        self.ax.set_ylabel('Y Position (m)')
+        self.ax.grid(True, alpha=0.3)
+        self.ax.set_aspect('equal')
+        self.overview_line, = self.ax.plot([], [], '-', color='0.75', linewidth=0.8, label='Session')
+        # One (trail, current point) pair per device code, so robots never share a polyline
+        self.device_artists = []
+        for code, device in enumerate(self.index.devices or [""]):
+            color = f"C{code % 10}"
+            trail, = self.ax.plot([], [], '-', color=color, alpha=0.7, linewidth=1)
+            point, = self.ax.plot([], [], 'o', color=color, markersize=9, label=device or 'Position')
+            self.device_artists.append((trail, point))
+        bounds = self.index.bounds()
+        if bounds:
+            xmin, xmax, ymin, ymax = bounds
+            margin = 0.5
+            self.ax.set_xlim(xmin - margin, xmax + margin)
+            self.ax.set_ylim(ymin - margin, ymax + margin)
+        self.ax.legend(loc='upper right')
+        self.update_overview()
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    def update_overview(self):
+        self.overview_line.set_data(*self.index.overview_xy())
+
+    def on_render_frame(self, samples):
+        now = time.perf_counter()
+        elapsed, self._last_tick = now - self._last_tick, now
+        if not (self.clock.playing or self._dirty):
+            return False
+        self._dirty = False
+        t = self.clock.advance(elapsed)
+        window = self.index.window(t - self.trail_seconds, t)
+        codes = window['device']
+        for code, (trail, point) in enumerate(self.device_artists):
+            rows = window[codes == code]
+            if len(rows):
+                rows = rows[np.argsort(rows['timestamp'], kind='stable')]
+                trail.set_data(rows['x'], rows['y'])
+                point.set_data([rows['x'][-1]], [rows['y'][-1]])
+            else:
+                trail.set_data([], [])
+                point.set_data([], [])
+
+        offset = t - self.index.start_time
+        self.time_var.set(f"{offset:.2f} / {self.index.duration:.2f} s   {len(window)} samples in trail")
+        self.scale.set(offset)
+        if not self.clock.playing and self.play_btn['text'] != "Play":
+            self.play_btn.config(text="Play")
+        return False
+
+    def toggle_play(self):
+        if self.clock.playing:
+            self.clock.pause()
+            self.play_btn.config(text="Play")
+        else:
+            self.clock.play()
+            self.play_btn.config(text="Pause")
+        self._dirty = True
+
+    def on_scrub(self, value):
+        target = self.index.start_time + float(value)
+        # scale.set() in on_render_frame echoes back here; only real drags move the clock
+        if abs(target - self.clock.time) <= float(self.scale['resolution']):
+            return
+        self.clock.seek(target)
+        self._dirty = True
+
+    def on_speed_selected(self, event=None):
+        self.clock.speed = float(self.speed_var.get())
+
+    def on_trail_selected(self, event=None):
+        self.trail_seconds = float(self.trail_var.get())
+        self._dirty = True
+
+    def on_labels_selected(self, event=None):
+        selected = [self.index.labels[i] for i in self.label_list.curselection()]
+        self.index.select_labels(selected)
+        self.update_overview()
+        self._dirty = True
+        self.renderer.request_full_redraw()
+
+    def select_all_labels(self):
+        self.label_list.select_set(0, tk.END)
+        self.on_labels_selected()
+
+    def close(self):
+        self.renderer.stop()
+        self.window.destroy()
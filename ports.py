@@ -0,0 +1,73 @@
+import threading
+import time
+
+# Words in a port description or manufacturer that suggest a USB serial adapter
+USB_SERIAL_KEYWORDS = ('usb', 'serial', 'ch340', 'cp210', 'ftdi')
+
+
+def describe_port(port):
+    """Combobox text for a pyserial ListPortInfo: device - description (manufacturer)"""
+    desc = f"{port.device}"
+    if port.description and port.description != "n/a":
+        desc += f" - {port.description}"
+    if port.manufacturer and port.manufacturer != "n/a":
+        desc += f" ({port.manufacturer})"
+    return desc
+
+
+def likely_port_index(ports):
+    """Index of the first port that looks like a USB serial adapter, else 0"""
+    for i, port in enumerate(ports):
+        port_desc = (port.description or "").lower()
+        port_manuf = (port.manufacturer or "").lower()
+        if any(keyword in port_desc or keyword in port_manuf for keyword in USB_SERIAL_KEYWORDS):
+            return i
+    return 0
+
+
+class PortScanner:
+    """Enumerates serial ports on a background thread and caches the result.
+
+    Enumeration can take seconds on some systems (Bluetooth serial ports on
+    Windows in particular), so it never runs on the caller's thread.
+    :meth:`scan` starts a scan unless one is running or the cached result is
+    younger than ``max_age``; Tk code polls :attr:`version` to notice new
+    results.
+    """
+
+    def __init__(self, max_age=5.0):
+        self.max_age = max_age
+        self.ports = []             # pyserial ListPortInfo objects from the last scan
+        self.error = None
+        self.scanned_at = None      # time.monotonic() of the last finished scan
+        self.version = 0            # bumped when a scan finishes
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def scanning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def scan(self, force=False):
+        """Start a background scan; returns False when the cache was fresh enough to skip it"""
+        with self._lock:
+            if self.scanning:
+                return True
+            fresh = self.scanned_at is not None and time.monotonic() - self.scanned_at < self.max_age
+            if fresh and not force:
+                return False
+            self._thread = threading.Thread(target=self._run, name="port-scan", daemon=True)
+            self._thread.start()
+        return True
+
+    def _run(self):
+        try:
+            import serial.tools.list_ports
+            ports = list(serial.tools.list_ports.comports())
+            error = None
+        except Exception as e:
+            ports, error = self.ports, e
+        self.ports = ports
+        self.error = error
+        self.scanned_at = time.monotonic()
+        self.version += 1
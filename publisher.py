@@ -0,0 +1,435 @@
+"""Live position publishing for local consumers (robot controllers, dashboards).
+
+Every accepted sample is sent, with its label and collection state, over
+UDP multicast and/or a TCP socket. Samples are batched (every
+``batch_interval`` or ``max_batch`` samples) into compact binary messages::
+
+    header   <4sBBHI   magic b'MMPS', version, kind, count, sequence
+    kind 1   count x SAMPLE_DTYPE records (25 bytes each, little-endian):
+             timestamp f8, x f4, y f4, z f4, device u2, label u2, flags u1
+    kind 2   UTF-8 JSON naming the codes: {"labels": [...], "devices": [...],
+             "label_offset": i, "device_offset": j, "label_total": n, "device_total": m}
+             where labels[k] names label code i + k (likewise devices)
+
+The names are split over as many kind 2 messages as it takes to keep each
+within one datagram. They are sent before the first sample that uses a new
+name, to every new TCP client, and once a second over UDP for late joiners;
+a slow TCP client may lose samples but always gets the latest names. Over
+TCP each message is preceded by its length as <I. In kind 1 messages the
+sequence number counts sample messages, so a gap means lost samples. Kind 2
+messages have their own sequence space: the field holds the names version,
+which grows whenever a name is added, so repeats of the same names carry the
+same number and never look like loss or reordering.
+
+    python publisher.py --udp 239.255.42.99:5005      # print what is published
+"""
+
+import argparse
+import collections
+import json
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from instrumentation import metrics
+
+MAGIC = b'MMPS'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHI')
+LENGTH = struct.Struct('<I')
+KIND_SAMPLES = 1
+KIND_NAMES = 2
+FLAG_COLLECTING = 1
+FLAG_DYNAMIC = 2
+
+SAMPLE_DTYPE = np.dtype([
+    ('timestamp', '<f8'), ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('device', '<u2'), ('label', '<u2'), ('flags', 'u1'),
+])
+
+DEFAULT_UDP = ('239.255.42.99', 5005)
+DEFAULT_TCP_PORT = 5006
+# Keeps a UDP batch within one unfragmented datagram on a 1500-byte MTU
+MAX_BATCH = 50
+# JSON bytes of names per kind 2 message, for the same reason
+NAMES_BUDGET = 1200
+
+Position = collections.namedtuple(
+    'Position', 'timestamp x y z device label type collecting')
+
+
+def parse_address(text, default_host):
+    """'host:port', ':port' or 'port' -> (host, port)"""
+    host, _, port = text.rpartition(':')
+    return (host or default_host, int(port))
+
+
+class _Client:
+    """One TCP subscriber: a bounded queue drained by its own sender thread.
+
+    When the subscriber reads too slowly the oldest queued messages are
+    dropped, so it falls behind on history rather than holding up anyone else.
+    Names messages are kept apart from that queue and go out ahead of it.
+    """
+
+    def __init__(self, sock, address, queue_size):
+        self.sock = sock
+        self.address = address
+        self.queue = collections.deque(maxlen=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self.greeted = False     # has been sent the current names messages
+        self.names = ()          # names messages still to send, never dropped
+        self._cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=f"publisher-{address[0]}:{address[1]}",
+                                       daemon=True)
+
+    def send(self, message):
+        with self._cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(message)
+            self._cond.notify()
+
+    def send_names(self, messages):
+        """Replace any unsent names with ``messages``; they cover every code so far"""
+        with self._cond:
+            self.names = tuple(messages)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self.queue and not self.names and not self.closed:
+                        self._cond.wait()
+                    if self.closed:
+                        break
+                    # Names first: they also cover the codes of samples queued before them
+                    messages = list(self.names) + list(self.queue)
+                    self.names = ()
+                    self.queue.clear()
+                self.sock.sendall(b''.join(LENGTH.pack(len(m)) + m for m in messages))
+        except OSError:
+            pass
+        finally:
+            self.closed = True
+            self.sock.close()
+
+
+class PositionPublisher:
+    """Streams samples to UDP multicast and/or TCP subscribers from a sender thread.
+
+    :meth:`publish` only appends to a bounded queue, so it is safe to call
+    from the tracking thread; if the sender cannot keep up the oldest
+    samples are dropped and counted. ``udp`` is a (group, port) pair and
+    ``tcp`` a (host, port) pair to listen on; either may be None.
+    """
+
+    def __init__(self, udp=None, tcp=None, batch_interval=0.01, max_batch=MAX_BATCH,
+                 queue_size=65536, client_queue=256, ttl=1):
+        if udp is None and tcp is None:
+            raise ValueError("PositionPublisher needs a UDP group or a TCP address")
+        self.udp = udp
+        self.tcp = tcp
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.ttl = ttl
+        self.client_queue = client_queue
+        self._pending = collections.deque(maxlen=queue_size)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._clients_lock = threading.Lock()
+        self.clients = []
+        self._labels = {}
+        self._devices = {}
+        self._names_messages = None
+        self._names_sent = 0.0
+        self._names_version = 0
+        self._sequence = 0
+        self._udp_sock = None
+        self._tcp_sock = None
+        self._threads = []
+        self.published = 0      # samples accepted by publish()
+        self.dropped = 0        # samples lost because the sender fell behind
+        self.messages = 0       # messages sent
+        self.send_errors = 0
+
+    def start(self):
+        if self.udp:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            sock.setblocking(False)
+            self._udp_sock = sock
+        if self.tcp:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(self.tcp)
+            sock.listen()
+            sock.settimeout(0.5)
+            self._tcp_sock = sock
+            self.tcp = sock.getsockname()
+            self._threads.append(threading.Thread(target=self._accept_loop, name="publisher-accept",
+                                                  daemon=True))
+        self._threads.append(threading.Thread(target=self._send_loop, name="publisher", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        with self._clients_lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            client.close()
+        for sock in (self._udp_sock, self._tcp_sock):
+            if sock:
+                sock.close()
+        self._udp_sock = self._tcp_sock = None
+
+    def publish(self, timestamp, x, y, z, device, label, sample_type, collecting):
+        """Queue one sample; never blocks"""
+        pending = self._pending
+        if len(pending) == pending.maxlen:
+            self.dropped += 1
+        pending.append((timestamp, x, y, z, device, label, sample_type, collecting))
+        self.published += 1
+        if len(pending) >= self.max_batch:
+            self._wake.set()
+
+    def counters(self):
+        with self._clients_lock:
+            clients = list(self.clients)
+        return {
+            'published': self.published,
+            'dropped': self.dropped,
+            'messages': self.messages,
+            'send_errors': self.send_errors,
+            'clients': len(clients),
+            'client_dropped': sum(client.dropped for client in clients),
+        }
+
+    def _code(self, table, name):
+        code = table.get(name)
+        if code is None:
+            code = table[name] = len(table)
+            self._names_messages = None
+        return code
+
+    def _message(self, kind, count, body, sequence):
+        return HEADER.pack(MAGIC, VERSION, kind, count, sequence & 0xFFFFFFFF) + body
+
+    def _names(self):
+        """Names messages covering every code, each with at most about NAMES_BUDGET bytes of names"""
+        labels, devices = list(self._labels), list(self._devices)
+        totals = {'label_total': len(labels), 'device_total': len(devices)}
+        chunks = [dict(totals, labels=[], devices=[], label_offset=0, device_offset=0)]
+        size = 0
+        for key, names in (('labels', labels), ('devices', devices)):
+            for i, name in enumerate(names):
+                cost = len(json.dumps(name).encode('utf-8')) + 2
+                chunk = chunks[-1]
+                if size + cost > NAMES_BUDGET and (chunk['labels'] or chunk['devices']):
+                    chunks.append(dict(totals, labels=[], devices=[],
+                                       label_offset=i if key == 'labels' else len(labels),
+                                       device_offset=0 if key == 'labels' else i))
+                    size = 0
+                chunks[-1][key].append(name)
+                size += cost
+        self._names_version += 1
+        return [self._message(KIND_NAMES, 0, json.dumps(chunk).encode('utf-8'), self._names_version)
+                for chunk in chunks]
+
+    def _encode(self, samples):
+        records = np.empty(len(samples), dtype=SAMPLE_DTYPE)
+        rows = []
+        for timestamp, x, y, z, device, label, sample_type, collecting in samples:
+            flags = (FLAG_COLLECTING if collecting else 0) | (FLAG_DYNAMIC if sample_type == 'dynamic' else 0)
+            rows.append((timestamp, x, y, z, self._code(self._devices, device),
+                         self._code(self._labels, label), flags))
+        records[:] = rows
+        return records.tobytes()
+
+    def _send_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.batch_interval)
+            self._wake.clear()
+            pending = self._pending
+            while pending:
+                batch = []
+                while pending and len(batch) < self.max_batch:
+                    batch.append(pending.popleft())
+                try:
+                    with metrics.timer('publisher.send'):
+                        body = self._encode(batch)
+                        now = time.monotonic()
+                        if self._names_messages is None:
+                            self._names_messages = self._names()
+                            self._names_sent = now
+                            self._broadcast_names()
+                        elif self.udp and now - self._names_sent >= 1.0:
+                            # Repeated for late UDP joiners; TCP clients were greeted
+                            self._names_sent = now
+                            for message in self._names_messages:
+                                self.messages += 1
+                                self._send_udp(message)
+                        self._broadcast(self._message(KIND_SAMPLES, len(batch), body, self._sequence))
+                        self._sequence += 1
+                except Exception as e:
+                    self.send_errors += 1
+                    metrics.incr('publisher.errors')
+                    print(f"Publisher error: {e}")
+
+    def _send_udp(self, message):
+        try:
+            self._udp_sock.sendto(message, self.udp)
+        except OSError:
+            # Full socket buffer or no multicast route; the datagram is lost like any other
+            self.send_errors += 1
+
+    def _tcp_clients(self):
+        with self._clients_lock:
+            self.clients = [client for client in self.clients if not client.closed]
+            return list(self.clients)
+
+    def _broadcast_names(self):
+        """Send the current names to everyone, outside the TCP clients' droppable queues"""
+        messages = self._names_messages
+        self.messages += len(messages)
+        if self._udp_sock:
+            for message in messages:
+                self._send_udp(message)
+        if self._tcp_sock:
+            for client in self._tcp_clients():
+                client.greeted = True
+                client.send_names(messages)
+
+    def _broadcast(self, message):
+        self.messages += 1
+        if self._udp_sock:
+            self._send_udp(message)
+        if self._tcp_sock:
+            for client in self._tcp_clients():
+                if not client.greeted:
+                    client.greeted = True
+                    client.send_names(self._names_messages)
+                client.send(message)
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                sock, address = self._tcp_sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # The sender thread greets it with the names message before its first samples
+            client = _Client(sock, address, self.client_queue)
+            with self._clients_lock:
+                self.clients.append(client)
+            client.thread.start()
+
+
+def decode(message):
+    """(kind, sequence, payload) for one message; payload is a SAMPLE_DTYPE array or the names dict"""
+    magic, version, kind, count, sequence = HEADER.unpack_from(message)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a position publisher message")
+    body = message[HEADER.size:]
+    if kind == KIND_NAMES:
+        return kind, sequence, json.loads(body.decode('utf-8'))
+    return kind, sequence, np.frombuffer(body, dtype=SAMPLE_DTYPE, count=count)
+
+
+def _udp_messages(group, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('', port))
+    membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton('0.0.0.0'))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    with sock:
+        while True:
+            yield sock.recv(65536)
+
+
+def _tcp_messages(host, port):
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile('rb')
+        while True:
+            head = stream.read(LENGTH.size)
+            if len(head) < LENGTH.size:
+                return
+            yield stream.read(LENGTH.unpack(head)[0])
+
+
+def _merge_names(table, names, offset, total):
+    """Fold one names message into a code -> name list; unknown codes stay None"""
+    if total is None:
+        total = offset + len(names)
+    table = list(table or [])[:total]
+    table += [None] * (total - len(table))
+    table[offset:offset + len(names)] = names
+    return table
+
+
+def subscribe(udp=None, tcp=None):
+    """Yield Position tuples from a publisher, over UDP multicast (group, port) or TCP (host, port).
+
+    Samples arriving before their names message (UDP late join) are skipped.
+    """
+    messages = _udp_messages(*udp) if udp else _tcp_messages(*tcp)
+    labels = devices = None
+    for message in messages:
+        kind, _, payload = decode(message)
+        if kind == KIND_NAMES:
+            labels = _merge_names(labels, payload['labels'], payload.get('label_offset', 0),
+                                  payload.get('label_total'))
+            devices = _merge_names(devices, payload['devices'], payload.get('device_offset', 0),
+                                   payload.get('device_total'))
+            continue
+        if labels is None:
+            continue
+        for timestamp, x, y, z, device, label, flags in payload.tolist():
+            if (label >= len(labels) or device >= len(devices)
+                    or labels[label] is None or devices[device] is None):
+                continue
+            yield Position(timestamp, x, y, z, devices[device], labels[label],
+                           'dynamic' if flags & FLAG_DYNAMIC else 'static', bool(flags & FLAG_COLLECTING))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print positions streamed by a running collector")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--udp', metavar='GROUP:PORT', help=f"multicast group (default {DEFAULT_UDP[0]}:{DEFAULT_UDP[1]})")
+    source.add_argument('--tcp', metavar='HOST:PORT', help="TCP publisher address, e.g. 127.0.0.1:5006")
+    args = parser.parse_args(argv)
+
+    if args.tcp:
+        positions = subscribe(tcp=parse_address(args.tcp, '127.0.0.1'))
+    else:
+        positions = subscribe(udp=parse_address(args.udp, DEFAULT_UDP[0]) if args.udp else DEFAULT_UDP)
+    try:
+        for p in positions:
+            state = "collecting" if p.collecting else "idle"
+            print(f"{p.timestamp:.3f}  {p.device:<16} x={p.x:8.3f} y={p.y:8.3f} z={p.z:8.3f}  "
+                  f"{p.label} ({p.type}, {state})")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+import csv
+import glob
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from instrumentation import metrics
+
+FIELDNAMES = ['timestamp', 'datetime', 'x', 'y', 'z', 'label', 'type', 'device']
+# Appended after FIELDNAMES when unfiltered coordinates are kept
+RAW_FIELDNAMES = ['raw_x', 'raw_y', 'raw_z']
+# Appended last: beacon timestamp and host monotonic arrival time behind the aligned timestamp
+CLOCK_FIELDNAMES = ['hedge_time', 'host_time']
+PARTIAL_SUFFIX = '.partial'
+
+
+def format_datetimes(timestamps):
+    """Local time strings ('%Y-%m-%d %H:%M:%S.%f') for many POSIX timestamps at once.
+
+    Matches datetime.fromtimestamp(t).strftime(...) without a Python call
+    per sample: the UTC offset is looked up once per quarter hour present
+    (zone transitions fall on quarter hours) and NumPy does the formatting.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if not len(timestamps):
+        return []
+    # Round the fraction alone, as datetime does, so the microseconds agree exactly
+    fraction, seconds = np.modf(timestamps)
+    micros = seconds.astype(np.int64) * 1_000_000 + np.round(fraction * 1e6).astype(np.int64)
+    quarters, inverse = np.unique(micros // 900_000_000, return_inverse=True)
+    offsets = np.array([time.localtime(q * 900).tm_gmtoff for q in quarters.tolist()], dtype=np.int64)
+    local = (micros + offsets[inverse.ravel()] * 1_000_000).astype('datetime64[us]')
+    text = np.datetime_as_string(local, unit='us')
+    # 'YYYY-MM-DDTHH:MM:SS.ffffff' -> space instead of the ISO 'T'
+    text.view(np.uint32).reshape(len(text), -1)[:, 10] = ord(' ')
+    return text.tolist()
+
+
+def format_rows(samples):
+    """CSV rows in export column order for (timestamp, x, y, z, label, type, device, *extra) tuples"""
+    dates = format_datetimes([sample[0] for sample in samples])
+    return [(sample[0], date, *sample[1:]) for sample, date in zip(samples, dates)]
+
+
+def recover_session_file(path, chunk_size=1 << 20):
+    """Cut a torn trailing row from an interrupted session file; returns the data row count"""
+    newlines = 0
+    last_newline_end = 0
+    offset = 0
+    with open(path, 'rb+') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            count = chunk.count(b'\n')
+            if count:
+                newlines += count
+                last_newline_end = offset + chunk.rfind(b'\n') + 1
+            offset += len(chunk)
+        if last_newline_end != offset:
+            f.truncate(last_newline_end)
+            f.flush()
+            os.fsync(f.fileno())
+    # The first line is the header
+    return max(newlines - 1, 0)
+
+
+def recover_sessions(directory):
+    """Repair and finalize session files left behind by a crash or Ctrl+C.
+
+    Returns a list of (path, rows) for every recovered session.
+    """
+    recovered = []
+    for partial in sorted(glob.glob(os.path.join(directory, '*' + PARTIAL_SUFFIX))):
+        rows = recover_session_file(partial)
+        final = partial[:-len(PARTIAL_SUFFIX)]
+        os.replace(partial, final)
+        recovered.append((final, rows))
+    return recovered
+
+
+class StreamingRecorder:
+    """Appends samples to a CSV session file from a dedicated writer thread.
+
+    Samples go through a bounded queue so acquisition never waits on disk;
+    the writer thread writes them in batches and fsyncs every
+    ``fsync_interval`` seconds. While recording the file carries a
+    ``.partial`` suffix, which :meth:`close` removes. A session cut short
+    by a crash can be repaired with :func:`recover_sessions`.
+
+    The recorder bounds only its own memory (the queue). It makes the file,
+    not memory, the durable copy: TrackerCore still keeps every collected
+    sample in its SampleStore for plotting, statistics and saving, so that
+    store grows with the session (55 to 79 bytes per sample).
+    """
+
+    _STOP = object()
+
+    def __init__(self, path, fsync_interval=1.0, batch_size=512, queue_size=65536,
+                 fieldnames=FIELDNAMES):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._file = None
+        self.rows_recorded = 0   # accepted by record()
+        self.rows_written = 0    # handed to the file by the writer thread
+        self.dropped = 0         # rejected because the queue was full
+        self.error = None
+
+    def start(self):
+        directory = os.path.dirname(self.partial_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.partial_path):
+            self.rows_written = recover_session_file(self.partial_path)
+            self._file = open(self.partial_path, 'a', newline='')
+        else:
+            self._file = open(self.partial_path, 'w', newline='')
+            csv.writer(self._file).writerow(self.fieldnames)
+        self.rows_recorded = self.rows_written
+        self._thread = threading.Thread(target=self._writer_loop, name="session-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def queued(self):
+        """Samples waiting for the writer thread"""
+        return self._queue.qsize()
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def record(self, timestamp, x, y, z, label, sample_type, device="", *extra):
+        """Queue one sample; ``extra`` are the optional column values in fieldnames order"""
+        try:
+            self._queue.put_nowait((timestamp, x, y, z, label, sample_type, device, *extra))
+            self.rows_recorded += 1
+        except queue.Full:
+            self.dropped += 1
+            metrics.incr('recorder.dropped')
+
+    def flush(self, timeout=10.0):
+        """Wait up to ``timeout`` seconds until everything queued so far is written and fsynced.
+
+        Returns False if that did not happen in time, including when the
+        queue stayed too full to take the flush request.
+        """
+        if not self.active:
+            return False
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            metrics.incr('recorder.flush_timeouts')
+            return False
+        return done.wait(max(deadline - time.monotonic(), 0.0))
+
+    def close(self):
+        """Drain the queue, fsync and give the session file its final name"""
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+        os.replace(self.partial_path, self.path)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _writer_loop(self):
+        writer = csv.writer(self._file)
+        last_sync = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.fsync_interval)
+                except queue.Empty:
+                    item = None
+
+                batch = []
+                markers = []
+                stop = False
+                while item is not None:
+                    if item is self._STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        markers.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+
+                if batch:
+                    with metrics.timer('recorder.write_batch'):
+                        writer.writerows(format_rows(batch))
+                    self.rows_written += len(batch)
+
+                now = time.monotonic()
+                if stop or markers or now - last_sync >= self.fsync_interval:
+                    with metrics.timer('recorder.fsync'):
+                        self._sync()
+                    last_sync = now
+                for marker in markers:
+                    marker.set()
+                if stop:
+                    break
+        except Exception as e:
+            self.error = e
+            metrics.incr('recorder.errors')
+            print(f"Session writer error: {e}")
+        finally:
+            self._file.close()
@@ -0,0 +1,128 @@
+import collections
+import time
+
+from instrumentation import metrics
+
+
+class RenderScheduler:
+    """Frame-rate-capped plot renderer driven by the Tk event loop.
+
+    Worker threads only call :meth:`submit`, which appends to a bounded,
+    thread-safe deque. On every tick the scheduler (running on the Tk main
+    thread via ``root.after``) drains that queue, hands the batch to
+    ``update_callback`` and then blits the animated artists. The full figure
+    is only redrawn when the callback reports that axis limits changed, the
+    canvas was resized, or :meth:`request_full_redraw` was called. With
+    ``always_update`` the callback runs on every frame even without new
+    samples, for animations driven by the clock such as session playback.
+    """
+
+    def __init__(self, root, canvas, artists, update_callback, fps=30, max_pending=10000,
+                 always_update=False):
+        self.root = root
+        self.canvas = canvas
+        self.figure = canvas.figure
+        self.artists = list(artists)
+        self.update_callback = update_callback
+        self.fps = fps
+        self.always_update = always_update
+        self.sample_queue = collections.deque(maxlen=max_pending)
+
+        self.frames_drawn = 0
+        self.full_redraws = 0
+        self._background = None
+        self._full_redraw = True
+        self._after_id = None
+        self._running = False
+
+        for artist in self.artists:
+            artist.set_animated(True)
+        self._draw_cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    @property
+    def interval_ms(self):
+        return max(1, int(1000 / self.fps))
+
+    def submit(self, sample):
+        """Queue a sample for the next frame; safe to call from any thread"""
+        self.sample_queue.append(sample)
+
+    def add_artist(self, artist):
+        """Start blitting another artist; the background is redrawn on the next frame"""
+        artist.set_animated(True)
+        self.artists.append(artist)
+        self._full_redraw = True
+
+    def request_full_redraw(self):
+        """Force the background to be redrawn on the next frame"""
+        self._full_redraw = True
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _drain(self):
+        samples = []
+        queue = self.sample_queue
+        while queue:
+            try:
+                samples.append(queue.popleft())
+            except IndexError:
+                break
+        return samples
+
+    def _tick(self):
+        if not self._running:
+            return
+        started = time.perf_counter()
+        try:
+            samples = self._drain()
+            if samples or self._full_redraw or self.always_update:
+                limits_changed = self.update_callback(samples)
+                if limits_changed or self._full_redraw or self._background is None:
+                    self._redraw_full()
+                else:
+                    self._blit()
+        except Exception as e:
+            metrics.incr('render.errors')
+            print(f"Render error: {e}")
+        finally:
+            # Subtract the time spent on this frame so the rate stays capped, not slowed
+            elapsed = time.perf_counter() - started
+            metrics.observe('render.frame', elapsed)
+            elapsed_ms = int(elapsed * 1000)
+            if self._running:
+                self._after_id = self.root.after(max(1, self.interval_ms - elapsed_ms), self._tick)
+
+    def _redraw_full(self):
+        self._full_redraw = False
+        self.full_redraws += 1
+        metrics.incr('render.full_redraws')
+        # draw() fires draw_event, which captures the background and blits the artists
+        self.canvas.draw()
+
+    def _on_draw(self, event):
+        if event is not None and event.canvas is not self.canvas:
+            return
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def _blit(self):
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.figure.draw_artist(artist)
+        self.canvas.blit(self.figure.bbox)
+        self.frames_drawn += 1
@@ -0,0 +1,127 @@
+"""Resampling of sessions onto a uniform time grid.
+
+Every (label, type, device) track is linearly interpolated onto the
+absolute grid k / rate, so tracks from different devices and sessions line
+up sample for sample. Grid points that fall inside a gap longer than
+``max_gap`` (between two collections, or while a beacon was out of range)
+are left out rather than invented.
+
+    python resample.py run1.mms run1_50hz.csv --rate 50
+"""
+
+import argparse
+import math
+
+import numpy as np
+
+from label_stats import MAX_INTERVAL
+from sample_store import SampleStore
+
+
+def resample(t, x, y, z, step, after=None):
+    """Linearly interpolate samples onto the absolute time grid k * step.
+
+    Grid points inside gaps longer than MAX_INTERVAL are skipped. With
+    ``after`` set, only grid points later than it are produced, so chunks
+    can be resampled one after another with the previous last sample
+    prepended. Returns (grid, x, y, z).
+    """
+    if len(t) < 2:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+    first = math.floor(after / step) + 1 if after is not None else math.ceil(t[0] / step)
+    last = math.floor(t[-1] / step)
+    if last < first:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+    grid = np.arange(first, last + 1) * step
+    right = np.clip(np.searchsorted(t, grid, side='left'), 1, len(t) - 1)
+    keep = t[right] - t[right - 1] <= MAX_INTERVAL
+    grid = grid[keep]
+    return grid, np.interp(grid, t, x), np.interp(grid, t, y), np.interp(grid, t, z)
+
+
+def resample_store(store, rate_hz, max_gap=MAX_INTERVAL):
+    """Return a new SampleStore holding ``store`` (or a snapshot() of one) on a uniform grid.
+
+    x/y/z and any raw or clock columns are interpolated; rows come out in
+    time order. All tracks go through one vectorized pass instead of a
+    Python loop per track: rows are sorted by (track, time), each track is
+    moved onto its own stretch of a single time axis, and one searchsorted
+    finds the neighbours of every grid point at once.
+    """
+    columns = store.snapshot() if isinstance(store, SampleStore) else store
+    step = 1.0 / rate_hz
+    names = ['x', 'y', 'z'] + [name for name in SampleStore.RAW_COLUMNS + SampleStore.CLOCK_COLUMNS
+                               if name in columns]
+    result = SampleStore(keep_raw=SampleStore.RAW_COLUMNS[0] in columns,
+                         keep_clock=SampleStore.CLOCK_COLUMNS[0] in columns)
+    t = columns['timestamp']
+    n = len(t)
+    if n < 2:
+        return result
+
+    keys = ((columns['label_codes'].astype(np.int64) * 256 + columns['type_codes']) * 65536
+            + columns['device_codes'])
+    order = np.lexsort((t, keys))
+    keys, t = keys[order], t[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    stops = np.append(starts[1:], n)
+
+    # Grid points k * step inside each track's time span
+    first = np.ceil(t[starts] / step).astype(np.int64)
+    last = np.floor(t[stops - 1] / step).astype(np.int64)
+    counts = np.where(stops - starts >= 2, np.maximum(last - first + 1, 0), 0)
+    track = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(len(track)) - np.repeat(np.cumsum(counts) - counts, counts)
+    grid = (first[track] + offsets) * step
+
+    # Lay the tracks end to end, a second apart, so one sorted axis serves them all
+    spans = t[stops - 1] - t[starts] + 1.0
+    shift = np.concatenate(([0.0], np.cumsum(spans[:-1]))) - t[starts]
+    axis = t + np.repeat(shift, stops - starts)
+    at = grid + shift[track]
+    right = np.clip(np.searchsorted(axis, at, side='left'), starts[track] + 1, stops[track] - 1)
+    left = right - 1
+    span = axis[right] - axis[left]
+    keep = span <= max_gap
+    weight = np.clip(np.divide(at - axis[left], span, out=np.ones_like(span), where=span > 0), 0.0, 1.0)
+    left, right, weight, track, grid = left[keep], right[keep], weight[keep], track[keep], grid[keep]
+
+    out_order = np.lexsort((track, grid))
+    left, right, weight, grid = left[out_order], right[out_order], weight[out_order], grid[out_order]
+    values = {}
+    for name in names:
+        column = columns[name][order]
+        values[name] = column[left] + weight * (column[right] - column[left])
+    source = order[left]
+    result.extend(grid, values['x'], values['y'], values['z'],
+                  columns['label_codes'][source], columns['labels'], columns['type_codes'][source],
+                  columns['device_codes'][source], columns['devices'] or [""],
+                  tuple(values[name] for name in SampleStore.RAW_COLUMNS) if result.has_raw else None,
+                  tuple(values[name] for name in SampleStore.CLOCK_COLUMNS) if result.has_clock else None)
+    return result
+
+
+def main(argv=None):
+    from session_format import load_any, save_any
+
+    parser = argparse.ArgumentParser(description="Resample a Marvelmind session onto a uniform time grid")
+    parser.add_argument('input', help=".csv or .mms session")
+    parser.add_argument('output', help=".csv or .mms file to write")
+    parser.add_argument('--rate', type=float, default=10.0, help="grid rate in Hz (default: 10)")
+    parser.add_argument('--max-gap', type=float, default=MAX_INTERVAL,
+                        help=f"leave out grid points in gaps longer than this many seconds "
+                             f"(default: {MAX_INTERVAL})")
+    args = parser.parse_args(argv)
+    if args.rate <= 0:
+        parser.error("--rate must be positive")
+
+    store = load_any(args.input)
+    result = resample_store(store, args.rate, args.max_gap)
+    save_any(args.output, result)
+    print(f"Resampled {len(store)} samples to {len(result)} at {args.rate:g} Hz; wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import collections
+import threading
+
+import numpy as np
+
+
+class PositionRingBuffer:
+    """Fixed-size ring buffer of (timestamp, x, y, z) samples backed by NumPy.
+
+    Every sample is written twice, at ``i`` and ``i + capacity``, so the last
+    ``n`` samples are always one contiguous slice of the backing array. That
+    makes appends O(1) and lets the plot read ordered, zero-copy views.
+    Running per-axis min/max over the window are kept with monotonic deques.
+    :meth:`append`, :meth:`bounds` and :meth:`clear` share a lock, so the
+    GUI can read the extents while the tracking thread appends.
+    """
+
+    COLUMNS = ('timestamp', 'x', 'y', 'z')
+
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._data = np.zeros((2 * self.capacity, len(self.COLUMNS)), dtype=np.float64)
+        self._head = 0      # next write slot in [0, capacity)
+        self._count = 0     # samples currently held
+        self._total = 0     # samples ever appended (monotonic sequence number)
+        # One (min deque, max deque) pair per spatial axis, holding (seq, value)
+        self._extrema = [(collections.deque(), collections.deque()) for _ in range(3)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def append(self, timestamp, x, y, z):
+        """Add one sample, overwriting the oldest when full"""
+        with self._lock:
+            self._append(timestamp, x, y, z)
+
+    def _append(self, timestamp, x, y, z):
+        row = (timestamp, x, y, z)
+        self._data[self._head] = row
+        self._data[self._head + self.capacity] = row
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+        seq = self._total
+        self._total += 1
+        oldest = self._total - self._count
+        for (mins, maxs), value in zip(self._extrema, (x, y, z)):
+            while mins and mins[-1][1] >= value:
+                mins.pop()
+            mins.append((seq, value))
+            while mins[0][0] < oldest:
+                mins.popleft()
+            while maxs and maxs[-1][1] <= value:
+                maxs.pop()
+            maxs.append((seq, value))
+            while maxs[0][0] < oldest:
+                maxs.popleft()
+
+    @property
+    def total(self):
+        """Samples ever appended; the oldest held sample has sequence ``total - len(self)``"""
+        return self._total
+
+    def view(self):
+        """Return an ordered (n, 4) view, oldest first, without copying"""
+        if self._count < self.capacity:
+            return self._data[:self._count]
+        return self._data[self._head:self._head + self.capacity]
+
+    @property
+    def timestamps(self):
+        return self.view()[:, 0]
+
+    @property
+    def x(self):
+        return self.view()[:, 1]
+
+    @property
+    def y(self):
+        return self.view()[:, 2]
+
+    @property
+    def z(self):
+        return self.view()[:, 3]
+
+    def latest(self):
+        """Return the newest (timestamp, x, y, z) sample, or None when empty"""
+        if not self._count:
+            return None
+        return tuple(self._data[self._head - 1 + self.capacity])
+
+    def bounds(self):
+        """Return (xmin, xmax, ymin, ymax, zmin, zmax) over the window, or None"""
+        with self._lock:
+            if not self._count:
+                return None
+            result = []
+            for mins, maxs in self._extrema:
+                result.extend((mins[0][1], maxs[0][1]))
+            return tuple(result)
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+            for mins, maxs in self._extrema:
+                mins.clear()
+                maxs.clear()
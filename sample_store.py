@@ -0,0 +1,352 @@
+import threading
+
+import numpy as np
+
+
+class SampleStore:
+    """Columnar, append-only store for collected samples.
+
+    Numbers live in typed NumPy columns that grow by doubling, labels,
+    collection types and device ids are interned to small integer codes, and every label
+    keeps a list of contiguous row segments. Counting or slicing one label's
+    points therefore never touches the rest of the session.
+
+    Appending, clearing and adding optional columns hold one lock, so the
+    GUI thread may clear the store or enable raw columns while the tracking
+    thread appends. Readers take no lock; see :meth:`snapshot`.
+    """
+
+    NUMERIC_COLUMNS = (
+        ('timestamp', np.float64),
+        ('x', np.float64),
+        ('y', np.float64),
+        ('z', np.float64),
+    )
+    TYPES = ('static', 'dynamic')
+    # Unfiltered coordinates, kept next to x/y/z when a filter stage is active
+    RAW_COLUMNS = ('raw_x', 'raw_y', 'raw_z')
+    # Beacon timestamp (seconds) and host time.monotonic() at arrival, kept for live captures
+    CLOCK_COLUMNS = ('hedge_time', 'host_time')
+
+    def __init__(self, initial_capacity=4096, keep_raw=False, keep_clock=False):
+        self._initial_capacity = max(int(initial_capacity), 1)
+        self.has_raw = keep_raw
+        self.has_clock = keep_clock
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        capacity = self._initial_capacity
+        self._columns = {name: np.empty(capacity, dtype=dtype)
+                         for name, dtype in self.NUMERIC_COLUMNS}
+        if self.has_raw:
+            for name in self.RAW_COLUMNS:
+                self._columns[name] = np.empty(capacity, dtype=np.float64)
+        if self.has_clock:
+            for name in self.CLOCK_COLUMNS:
+                self._columns[name] = np.empty(capacity, dtype=np.float64)
+        self._label_codes = np.empty(capacity, dtype=np.int32)
+        self._type_codes = np.empty(capacity, dtype=np.int8)
+        self._device_codes = np.empty(capacity, dtype=np.int16)
+        self._capacity = capacity
+        self._count = 0
+
+        self.labels = []            # code -> label string
+        self._label_index = {}      # label string -> code
+        self._segments = {}         # code -> [[start, stop], ...]
+        self._label_counts = {}     # code -> number of rows
+        self.devices = []           # code -> device id string
+        self._device_index = {}     # device id -> code
+        self._last_key = None       # (label code, type code) of the newest row
+        self._bounds = None         # [xmin, xmax, ymin, ymax]
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def intern_label(self, label):
+        """Return the integer code for a label, registering it if new"""
+        code = self._label_index.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.labels.append(label)
+            self._label_index[label] = code
+            self._segments[code] = []
+            self._label_counts[code] = 0
+        return code
+
+    def intern_device(self, device):
+        code = self._device_index.get(device)
+        if code is None:
+            code = len(self.devices)
+            self.devices.append(device)
+            self._device_index[device] = code
+        return code
+
+    def enable_raw(self):
+        """Start keeping raw columns; rows stored so far get their x/y/z as raw values"""
+        with self._lock:
+            if self.has_raw:
+                return
+            for name, source in zip(self.RAW_COLUMNS, ('x', 'y', 'z')):
+                self._columns[name] = self._columns[source].copy()
+            self.has_raw = True
+
+    def enable_clock(self):
+        """Start keeping clock columns; rows stored so far get NaN"""
+        with self._lock:
+            if self.has_clock:
+                return
+            for name in self.CLOCK_COLUMNS:
+                self._columns[name] = np.full(self._capacity, np.nan)
+            self.has_clock = True
+
+    def extra_columns(self):
+        """Names of the optional columns kept, in export order"""
+        return ((self.RAW_COLUMNS if self.has_raw else ())
+                + (self.CLOCK_COLUMNS if self.has_clock else ()))
+
+    def has_column(self, name):
+        return name in self._columns
+
+    def _grow(self):
+        """Double the capacity; the caller holds the lock"""
+        capacity = self._capacity * 2
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._count] = column[:self._count]
+            self._columns[name] = grown
+        for attr in ('_label_codes', '_type_codes', '_device_codes'):
+            column = getattr(self, attr)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._count] = column[:self._count]
+            setattr(self, attr, grown)
+        self._capacity = capacity
+
+    def append(self, timestamp, x, y, z, label, sample_type, device="", raw=None, clock=None):
+        """Append one sample; consecutive rows with the same label share a segment.
+
+        ``raw`` is the unfiltered (x, y, z); it is only stored when the store
+        keeps raw columns and defaults to the filtered values. ``clock`` is
+        (hedge_time, host_time), stored when the store keeps clock columns
+        and NaN when not given.
+        """
+        with self._lock:
+            self._append(timestamp, x, y, z, label, sample_type, device, raw, clock)
+
+    def _append(self, timestamp, x, y, z, label, sample_type, device, raw, clock):
+        if self._count == self._capacity:
+            self._grow()
+
+        i = self._count
+        label_code = self.intern_label(label)
+        type_code = self.TYPES.index(sample_type)
+        columns = self._columns
+        columns['timestamp'][i] = timestamp
+        columns['x'][i] = x
+        columns['y'][i] = y
+        columns['z'][i] = z
+        if self.has_raw:
+            raw_x, raw_y, raw_z = raw if raw is not None else (x, y, z)
+            columns['raw_x'][i] = raw_x
+            columns['raw_y'][i] = raw_y
+            columns['raw_z'][i] = raw_z
+        if self.has_clock:
+            hedge_time, host_time = clock if clock is not None else (np.nan, np.nan)
+            columns['hedge_time'][i] = hedge_time
+            columns['host_time'][i] = host_time
+        self._label_codes[i] = label_code
+        self._type_codes[i] = type_code
+        self._device_codes[i] = self.intern_device(device)
+
+        key = (label_code, type_code)
+        segments = self._segments[label_code]
+        if key == self._last_key:
+            segments[-1][1] = i + 1
+        else:
+            segments.append([i, i + 1])
+            self._last_key = key
+        self._label_counts[label_code] += 1
+
+        if self._bounds is None:
+            self._bounds = [x, x, y, y]
+        else:
+            bounds = self._bounds
+            if x < bounds[0]:
+                bounds[0] = x
+            elif x > bounds[1]:
+                bounds[1] = x
+            if y < bounds[2]:
+                bounds[2] = y
+            elif y > bounds[3]:
+                bounds[3] = y
+
+        # Publish the row only once every column has been written
+        self._count = i + 1
+
+    def extend(self, timestamp, x, y, z, label_codes, label_names, type_codes,
+               device_codes=None, device_names=("",), raw=None, clock=None):
+        """Bulk-append columns; label_codes/device_codes index into label_names/device_names.
+
+        ``raw`` is an optional (raw_x, raw_y, raw_z) tuple of arrays and
+        ``clock`` an optional (hedge_time, host_time) one, see :meth:`append`.
+        """
+        with self._lock:
+            self._extend(timestamp, x, y, z, label_codes, label_names, type_codes,
+                         device_codes, device_names, raw, clock)
+
+    def _extend(self, timestamp, x, y, z, label_codes, label_names, type_codes,
+                device_codes, device_names, raw, clock):
+        n = len(timestamp)
+        if n == 0:
+            return
+        while self._count + n > self._capacity:
+            self._grow()
+
+        remap = np.array([self.intern_label(name) for name in label_names], dtype=np.int32)
+        codes = remap[np.asarray(label_codes)]
+        type_codes = np.asarray(type_codes, dtype=np.int8)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+
+        start = self._count
+        stop = start + n
+        columns = self._columns
+        columns['timestamp'][start:stop] = timestamp
+        columns['x'][start:stop] = x
+        columns['y'][start:stop] = y
+        columns['z'][start:stop] = z
+        if self.has_raw:
+            for name, values in zip(self.RAW_COLUMNS, raw if raw is not None else (x, y, z)):
+                columns[name][start:stop] = values
+        if self.has_clock:
+            for name, values in zip(self.CLOCK_COLUMNS, clock if clock is not None else (np.nan, np.nan)):
+                columns[name][start:stop] = values
+        self._label_codes[start:stop] = codes
+        self._type_codes[start:stop] = type_codes
+        device_remap = np.array([self.intern_device(name) for name in device_names], dtype=np.int16)
+        if device_codes is None:
+            self._device_codes[start:stop] = device_remap[0]
+        else:
+            self._device_codes[start:stop] = device_remap[np.asarray(device_codes)]
+
+        # Split the batch into runs of identical (label, type) and index them
+        keys = codes.astype(np.int64) * 256 + type_codes
+        change = np.flatnonzero(np.diff(keys)) + 1
+        run_starts = np.concatenate(([0], change))
+        run_stops = np.concatenate((change, [n]))
+        for run_start, run_stop in zip(run_starts.tolist(), run_stops.tolist()):
+            key = (int(codes[run_start]), int(type_codes[run_start]))
+            segments = self._segments[key[0]]
+            if key == self._last_key and segments and segments[-1][1] == start + run_start:
+                segments[-1][1] = start + run_stop
+            else:
+                segments.append([start + run_start, start + run_stop])
+            self._last_key = key
+            self._label_counts[key[0]] += run_stop - run_start
+
+        batch_bounds = [float(x.min()), float(x.max()), float(y.min()), float(y.max())]
+        if self._bounds is None:
+            self._bounds = batch_bounds
+        else:
+            bounds = self._bounds
+            bounds[0] = min(bounds[0], batch_bounds[0])
+            bounds[1] = max(bounds[1], batch_bounds[1])
+            bounds[2] = min(bounds[2], batch_bounds[2])
+            bounds[3] = max(bounds[3], batch_bounds[3])
+
+        self._count = stop
+
+    def column(self, name):
+        """Return a view of one numeric column over all stored rows"""
+        return self._columns[name][:self._count]
+
+    @property
+    def timestamps(self):
+        return self.column('timestamp')
+
+    @property
+    def x(self):
+        return self.column('x')
+
+    @property
+    def y(self):
+        return self.column('y')
+
+    @property
+    def z(self):
+        return self.column('z')
+
+    @property
+    def label_codes(self):
+        return self._label_codes[:self._count]
+
+    @property
+    def type_codes(self):
+        return self._type_codes[:self._count]
+
+    @property
+    def device_codes(self):
+        return self._device_codes[:self._count]
+
+    def bounds(self):
+        """Return (xmin, xmax, ymin, ymax) over all rows, or None when empty"""
+        return tuple(self._bounds) if self._bounds is not None else None
+
+    def label_count(self, label):
+        """Number of rows carrying a label, in O(1)"""
+        code = self._label_index.get(label)
+        return self._label_counts[code] if code is not None else 0
+
+    def label_slices(self, label):
+        """Row slices covering every segment recorded under a label"""
+        code = self._label_index.get(label)
+        if code is None:
+            return []
+        return [slice(start, stop) for start, stop in self._segments[code]]
+
+    def label_column(self, label, name):
+        """Concatenate one column over a label's segments"""
+        parts = [self._columns[name][s] for s in self.label_slices(label)]
+        if not parts:
+            return np.empty(0, dtype=self._columns[name].dtype)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def snapshot(self):
+        """Views of every column over the rows stored right now, plus the name tables.
+
+        Safe to take while another thread appends: a row is published only
+        after all of its columns are written, and growing or clearing the
+        store swaps in new arrays rather than overwriting these.
+        """
+        count = self._count
+        snapshot = {name: column[:count] for name, column in list(self._columns.items())}
+        snapshot['label_codes'] = self._label_codes[:count]
+        snapshot['type_codes'] = self._type_codes[:count]
+        snapshot['device_codes'] = self._device_codes[:count]
+        snapshot['labels'] = list(self.labels)
+        snapshot['devices'] = list(self.devices)
+        return snapshot
+
+    def iter_rows(self, start=0, stop=None):
+        """Yield (timestamp, x, y, z, label, type, device) tuples for export.
+
+        Optional columns (see :meth:`extra_columns`) are appended to each tuple.
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        columns = self._columns
+        labels = self.labels
+        types = self.TYPES
+        devices = self.devices
+        raw_columns = [columns[name] for name in self.extra_columns()]
+        for i in range(start, stop):
+            yield (float(columns['timestamp'][i]), float(columns['x'][i]),
+                   float(columns['y'][i]), float(columns['z'][i]),
+                   labels[self._label_codes[i]], types[self._type_codes[i]],
+                   devices[self._device_codes[i]]) + tuple(float(c[i]) for c in raw_columns)
@@ -0,0 +1,449 @@
+"""Compact binary session format (.mms).
+
+Layout::
+
+    [64-byte header][record_count fixed-width records][raw block][clock block][JSON table]
+
+Records are a NumPy structured dtype, so a session can be opened with
+``np.memmap`` and sliced without parsing. The label table comes after the
+records so that a writer can stream records first and patch the header last.
+The optional raw block holds the unfiltered (raw_x, raw_y, raw_z) as
+record_count rows of three float64; the optional clock block holds
+(hedge_time, host_time) as record_count rows of two float64. Their offsets
+are stored in the table, so readers that predate them simply skip them.
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+from recorder import CLOCK_FIELDNAMES, FIELDNAMES, RAW_FIELDNAMES, format_datetimes
+from sample_store import SampleStore
+
+MAGIC = b'MMSESS01'
+VERSION = 2
+HEADER_SIZE = 64
+# magic, version, flags, record size, record count, table offset, table length
+HEADER_STRUCT = struct.Struct('<8sHHIQQQ')
+
+RECORD_DTYPE = np.dtype({
+    'names': ['timestamp', 'x', 'y', 'z', 'label', 'type', 'device'],
+    'formats': ['<f8', '<f8', '<f8', '<f8', '<i4', 'i1', '<i2'],
+    'offsets': [0, 8, 16, 24, 32, 36, 38],
+    'itemsize': 40,
+})
+
+SESSION_EXTENSION = '.mms'
+CHUNK_ROWS = 262144
+# Files saved next to a session that are not sessions themselves: label_stats.summary_path,
+# coverage.coverage_path and zones.zone_events_path
+SIDECAR_SUFFIXES = ('_summary.csv', '_coverage.npz', '_zones.csv')
+
+
+class SessionFormatError(Exception):
+    pass
+
+
+def is_sidecar(path):
+    """True for the summary, coverage and zone event files written next to a session"""
+    return path.lower().endswith(SIDECAR_SUFFIXES)
+
+
+class BinarySession:
+    """Read-only, memory-mapped view of a .mms session file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_STRUCT.size:
+                raise SessionFormatError(f"{path}: file too short")
+            magic, version, _flags, record_size, count, table_offset, table_length = \
+                HEADER_STRUCT.unpack_from(header)
+            if magic != MAGIC:
+                raise SessionFormatError(f"{path}: not a Marvelmind session file")
+            if version > VERSION or record_size != RECORD_DTYPE.itemsize:
+                raise SessionFormatError(f"{path}: unsupported session version {version}")
+            f.seek(table_offset)
+            table = json.loads(f.read(table_length).decode('utf-8'))
+
+        self.version = version
+        self.labels = table['labels']
+        self.types = table['types']
+        # Version 1 files predate the device column and leave those bytes undefined
+        self.devices = table.get('devices', [""])
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r',
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        self.raw = None
+        if count and table.get('raw_offset') is not None:
+            self.raw = np.memmap(path, dtype='<f8', mode='r',
+                                 offset=table['raw_offset'], shape=(count, 3))
+        self.clock = None
+        if count and table.get('clock_offset') is not None:
+            self.clock = np.memmap(path, dtype='<f8', mode='r',
+                                   offset=table['clock_offset'], shape=(count, 2))
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, name):
+        return self.records[name]
+
+    def device_codes(self, start=0, stop=None):
+        if self.version < 2:
+            stop = len(self) if stop is None else min(stop, len(self))
+            return np.zeros(max(stop - start, 0), dtype=np.int16)
+        return self.records['device'][start:stop]
+
+    def label_mask(self, label):
+        """Boolean row mask for one label"""
+        if label not in self.labels:
+            return np.zeros(len(self), dtype=bool)
+        return self.records['label'] == self.labels.index(label)
+
+    def to_store(self, store=None, chunk_rows=CHUNK_ROWS):
+        """Load the session into a SampleStore"""
+        store = store if store is not None else SampleStore(initial_capacity=max(len(self), 1))
+        if self.raw is not None:
+            store.enable_raw()
+        if self.clock is not None:
+            store.enable_clock()
+        type_remap = np.array([SampleStore.TYPES.index(t) for t in self.types], dtype=np.int8)
+        for start in range(0, len(self), chunk_rows):
+            chunk = self.records[start:start + chunk_rows]
+            raw = self.raw[start:start + chunk_rows].T if self.raw is not None else None
+            clock = self.clock[start:start + chunk_rows].T if self.clock is not None else None
+            store.extend(chunk['timestamp'], chunk['x'], chunk['y'], chunk['z'],
+                         chunk['label'], self.labels, type_remap[chunk['type']],
+                         self.device_codes(start, start + chunk_rows), self.devices, raw, clock)
+        return store
+
+
+def open_session(path):
+    return BinarySession(path)
+
+
+def _write_header(f, count, table_offset, table_length):
+    header = HEADER_STRUCT.pack(MAGIC, VERSION, 0, RECORD_DTYPE.itemsize,
+                                count, table_offset, table_length)
+    f.seek(0)
+    f.write(header.ljust(HEADER_SIZE, b'\0'))
+
+
+def _columns(store):
+    """Column snapshot of a SampleStore; a snapshot() passed in is used as is"""
+    return store.snapshot() if isinstance(store, SampleStore) else store
+
+
+def write_session(path, store, chunk_rows=CHUNK_ROWS, progress=None):
+    """Write a SampleStore (or a snapshot() of one) to a .mms file.
+
+    Only rows present when the call starts are written, so a collection can
+    keep appending while this runs on another thread. ``progress(done, total)``
+    is called after each chunk; raising from it aborts the write.
+    """
+    columns = _columns(store)
+    count = len(columns['timestamp'])
+    blocks = [names for names in (SampleStore.RAW_COLUMNS, SampleStore.CLOCK_COLUMNS)
+              if all(name in columns for name in names)]
+    total = count * (1 + len(blocks))
+    with open(path, 'wb') as f:
+        _write_header(f, 0, 0, 0)
+        records = np.zeros(min(chunk_rows, max(count, 1)), dtype=RECORD_DTYPE)
+        for start in range(0, count, chunk_rows):
+            stop = min(start + chunk_rows, count)
+            chunk = records[:stop - start]
+            for name in ('timestamp', 'x', 'y', 'z'):
+                chunk[name] = columns[name][start:stop]
+            chunk['label'] = columns['label_codes'][start:stop]
+            chunk['type'] = columns['type_codes'][start:stop]
+            chunk['device'] = columns['device_codes'][start:stop]
+            f.write(chunk.tobytes())
+            if progress:
+                progress(stop, total)
+        offsets = {}
+        for block, names in enumerate(blocks, 1):
+            if not count:
+                break
+            offsets[names] = f.tell()
+            for start in range(0, count, chunk_rows):
+                stop = min(start + chunk_rows, count)
+                values = np.column_stack([columns[name][start:stop] for name in names])
+                f.write(values.astype('<f8').tobytes())
+                if progress:
+                    progress(block * count + stop, total)
+        table = json.dumps({'labels': columns['labels'], 'types': list(SampleStore.TYPES),
+                            'devices': columns['devices'],
+                            'raw_offset': offsets.get(SampleStore.RAW_COLUMNS),
+                            'clock_offset': offsets.get(SampleStore.CLOCK_COLUMNS)}).encode('utf-8')
+        table_offset = f.tell()
+        f.write(table)
+        _write_header(f, count, table_offset, len(table))
+
+
+def _csv_rows(timestamp, x, y, z, labels, types, devices, extra=()):
+    """Export rows for one chunk of columns; labels/types/devices are per-row name lists"""
+    return zip(timestamp.tolist(), format_datetimes(timestamp), x.tolist(), y.tolist(), z.tolist(),
+               labels, types, devices, *(column.tolist() for column in extra))
+
+
+def write_csv(path, store, chunk_rows=CHUNK_ROWS, progress=None):
+    """Write a SampleStore (or a snapshot() of one) to CSV, with raw and clock columns when kept.
+
+    Rows are formatted a chunk at a time, with the datetime column
+    vectorized, and go out through a large file buffer. Threading and
+    ``progress`` behave as in :func:`write_session`.
+    """
+    columns = _columns(store)
+    count = len(columns['timestamp'])
+    raw_names = [name for name in SampleStore.RAW_COLUMNS if name in columns]
+    clock_names = [name for name in SampleStore.CLOCK_COLUMNS if name in columns]
+    labels = np.array(columns['labels'], dtype=object)
+    types = np.array(SampleStore.TYPES, dtype=object)
+    devices = np.array(columns['devices'] or [""], dtype=object)
+    with open(path, 'w', newline='', buffering=1 << 20) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(FIELDNAMES + (RAW_FIELDNAMES if raw_names else [])
+                        + (CLOCK_FIELDNAMES if clock_names else []))
+        for start in range(0, count, chunk_rows):
+            part = slice(start, min(start + chunk_rows, count))
+            writer.writerows(_csv_rows(
+                columns['timestamp'][part], columns['x'][part], columns['y'][part], columns['z'][part],
+                labels[columns['label_codes'][part]].tolist(), types[columns['type_codes'][part]].tolist(),
+                devices[columns['device_codes'][part]].tolist(),
+                [columns[name][part] for name in raw_names + clock_names]))
+            if progress:
+                progress(part.stop, count)
+
+
+def _intern_column(values, index, names):
+    """Map strings to codes; ``index`` and ``names`` hold the codes seen so far and grow in step"""
+    codes = np.fromiter(map(lambda value: index.setdefault(value, len(index)), values),
+                        dtype=np.int32, count=len(values))
+    names.extend(list(index)[len(names):])
+    return codes
+
+
+def iter_csv_chunks(path, chunk_rows=CHUNK_ROWS, progress=None):
+    """Yield column dicts of at most chunk_rows rows from a session CSV.
+
+    Each dict holds float arrays for timestamp/x/y/z plus label and device
+    codes, the lists they index and type codes (SampleStore.TYPES order).
+    Files written before the device column existed load with device "".
+    ``raw`` is a (raw_x, raw_y, raw_z) tuple when the file has raw columns, else None,
+    and ``clock`` likewise a (hedge_time, host_time) tuple.
+    Each chunk is converted column by column (NumPy parses the numbers), so
+    memory stays bounded by chunk_rows whatever the file size.
+    ``progress(bytes_read, file_size)`` is called after each chunk.
+    """
+    label_index = {}
+    labels = []
+    device_index = {}
+    devices = []
+    type_index = {name: code for code, name in enumerate(SampleStore.TYPES)}
+    size = os.path.getsize(path)
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        try:
+            cols = [header.index(name) for name in ('timestamp', 'x', 'y', 'z', 'label', 'type')]
+        except ValueError:
+            raise SessionFormatError(f"{path}: missing columns, expected {FIELDNAMES}")
+        ts_i, x_i, y_i, z_i, label_i, type_i = cols
+        device_i = header.index('device') if 'device' in header else None
+        raw_i = [header.index(name) for name in RAW_FIELDNAMES] if set(RAW_FIELDNAMES) <= set(header) else None
+        clock_i = [header.index(name) for name in CLOCK_FIELDNAMES] if set(CLOCK_FIELDNAMES) <= set(header) else None
+        width = len(header)
+
+        while True:
+            rows = [row for _, row in zip(range(chunk_rows), reader) if row]
+            if not rows:
+                break
+            if min(map(len, rows)) < width:
+                # Rows written before trailing columns existed
+                rows = [row + [""] * (width - len(row)) for row in rows]
+            column = lambda i: [row[i] for row in rows]
+            numbers = [np.array(column(i), dtype=np.float64) for i in (ts_i, x_i, y_i, z_i)]
+            label_codes = _intern_column(column(label_i), label_index, labels)
+            types_seen = list(SampleStore.TYPES)
+            type_codes = _intern_column(column(type_i), type_index, types_seen).astype(np.int8)
+            if len(types_seen) > len(SampleStore.TYPES):
+                raise SessionFormatError(f"{path}: unknown collection type {types_seen[-1]!r}")
+            if device_i is None:
+                devices[:] = [""]
+                device_codes = np.zeros(len(rows), dtype=np.int16)
+            else:
+                device_codes = _intern_column(column(device_i), device_index, devices).astype(np.int16)
+            raw = clock = None
+            if raw_i is not None:
+                raw = tuple(np.array(column(i), dtype=np.float64) for i in raw_i)
+            if clock_i is not None:
+                # Blank in rows appended before the columns existed
+                clock = tuple(np.array([value or 'nan' for value in column(i)], dtype=np.float64)
+                              for i in clock_i)
+            if progress:
+                # The binary buffer runs a little ahead of the parser; close enough for a progress bar
+                progress(min(f.buffer.tell(), size), size)
+            yield {
+                'timestamp': numbers[0], 'x': numbers[1],
+                'y': numbers[2], 'z': numbers[3],
+                'label_codes': label_codes, 'labels': list(labels), 'type_codes': type_codes,
+                'device_codes': device_codes, 'devices': list(devices), 'raw': raw,
+                'clock': clock,
+            }
+
+
+def iter_session_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Like iter_csv_chunks, for either a .csv or a .mms session"""
+    if not path.lower().endswith(SESSION_EXTENSION):
+        yield from iter_csv_chunks(path, chunk_rows)
+        return
+    session = open_session(path)
+    type_remap = np.array([SampleStore.TYPES.index(t) for t in session.types], dtype=np.int8)
+    for start in range(0, len(session), chunk_rows):
+        chunk = session.records[start:start + chunk_rows]
+        yield {
+            'timestamp': np.array(chunk['timestamp']), 'x': np.array(chunk['x']),
+            'y': np.array(chunk['y']), 'z': np.array(chunk['z']),
+            'label_codes': np.array(chunk['label']), 'labels': session.labels,
+            'type_codes': type_remap[chunk['type']],
+            'device_codes': np.array(session.device_codes(start, start + chunk_rows)),
+            'devices': session.devices,
+            'raw': tuple(np.array(c) for c in session.raw[start:start + chunk_rows].T)
+            if session.raw is not None else None,
+            'clock': tuple(np.array(c) for c in session.clock[start:start + chunk_rows].T)
+            if session.clock is not None else None,
+        }
+
+
+def load_csv(path, store=None, chunk_rows=CHUNK_ROWS):
+    """Load a CSV written by this tool into a SampleStore"""
+    store = store if store is not None else SampleStore()
+    for chunk in iter_csv_chunks(path, chunk_rows):
+        if chunk['raw'] is not None:
+            store.enable_raw()
+        if chunk['clock'] is not None:
+            store.enable_clock()
+        store.extend(chunk['timestamp'], chunk['x'], chunk['y'], chunk['z'],
+                     chunk['label_codes'], chunk['labels'], chunk['type_codes'],
+                     chunk['device_codes'], chunk['devices'], chunk['raw'], chunk['clock'])
+    return store
+
+
+def save_any(path, store, progress=None):
+    """Write a SampleStore as .mms or CSV depending on the file name"""
+    if path.lower().endswith(SESSION_EXTENSION):
+        write_session(path, store, progress=progress)
+    else:
+        write_csv(path, store, progress=progress)
+
+
+def load_any(path, store=None):
+    """Load a .mms or .csv session into a SampleStore"""
+    if path.lower().endswith(SESSION_EXTENSION):
+        return open_session(path).to_store(store)
+    return load_csv(path, store)
+
+
+def csv_to_session(csv_path, session_path, chunk_rows=CHUNK_ROWS, progress=None):
+    """Convert a CSV export to .mms; memory stays bounded by chunk_rows.
+
+    ``progress`` is passed to :func:`iter_csv_chunks`.
+    """
+    count = 0
+    labels = []
+    devices = [""]
+    # Raw and clock columns go after all records, so spool them until the records are written
+    with open(session_path, 'wb') as f, tempfile.TemporaryFile() as raw_spool, \
+            tempfile.TemporaryFile() as clock_spool:
+        _write_header(f, 0, 0, 0)
+        has_raw = has_clock = False
+        for chunk in iter_csv_chunks(csv_path, chunk_rows, progress):
+            records = np.zeros(len(chunk['timestamp']), dtype=RECORD_DTYPE)
+            for name in ('timestamp', 'x', 'y', 'z'):
+                records[name] = chunk[name]
+            records['label'] = chunk['label_codes']
+            records['type'] = chunk['type_codes']
+            records['device'] = chunk['device_codes']
+            f.write(records.tobytes())
+            if chunk['raw'] is not None:
+                has_raw = True
+                raw_spool.write(np.column_stack(chunk['raw']).astype('<f8').tobytes())
+            if chunk['clock'] is not None:
+                has_clock = True
+                clock_spool.write(np.column_stack(chunk['clock']).astype('<f8').tobytes())
+            count += len(records)
+            labels = chunk['labels']
+            devices = chunk['devices']
+        raw_offset = None
+        if has_raw and count:
+            raw_offset = f.tell()
+            raw_spool.seek(0)
+            shutil.copyfileobj(raw_spool, f)
+        clock_offset = None
+        if has_clock and count:
+            clock_offset = f.tell()
+            clock_spool.seek(0)
+            shutil.copyfileobj(clock_spool, f)
+        table = json.dumps({'labels': labels, 'types': list(SampleStore.TYPES), 'devices': devices,
+                            'raw_offset': raw_offset, 'clock_offset': clock_offset}).encode('utf-8')
+        table_offset = f.tell()
+        f.write(table)
+        _write_header(f, count, table_offset, len(table))
+    return count
+
+
+def session_to_csv(session_path, csv_path, chunk_rows=CHUNK_ROWS):
+    """Export a .mms session to the CSV columns used by the GUI"""
+    session = open_session(session_path)
+    labels = np.array(session.labels, dtype=object)
+    types = np.array(session.types, dtype=object)
+    devices = np.array(session.devices, dtype=object)
+    with open(csv_path, 'w', newline='', buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES + (RAW_FIELDNAMES if session.raw is not None else [])
+                        + (CLOCK_FIELDNAMES if session.clock is not None else []))
+        for start in range(0, len(session), chunk_rows):
+            chunk = session.records[start:start + chunk_rows]
+            extra = [block[start:start + chunk_rows].T for block in (session.raw, session.clock)
+                     if block is not None]
+            writer.writerows(_csv_rows(
+                chunk['timestamp'], chunk['x'], chunk['y'], chunk['z'],
+                labels[chunk['label']].tolist(), types[chunk['type']].tolist(),
+                devices[session.device_codes(start, start + chunk_rows)].tolist(),
+                [column for block in extra for column in block]))
+    return len(session)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Marvelmind sessions between CSV and .mms")
+    sub = parser.add_subparsers(dest='command', required=True)
+    to_bin = sub.add_parser('import', help="CSV -> .mms")
+    to_bin.add_argument('csv_path')
+    to_bin.add_argument('session_path')
+    to_csv = sub.add_parser('export', help=".mms -> CSV")
+    to_csv.add_argument('session_path')
+    to_csv.add_argument('csv_path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        count = csv_to_session(args.csv_path, args.session_path)
+        print(f"Wrote {count} samples to {args.session_path}")
+    else:
+        count = session_to_csv(args.session_path, args.csv_path)
+        print(f"Wrote {count} samples to {args.csv_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedSampleRing:
+    """Single-producer, single-consumer ring of samples in shared memory.
+
+    One process writes, another reads, and neither takes a lock: the
+    producer only ever advances the write counter and the consumer only the
+    read counter, each a 64-bit integer on its own cache line. A slot is
+    published by bumping the write counter after every field is written (as
+    in SampleStore), and it is reused only once the consumer has moved the
+    read counter past it. A full ring drops the new sample and counts it
+    instead of blocking the producer.
+
+    The consumer reads slots in place through NumPy views of the shared
+    block; nothing is pickled or sent through a pipe.
+    """
+
+    DTYPE = np.dtype([
+        ('timestamp', np.float64),      # aligned, on the clock_sync.now() time base
+        ('x', np.float64),
+        ('y', np.float64),
+        ('z', np.float64),
+        ('angle', np.float64),
+        ('hedge_time', np.float64),
+        ('host_time', np.float64),
+        ('stamp', np.int64),            # beacon timestamp as received
+        ('address', np.int32),          # hedgehog address
+        ('port', np.int32),             # index into the producer's port list
+    ])
+    # Counter positions in the int64 header, 64 bytes apart
+    WRITE, READ, DROPPED = 0, 8, 16
+    HEADER_BYTES = 256
+
+    def __init__(self, name=None, capacity=65536):
+        """Create a ring of ``capacity`` slots, or attach to the one called ``name``"""
+        if name is None:
+            if capacity <= 0:
+                raise ValueError("capacity must be positive")
+            size = self.HEADER_BYTES + int(capacity) * self.DTYPE.itemsize
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        buf = self._shm.buf
+        self._header = np.ndarray((self.HEADER_BYTES // 8,), dtype=np.int64, buffer=buf)
+        if self.owner:
+            self._header[:] = 0
+            self._header[-1] = capacity
+        self.capacity = int(self._header[-1])
+        self._slots = np.ndarray((self.capacity,), dtype=self.DTYPE, buffer=buf, offset=self.HEADER_BYTES)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __len__(self):
+        """Samples written but not yet released by the consumer"""
+        header = self._header
+        return int(header[self.WRITE] - header[self.READ])
+
+    @property
+    def dropped(self):
+        return int(self._header[self.DROPPED])
+
+    def push(self, timestamp, x, y, z, angle, stamp, address, port, hedge_time, host_time):
+        """Producer side: store one sample; returns False (and counts it) when the ring is full"""
+        header = self._header
+        write = int(header[self.WRITE])
+        if write - int(header[self.READ]) >= self.capacity:
+            header[self.DROPPED] += 1
+            return False
+        self._slots[write % self.capacity] = (timestamp, x, y, z, angle, hedge_time, host_time,
+                                              stamp, address, port)
+        header[self.WRITE] = write + 1
+        return True
+
+    def views(self, limit=None):
+        """Consumer side: up to two views covering the unread samples, oldest first.
+
+        The slots stay valid until :meth:`release` is called for them.
+        """
+        header = self._header
+        read = int(header[self.READ])
+        count = int(header[self.WRITE]) - read
+        if limit is not None:
+            count = min(count, limit)
+        if count <= 0:
+            return ()
+        start = read % self.capacity
+        stop = start + count
+        if stop <= self.capacity:
+            return (self._slots[start:stop],)
+        return self._slots[start:], self._slots[:stop - self.capacity]
+
+    def release(self, count):
+        """Consumer side: hand ``count`` read slots back to the producer"""
+        self._header[self.READ] += count
+
+    def discard(self):
+        """Consumer side: skip everything written so far"""
+        self._header[self.READ] = self._header[self.WRITE]
+
+    def close(self):
+        """Detach; the creating side also frees the shared block"""
+        if self._shm is None:
+            return
+        # Views into the block must be gone before it can be closed
+        self._header = self._slots = None
+        shm, self._shm = self._shm, None
+        shm.close()
+        if self.owner:
+            shm.unlink()
@@ -0,0 +1,169 @@
+import collections
+import functools
+import math
+import random
+import threading
+import time
+import zlib
+
+
+class SimulatedHedge(threading.Thread):
+    """Drop-in stand-in for MarvelmindHedge that synthesizes positions.
+
+    Accepts the same constructor arguments as ``MarvelmindHedge`` (extra ones
+    are ignored) and exposes ``position()``, ``stop()`` and the
+    ``recieveUltrasoundPositionCallback`` hook, so TrackerCore and the
+    benchmarks can run without hardware. Packets are paced against a
+    monotonic deadline, so rates from 10 Hz up to about 1 kHz stay accurate.
+    """
+
+    TRAJECTORIES = ('circle', 'figure8', 'random_walk', 'static')
+
+    def __init__(self, adr=None, tty="sim", baud=9600, maxvaluescount=3, debug=False,
+                 recieveUltrasoundPositionCallback=None, rate=100.0, trajectory='circle',
+                 addresses=(1,), noise=0.01, radius=2.0, period=20.0, seed=None, **kwargs):
+        super().__init__(daemon=True)
+        if trajectory not in self.TRAJECTORIES:
+            raise ValueError(f"Unknown trajectory: {trajectory}")
+        self.tty = tty
+        self.adr = adr
+        self.debug = debug
+        self.rate = float(rate)
+        self.trajectory = trajectory
+        self.addresses = [adr] if adr is not None else list(addresses)
+        self.noise = noise
+        self.radius = radius
+        self.period = period
+        self.recieveUltrasoundPositionCallback = recieveUltrasoundPositionCallback
+        self.valuesUltrasoundPosition = collections.deque([[0] * 6] * maxvaluescount, maxlen=maxvaluescount)
+        self.positionUpdated = False
+        self.terminationRequired = False
+        self.packets_sent = 0
+        self._random = random.Random(seed if seed is not None else zlib.crc32(str(tty).encode()))
+        self._walk = {address: [0.0, 0.0] for address in self.addresses}
+
+    def _coordinates(self, address, t):
+        offset = self.addresses.index(address) * 0.5
+        if self.trajectory == 'circle':
+            phase = 2 * math.pi * t / self.period
+            x, y = self.radius * math.cos(phase) + offset, self.radius * math.sin(phase)
+        elif self.trajectory == 'figure8':
+            phase = 2 * math.pi * t / self.period
+            x, y = self.radius * math.sin(phase) + offset, self.radius * math.sin(phase) * math.cos(phase)
+        elif self.trajectory == 'random_walk':
+            walk = self._walk[address]
+            walk[0] += self._random.gauss(0, 0.01)
+            walk[1] += self._random.gauss(0, 0.01)
+            x, y = walk[0] + offset, walk[1]
+        else:
+            x, y = offset, 0.0
+        return (x + self._random.gauss(0, self.noise),
+                y + self._random.gauss(0, self.noise),
+                0.5 + self._random.gauss(0, self.noise))
+
+    def next_packet(self, t):
+        """Build the next [address, x, y, z, angle, timestamp] packet"""
+        address = self.addresses[self.packets_sent % len(self.addresses)]
+        x, y, z = self._coordinates(address, t)
+        return [address, round(x, 3), round(y, 3), round(z, 3), 0.0, round(t * 1000)]
+
+    def publish(self, packet):
+        self.valuesUltrasoundPosition.append(packet)
+        self.positionUpdated = True
+        self.packets_sent += 1
+        if self.recieveUltrasoundPositionCallback is not None:
+            self.recieveUltrasoundPositionCallback()
+
+    def run(self):
+        interval = 1.0 / self.rate
+        start = time.monotonic()
+        deadline = start
+        while not self.terminationRequired:
+            self.publish(self.next_packet(deadline - start))
+            deadline += interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                # Fell far behind (e.g. suspended); resynchronize instead of bursting
+                deadline = time.monotonic()
+
+    def position(self):
+        return list(self.valuesUltrasoundPosition)[-1]
+
+    def stop(self):
+        self.terminationRequired = True
+        if self.debug:
+            print(f"Simulated hedge {self.tty} stopped after {self.packets_sent} packets")
+
+
+class ReplayHedge(SimulatedHedge):
+    """Replays a recorded CSV or .mms session as if it came from a hedge.
+
+    With ``rate`` set, samples are emitted at that fixed rate; otherwise the
+    recorded inter-sample timing is reproduced, scaled by ``speed``. Device
+    ids such as ``12@ttyACM0`` are mapped back to their hedgehog address.
+    """
+
+    def __init__(self, path, rate=None, speed=1.0, loop=False, **kwargs):
+        from session_format import load_any
+
+        kwargs.setdefault('tty', f"replay:{path}")
+        super().__init__(rate=rate or 100.0, **kwargs)
+        store = load_any(path)
+        if not store:
+            raise ValueError(f"{path}: session is empty")
+        self.fixed_rate = rate
+        self.speed = speed
+        self.loop = loop
+        self.finished = False
+        self._timestamps = store.timestamps.copy()
+        self._xyz = [store.x.copy(), store.y.copy(), store.z.copy()]
+        device_addresses = []
+        for i, device in enumerate(store.devices):
+            head = device.split('@', 1)[0]
+            device_addresses.append(int(head) if head.isdigit() else i + 1)
+        self._addresses = [device_addresses[code] for code in store.device_codes.tolist()]
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def run(self):
+        n = len(self._timestamps)
+        start = time.monotonic()
+        i = 0
+        elapsed_base = 0.0
+        while not self.terminationRequired:
+            if i == n:
+                if not self.loop:
+                    break
+                elapsed_base = time.monotonic() - start
+                i = 0
+            if self.fixed_rate:
+                due = start + (self.packets_sent + 1) / self.fixed_rate
+            else:
+                due = start + elapsed_base + (self._timestamps[i] - self._timestamps[0]) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            # Beacon timestamp follows the schedule, not the (jittery) wake-up time
+            self.publish([self._addresses[i], float(self._xyz[0][i]), float(self._xyz[1][i]),
+                          float(self._xyz[2][i]), 0.0, round((due - start) * 1000)])
+            i += 1
+        self.finished = True
+
+
+def _make_hedge(options, **kwargs):
+    merged = dict(kwargs)
+    merged.update(options)
+    if 'replay' in merged:
+        return ReplayHedge(merged.pop('replay'), **merged)
+    return SimulatedHedge(**merged)
+
+
+def simulated_hedge_factory(**options):
+    """Return a MarvelmindHedge-compatible factory with fixed simulation options.
+
+    The factory pickles, so it can be handed to an acquisition process.
+    """
+    return functools.partial(_make_hedge, options)
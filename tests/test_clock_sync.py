@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from clock_sync import ClockSync
+
+
+def jittered_packets(count=3000, period=0.01, offset=1000.0, jitter=0.004, seed=0):
+    """(stamp, host_time) pairs: a 1 ms beacon tick plus a non-negative, random arrival latency"""
+    rng = np.random.default_rng(seed)
+    hedge = np.arange(count) * period
+    host = hedge + offset + rng.exponential(jitter, count)
+    # An unusually slow start, so the first minima keep falling
+    host[:20] += np.linspace(0.05, 0.0, 20)
+    return np.round(hedge / 0.001).astype(np.int64), host
+
+
+def test_aligned_times_are_monotonic_and_converge():
+    sync = ClockSync()
+    stamps, host = jittered_packets()
+    aligned = np.array([sync.update(stamp, host_time)[1] for stamp, host_time in zip(stamps, host)])
+    assert np.all(np.diff(aligned) >= 0)
+    # Once settled, the offset is within a couple of packets' latency of the true 1000 s
+    assert sync.offset == pytest.approx(1000.0, abs=0.002)
+    expected = stamps * 0.001 + 1000.0
+    assert np.abs(aligned[-1000:] - expected[-1000:]).max() < 0.002
+    # Aligned spacing follows the beacon, not the arrival jitter
+    assert np.std(np.diff(aligned[-1000:])) < np.std(np.diff(host[-1000:])) / 10
+
+
+def test_fast_packet_never_steps_back():
+    sync = ClockSync()
+    previous = None
+    for i in range(100):
+        # Every packet 20 ms late, then one that arrives with no latency at all
+        host = 50.0 + i * 0.01 + (0.0 if i == 60 else 0.02)
+        aligned = sync.update(i * 10, host)[1]
+        if previous is not None:
+            assert aligned >= previous
+        previous = aligned
+    assert sync.offset == pytest.approx(50.0, abs=1e-9)
+
+
+def test_unwraps_32_bit_stamps():
+    sync = ClockSync()
+    first = sync.update(ClockSync.WRAP - 5, 10.0)[0]
+    second = sync.update(5, 10.01)[0]
+    assert second - first == pytest.approx(0.01)
+
+
+def test_restarted_beacon_resyncs():
+    sync = ClockSync()
+    for i in range(10):
+        sync.update(100000 + i * 10, 5.0 + i * 0.01)
+    sync.update(0, 5.2)
+    assert sync.resets == 1
+    assert sync.offset == pytest.approx(5.2)
+
+
+def test_rejects_catch_up_outside_unit_interval():
+    with pytest.raises(ValueError):
+        ClockSync(catch_up=1.0)
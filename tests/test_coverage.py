@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from coverage import CoverageGrid
+
+
+def as_cells(grid):
+    rows, cols = np.nonzero(grid.counts)
+    return {(int(r) + grid.origin_row, int(c) + grid.origin_col): int(grid.counts[r, c])
+            for r, c in zip(rows, cols)}
+
+
+def test_add_and_add_many_agree_with_a_histogram():
+    rng = np.random.default_rng(2)
+    x, y = rng.uniform(-5, 5, 5000), rng.uniform(-2, 8, 5000)
+    single = CoverageGrid(0.25)
+    for xi, yi in zip(x.tolist(), y.tolist()):
+        single.add(xi, yi)
+    batch = CoverageGrid(0.25)
+    batch.add_many(x, y)
+    expected = {}
+    for xi, yi in zip(x.tolist(), y.tolist()):
+        cell = (int(np.floor(yi / 0.25)), int(np.floor(xi / 0.25)))
+        expected[cell] = expected.get(cell, 0) + 1
+    assert as_cells(single) == as_cells(batch) == expected
+    assert single.total == batch.total == 5000
+
+
+def test_non_finite_samples_are_ignored():
+    grid = CoverageGrid()
+    grid.add(float('nan'), 1.0)
+    grid.add(1.0, float('inf'))
+    grid.add_many([np.nan, 1.0], [0.0, -np.inf])
+    assert grid.total == 0 and grid.dropped == 0 and not grid
+
+
+def test_far_outliers_are_dropped_not_binned():
+    grid = CoverageGrid(0.1, max_span=100)
+    for i in range(50):
+        grid.add(i * 0.1, 0.0)
+    area = grid.covered_area()
+    grid.add(1e9, -1e9)
+    grid.add_many([1e12, 2.05], [0.0, 0.05])
+    assert grid.dropped == 2
+    assert grid.total == 51
+    assert max(grid.counts.shape) <= 100
+    # The in-range sample lands in a covered cell, and the dropped ones cover nothing
+    assert grid.covered_area() == pytest.approx(area)
+
+
+def test_growth_stays_within_max_span():
+    rng = np.random.default_rng(4)
+    grid = CoverageGrid(0.1, max_span=64)
+    for x, y in (rng.normal(0, 1, (3000, 2)) * 10.0 ** rng.integers(0, 5, (3000, 1))).tolist():
+        grid.add(x, y)
+        assert max(grid.counts.shape) <= 64
+    assert grid.total + grid.dropped == 3000
+
+
+def test_copy_save_and_load(tmp_path):
+    grid = CoverageGrid(0.2)
+    grid.add_many(np.linspace(-3, 3, 200), np.linspace(1, 2, 200))
+    copy = grid.copy()
+    grid.add(0.0, 0.0)
+    assert copy.total == 200
+    path = str(tmp_path / "cov.npz")
+    copy.save(path)
+    loaded = CoverageGrid.load(path)
+    assert as_cells(loaded) == as_cells(copy)
+    assert loaded.extent == pytest.approx(copy.extent)
+    assert loaded.cell_size == 0.2
@@ -0,0 +1,53 @@
+import json
+
+import numpy as np
+
+from publisher import (HEADER, KIND_NAMES, KIND_SAMPLES, NAMES_BUDGET, PositionPublisher, _merge_names,
+                       decode)
+
+
+def encode(publisher, samples):
+    return HEADER.pack(b'MMPS', 1, KIND_SAMPLES, len(samples), 7) + publisher._encode(samples)
+
+
+def test_samples_round_trip():
+    publisher = PositionPublisher(udp=('239.255.42.99', 5005))
+    samples = [(1.7e9 + i * 0.01, i * 0.5, -1.0, 0.25, f"{i % 2}@sim", "walk", "dynamic", i % 3 == 0)
+               for i in range(10)]
+    kind, sequence, records = decode(encode(publisher, samples))
+    assert (kind, sequence, len(records)) == (KIND_SAMPLES, 7, 10)
+    np.testing.assert_array_equal(records['timestamp'], [s[0] for s in samples])
+    np.testing.assert_allclose(records['x'], [s[1] for s in samples])
+    assert records['device'].tolist() == [i % 2 for i in range(10)]
+    assert records['flags'].tolist() == [3 if i % 3 == 0 else 2 for i in range(10)]
+
+
+def test_names_split_within_budget_and_merge_back():
+    publisher = PositionPublisher(udp=('239.255.42.99', 5005))
+    labels = [f"label {i} " + "x" * 40 for i in range(80)]
+    devices = [f"{i}@/dev/ttyACM{i}" for i in range(30)]
+    publisher._encode([(0.0, 0, 0, 0, device, label, "static", False)
+                       for label, device in zip(labels, devices * 3)])
+    messages = publisher._names()
+    assert len(messages) > 1
+    merged_labels = merged_devices = None
+    versions = set()
+    for message in messages:
+        kind, version, payload = decode(message)
+        assert kind == KIND_NAMES
+        assert len(json.dumps(payload['labels'] + payload['devices']).encode('utf-8')) <= NAMES_BUDGET + 200
+        versions.add(version)
+        merged_labels = _merge_names(merged_labels, payload['labels'], payload['label_offset'],
+                                     payload['label_total'])
+        merged_devices = _merge_names(merged_devices, payload['devices'], payload['device_offset'],
+                                      payload['device_total'])
+    assert merged_labels == labels
+    assert merged_devices == devices
+    # One names version per rebuild, whatever the number of chunks
+    assert versions == {1}
+    assert {decode(message)[1] for message in publisher._names()} == {2}
+
+
+def test_merge_names_keeps_unknown_codes_empty():
+    assert _merge_names(None, ["c"], 2, 4) == [None, None, "c", None]
+    assert _merge_names(["a", "b"], ["x"], 1, None) == ["a", "x"]
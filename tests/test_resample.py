@@ -0,0 +1,50 @@
+import numpy as np
+
+from resample import resample, resample_store
+from sample_store import SampleStore
+
+
+def make_store():
+    rng = np.random.default_rng(7)
+    store = SampleStore()
+    rows = []
+    for device in ("1@a", "2@b"):
+        t = 100.0 + np.cumsum(rng.uniform(0.005, 0.03, 400))
+        t[200:] += 5.0  # a gap longer than MAX_INTERVAL in the middle of each track
+        rows += [(ti, device) for ti in t.tolist()]
+    rows.sort()
+    for ti, device in rows:
+        store.append(ti, np.sin(ti), np.cos(ti), ti * 0.1, "walk", "dynamic", device)
+    return store
+
+
+def test_matches_per_track_interpolation():
+    store = make_store()
+    result = resample_store(store, 50.0)
+    assert np.all(np.diff(result.timestamps) >= 0)
+    for code, device in enumerate(store.devices):
+        rows = store.device_codes == code
+        t = store.timestamps[rows]
+        grid, x, y, z = resample(t, store.x[rows], store.y[rows], store.z[rows], 1.0 / 50.0)
+        mine = result.device_codes == result.devices.index(device)
+        np.testing.assert_allclose(result.timestamps[mine], grid)
+        np.testing.assert_allclose(result.x[mine], x)
+        np.testing.assert_allclose(result.z[mine], z)
+
+
+def test_grid_is_absolute_and_skips_gaps():
+    store = make_store()
+    result = resample_store(store, 20.0)
+    ticks = result.timestamps * 20.0
+    np.testing.assert_allclose(ticks, np.round(ticks), atol=1e-6)
+    for code in range(len(store.devices)):
+        t = store.timestamps[store.device_codes == code]
+        gap_start, gap_stop = t[199], t[200]
+        mine = result.timestamps[result.device_codes == code]
+        assert not np.any((mine > gap_start) & (mine < gap_stop))
+
+
+def test_short_tracks_give_an_empty_store():
+    store = SampleStore()
+    store.append(1.0, 0, 0, 0, "a", "static")
+    assert len(resample_store(store, 10.0)) == 0
@@ -0,0 +1,117 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from playback import SessionIndex
+from sample_store import SampleStore
+from session_format import (HEADER_SIZE, HEADER_STRUCT, csv_to_session, iter_session_chunks, load_any,
+                            open_session, save_any, write_csv)
+
+
+def make_store(n=1000):
+    rng = np.random.default_rng(3)
+    store = SampleStore(keep_raw=True, keep_clock=True)
+    for i in range(n):
+        x, y, z = rng.normal(size=3)
+        store.append(1.7e9 + i * 0.01, x, y, z, f"label{i // 300}", ('static', 'dynamic')[i % 2],
+                     f"{i % 3}@/dev/ttyACM0", raw=(x + 0.1, y, z), clock=(i * 0.01, 100.0 + i * 0.01))
+    return store
+
+
+def assert_same(store, loaded, devices=True):
+    assert len(loaded) == len(store)
+    for name in ('timestamp', 'x', 'y', 'z'):
+        np.testing.assert_allclose(loaded.column(name), store.column(name), rtol=0, atol=1e-9)
+    for name in SampleStore.RAW_COLUMNS + SampleStore.CLOCK_COLUMNS:
+        np.testing.assert_allclose(loaded.column(name), store.column(name), rtol=0, atol=1e-9)
+    assert ([loaded.labels[c] for c in loaded.label_codes.tolist()]
+            == [store.labels[c] for c in store.label_codes.tolist()])
+    assert loaded.type_codes.tolist() == store.type_codes.tolist()
+    if devices:
+        assert ([loaded.devices[c] for c in loaded.device_codes.tolist()]
+                == [store.devices[c] for c in store.device_codes.tolist()])
+
+
+def test_csv_to_session_round_trip(tmp_path):
+    store = make_store()
+    csv_path, mms_path = str(tmp_path / "run.csv"), str(tmp_path / "run.mms")
+    write_csv(csv_path, store)
+    assert csv_to_session(csv_path, mms_path, chunk_rows=128) == len(store)
+    assert_same(store, load_any(csv_path))
+    assert_same(store, load_any(mms_path))
+    assert open_session(mms_path).version == 2
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.mms'])
+def test_chunks_match_the_store(tmp_path, suffix):
+    store = make_store()
+    path = str(tmp_path / f"run{suffix}")
+    save_any(path, store)
+    chunks = list(iter_session_chunks(path, chunk_rows=300))
+    assert [len(chunk['timestamp']) for chunk in chunks] == [300, 300, 300, 100]
+    np.testing.assert_array_equal(np.concatenate([chunk['timestamp'] for chunk in chunks]), store.timestamps)
+    devices = [chunk['devices'][code] for chunk in chunks for code in chunk['device_codes'].tolist()]
+    assert devices == [store.devices[code] for code in store.device_codes.tolist()]
+    raw_x = np.concatenate([chunk['raw'][0] for chunk in chunks])
+    np.testing.assert_allclose(raw_x, store.column('raw_x'), rtol=0, atol=1e-9)
+
+
+def test_csv_without_device_column_loads_as_one_device(tmp_path):
+    store = make_store(50)
+    path = tmp_path / "old.csv"
+    write_csv(str(path), store)
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    device = rows[0].index('device')
+    with open(path, 'w', newline='') as f:
+        csv.writer(f).writerows(row[:device] + row[device + 1:] for row in rows)
+    loaded = load_any(str(path))
+    assert_same(store, loaded, devices=False)
+    assert loaded.devices == [""]
+
+
+def make_version_1(path, store):
+    """Rewrite a .mms file as version 1: no device table, undefined bytes in the device column"""
+    save_any(path, store)
+    with open(path, 'rb+') as f:
+        magic, version, flags, size, count, table_offset, table_length = HEADER_STRUCT.unpack(
+            f.read(HEADER_STRUCT.size))
+        f.seek(table_offset)
+        table = json.loads(f.read(table_length))
+        del table['devices']
+        body = json.dumps(table).encode('utf-8')
+        f.seek(table_offset)
+        f.write(body)
+        f.truncate()
+        f.seek(0)
+        f.write(HEADER_STRUCT.pack(magic, 1, flags, size, count, table_offset, len(body)))
+        # Garbage where version 2 keeps the device code
+        for row in range(count):
+            f.seek(HEADER_SIZE + row * size + 38)
+            f.write(b'\x7f\x13')
+
+
+def test_version_1_sessions_read_as_one_device(tmp_path):
+    store = make_store(400)
+    path = str(tmp_path / "v1.mms")
+    make_version_1(path, store)
+    session = open_session(path)
+    assert session.version == 1
+    assert session.devices == [""]
+    loaded = load_any(path)
+    assert_same(store, loaded, devices=False)
+    assert loaded.devices == [""]
+    assert all(not chunk['device_codes'].any() for chunk in iter_session_chunks(path, chunk_rows=128))
+    window = SessionIndex(path).window(store.timestamps[0], store.timestamps[-1])
+    assert len(window) == len(store)
+    assert not window['device'].any()
+
+
+def test_version_2_window_keeps_devices(tmp_path):
+    store = make_store(400)
+    path = str(tmp_path / "v2.mms")
+    save_any(path, store)
+    window = SessionIndex(path).window(store.timestamps[0], store.timestamps[-1])
+    assert window['device'].tolist() == store.device_codes.tolist()
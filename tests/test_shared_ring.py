@@ -0,0 +1,130 @@
+import glob
+import threading
+
+import numpy as np
+import pytest
+
+from shared_ring import SharedSampleRing
+
+
+def push(ring, i):
+    return ring.push(float(i), i * 0.5, -i * 0.5, 1.0, 0.0, i, 7, 0, i * 0.001, i * 0.002)
+
+
+def read_all(ring):
+    """Consume everything readable; returns the stamps in the order read"""
+    stamps = []
+    for view in ring.views():
+        stamps.extend(view['stamp'].tolist())
+        ring.release(len(view))
+    return stamps
+
+
+@pytest.fixture
+def ring():
+    ring = SharedSampleRing(capacity=8)
+    yield ring
+    ring.close()
+
+
+def test_fields_round_trip(ring):
+    push(ring, 3)
+    (view,) = ring.views()
+    row = view[0]
+    assert (row['timestamp'], row['x'], row['y'], row['stamp'], row['address']) == (3.0, 1.5, -1.5, 3, 7)
+    assert (row['hedge_time'], row['host_time']) == (0.003, 0.006)
+
+
+def test_wraparound_keeps_order(ring):
+    seen = []
+    for i in range(50):
+        assert push(ring, i)
+        if i % 3 == 2:
+            seen.extend(read_all(ring))
+    seen.extend(read_all(ring))
+    assert seen == list(range(50))
+    assert ring.dropped == 0
+
+
+def test_views_split_at_the_end_of_the_slots(ring):
+    for i in range(6):
+        push(ring, i)
+    read_all(ring)
+    for i in range(6, 12):
+        push(ring, i)
+    views = ring.views()
+    assert len(views) == 2
+    assert np.concatenate([view['stamp'] for view in views]).tolist() == list(range(6, 12))
+
+
+def test_full_ring_drops_and_counts(ring):
+    results = [push(ring, i) for i in range(12)]
+    assert results == [True] * 8 + [False] * 4
+    assert ring.dropped == 4
+    assert len(ring) == 8
+    # The oldest samples are kept; the new ones were dropped
+    assert read_all(ring) == list(range(8))
+    assert push(ring, 12)
+
+
+def test_limit_and_discard(ring):
+    for i in range(5):
+        push(ring, i)
+    assert sum(len(view) for view in ring.views(limit=3)) == 3
+    ring.discard()
+    assert len(ring) == 0
+    assert ring.views() == ()
+
+
+def test_producer_and_consumer_threads():
+    producer_ring = SharedSampleRing(capacity=64)
+    consumer_ring = SharedSampleRing(producer_ring.name)
+    count = 20000
+    pushed = []
+
+    def produce():
+        for i in range(count):
+            if push(producer_ring, i):
+                pushed.append(i)
+
+    thread = threading.Thread(target=produce)
+    thread.start()
+    received = []
+    while thread.is_alive() or len(consumer_ring):
+        received.extend(read_all(consumer_ring))
+    thread.join()
+    received.extend(read_all(consumer_ring))
+    assert received == pushed
+    assert len(pushed) + consumer_ring.dropped == count
+    consumer_ring.close()
+    producer_ring.close()
+
+
+def test_close_frees_the_block():
+    ring = SharedSampleRing(capacity=4)
+    reader = SharedSampleRing(ring.name)
+    name = ring.name
+    reader.close()
+    ring.close()
+    ring.close()  # safe to repeat
+    assert not glob.glob(f"/dev/shm/{name.lstrip('/')}")
+    with pytest.raises(FileNotFoundError):
+        SharedSampleRing(name)
+
+
+def test_acquisition_process_close_while_reading():
+    from acquisition_process import AcquisitionProcess
+
+    process = AcquisitionProcess(["sim"], capacity=16)
+    process.ring = SharedSampleRing(capacity=16)
+    for i in range(10):
+        push(process.ring, i)
+    name = process.ring.name
+    reader = threading.Thread(target=lambda: [process.pop_ready(timeout=0.01) for _ in range(50)])
+    reader.start()
+    process.close()
+    reader.join()
+    assert process.ring is None
+    assert process.pop_ready(timeout=0) == []
+    assert len(process) == 0
+    assert not glob.glob(f"/dev/shm/{name.lstrip('/')}")
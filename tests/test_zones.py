@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pytest
+
+from zones import Zone, ZoneError, ZoneIndex, ZoneTracker, load_zones
+
+
+def brute_force(zones, x, y):
+    return tuple(i for i, zone in enumerate(zones) if zone.contains(x, y))
+
+
+def random_zones(rng, count=12):
+    zones = []
+    for i in range(count):
+        cx, cy = rng.uniform(-10, 10, 2)
+        if i % 2:
+            w, h = rng.uniform(0.5, 6, 2)
+            zones.append(Zone.rectangle(f"rect{i}", cx, cy, cx + w, cy + h))
+        else:
+            # Star-shaped, so concave, polygon around (cx, cy)
+            angles = np.sort(rng.uniform(0, 2 * np.pi, 7))
+            radii = rng.uniform(0.5, 4, 7)
+            zones.append(Zone(f"poly{i}", np.column_stack([cx + radii * np.cos(angles),
+                                                           cy + radii * np.sin(angles)])))
+    return zones
+
+
+@pytest.mark.parametrize('cell_size', [None, 0.1, 0.37, 2.0])
+def test_lookup_matches_brute_force(cell_size):
+    rng = np.random.default_rng(5)
+    zones = random_zones(rng)
+    index = ZoneIndex(zones, cell_size)
+    for x, y in rng.uniform(-15, 15, (5000, 2)).tolist():
+        assert index.lookup(x, y) == brute_force(zones, x, y)
+
+
+def test_lookup_on_cell_boundaries_and_edges():
+    zones = [Zone.rectangle("a", 0.0, 0.0, 2.0, 1.0), Zone.rectangle("b", 1.0, 0.5, 3.0, 2.0),
+             Zone("tri", [(0.0, 0.0), (3.0, 0.0), (0.0, 3.0)])]
+    index = ZoneIndex(zones, cell_size=0.5)
+    # Grid lines, zone edges and vertices, and points just either side of them
+    values = sorted({v + d for v in np.arange(-1.0, 4.01, 0.25).tolist() for d in (-1e-9, 0.0, 1e-9)})
+    for x in values:
+        for y in values:
+            assert index.lookup(x, y) == brute_force(zones, x, y), (x, y)
+
+
+def test_overlapping_zones_report_all_and_label_the_first():
+    zones = [Zone.rectangle("outer", 0, 0, 10, 10), Zone.rectangle("inner", 4, 4, 6, 6)]
+    index = ZoneIndex(zones, cell_size=1.0)
+    assert index.lookup(5, 5) == (0, 1)
+    assert index.lookup(1, 1) == (0,)
+    assert index.lookup(11, 5) == ()
+    # Listed the other way round, the inner zone wins the label
+    tracker = ZoneTracker(ZoneIndex(zones[::-1], cell_size=1.0))
+    assert tracker.update(0.0, 5, 5) == "inner"
+    assert tracker.update(0.1, 1, 1) == "outer"
+    assert tracker.update(0.2, 20, 20) == ""
+
+
+def test_tracker_debounces_events_but_not_labels():
+    tracker = ZoneTracker(ZoneIndex([Zone.rectangle("room", 0, 0, 1, 1)]), dwell_seconds=1.0, debounce=0.3)
+    labels = []
+    # Flicker into the zone for 0.2 s, then enter for good at t=1.0 and leave at t=3.0
+    for i in range(40):
+        t = i * 0.1
+        inside = 0.0 <= t < 0.2 or 1.0 <= t < 3.0
+        labels.append(tracker.update(t, 0.5 if inside else 2.0, 0.5))
+    assert labels[0] == "room" and labels[5] == ""
+    assert [(event.kind, round(event.timestamp, 3)) for event in tracker.events] == [
+        ('enter', 1.0), ('dwell', 2.0), ('exit', 3.0)]
+    assert tracker.events[-1].duration == pytest.approx(2.0)
+
+
+def test_load_zones_validates(tmp_path):
+    path = tmp_path / "zones.json"
+    path.write_text(json.dumps({"zones": [{"name": "ok", "rect": [0, 0, 1, 1]},
+                                          {"name": "bad", "rect": [1, 1, 0, 0]}]}))
+    with pytest.raises(ZoneError, match="bad"):
+        load_zones(str(path))
+    path.write_text(json.dumps({"zones": [{"name": "nan", "polygon": [[0, 0], [1, "x"], [1, 1]]}]}))
+    with pytest.raises(ZoneError, match=str(path).replace('\\', '\\\\')):
+        load_zones(str(path))
+    path.write_text(json.dumps({"cell_size": 0.5, "dwell_seconds": 2,
+                                "zones": [{"name": "a", "rect": [0, 0, 1, 1]},
+                                          {"name": "b", "polygon": [[1, 0], [2, 0], [2, 1]]}]}))
+    tracker = load_zones(str(path))
+    assert tracker.dwell_seconds == 2.0
+    assert [zone.name for zone in tracker.index.zones] == ["a", "b"]
@@ -0,0 +1,523 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import clock_sync
+from acquisition import AcquisitionWorker, MergedStream
+from acquisition_process import AcquisitionProcess
+from coverage import CoverageGrid, coverage_path
+from export import ExportJob, copy_rows, write_atomically
+from filters import make_filter_chain
+from instrumentation import SessionProfiler, metrics
+from label_stats import LabelStatistics, summary_path
+from publisher import PositionPublisher
+from recorder import CLOCK_FIELDNAMES, FIELDNAMES, RAW_FIELDNAMES, StreamingRecorder, recover_sessions
+from ring_buffer import PositionRingBuffer
+from sample_store import SampleStore
+from session_format import SESSION_EXTENSION, load_any, write_csv, write_session
+from zones import load_zones, write_events, zone_events_path
+
+
+class TrackerCore:
+    """Acquisition, collection and saving logic shared by the GUI and headless modes.
+
+    Nothing in here touches tkinter or matplotlib. Errors are raised to the
+    caller, which decides whether to show a dialog or print and exit.
+    Subclasses receive every accepted sample through :meth:`on_sample`.
+    """
+
+    def __init__(self, max_history=50000, session_dir=None, acquisition_mode="event", acquisition_process=False):
+        # Initialize Marvelmind connections: one acquisition worker per serial port,
+        # all feeding one time-ordered merged stream
+        self.acquisition_mode = acquisition_mode
+        # Run the workers in a child process that hands samples over in shared memory
+        self.acquisition_process = acquisition_process
+        self.process = None
+        # Callable with MarvelmindHedge's signature; None means the real hardware class
+        self.hedge_factory = None
+        self.workers = []
+        self.merged = MergedStream()
+        self.tracking_active = False
+        self.tracking_thread = None
+        self.data_collection_active = False
+        self.collected_data = SampleStore(keep_clock=True)
+        # Running per-label/device aggregates, updated as samples are collected
+        self.label_stats = LabelStatistics()
+        # Coverage heatmap counts of the collected samples
+        self.coverage = CoverageGrid()
+        self.max_history = max_history
+        self.position_history = PositionRingBuffer(self.max_history)
+        self.device_histories = {}
+
+        # Optional filter stage between acquisition and storage, one chain per device
+        self.filter_name = "none"
+        self.filters = {}
+        self.filter_rejected = 0
+        self.keep_raw = True
+        # Filter chosen while the tracking thread runs; it applies it between two samples
+        self.pending_filter = None
+        self._filter_lock = threading.Lock()
+
+        # Data collection settings
+        self.collection_label = ""
+        self.collection_type = "static"
+        # First row of the current (or last) collection in collected_data
+        self.collection_start = 0
+        # Optional ZoneTracker; samples inside a zone are labelled with its name
+        self.zones = None
+        self.current_label = ""
+
+        # Samples are streamed to a session file while they are collected
+        self.session_dir = session_dir or os.path.join(os.path.expanduser("~"), "marvelmind_sessions")
+        self.recorder = None
+        self.recover_sessions()
+
+        # Acquisition counters as they were at the last disconnect
+        self.final_counters = {}
+        # Optional cProfile/tracemalloc capture, see enable_profiling()
+        self.profiler = None
+        # Background save started by start_save(), if any
+        self.export_job = None
+        # Optional live stream of samples to local consumers, see start_publisher()
+        self.publisher = None
+        self.register_gauges()
+
+    @property
+    def hedge(self):
+        """The first connected MarvelmindHedge, or None"""
+        return self.workers[0].hedge if self.workers else None
+
+    def connect(self, ports, addresses=None, debug=True):
+        """Open a hedge on each serial port and start the acquisition and tracking threads.
+
+        ``ports`` is a port name or a list of them; ``addresses`` optionally
+        restricts tracking to those hedgehog addresses. Returns without
+        waiting for data; see :meth:`wait_until_ready` and :meth:`connection_state`.
+
+        With :attr:`acquisition_process` set, the workers run in an
+        AcquisitionProcess instead, which then also serves as the merged
+        stream; ``hedge_factory`` must be picklable for that.
+        """
+        hedge_factory = self.hedge_factory
+        if hedge_factory is None:
+            from marvelmind import MarvelmindHedge as hedge_factory
+
+        if isinstance(ports, str):
+            ports = [ports]
+        if self.process is not None:
+            # Left from the last connection: make sure it is stopped and its ring freed
+            self.process.stop()
+            self.process.close()
+            self.process = None
+            self.merged = MergedStream()
+        if self.acquisition_process:
+            self.process = AcquisitionProcess(ports, addresses=addresses, mode=self.acquisition_mode,
+                                              debug=debug).start(hedge_factory)
+            self.merged = self.process
+            self.workers = list(self.process.workers)
+            print(f"Acquisition running in process {self.process.process.pid}")
+        else:
+            self.start_workers(ports, addresses, debug, hedge_factory)
+
+        # Start tracking thread
+        self.tracking_active = True
+        self.tracking_thread = threading.Thread(target=self.tracking_loop, daemon=True)
+        self.tracking_thread.start()
+
+    def start_workers(self, ports, addresses, debug, hedge_factory):
+        self.merged.clear()
+        try:
+            for port in ports:
+                worker = AcquisitionWorker(port, self.merged, addresses=addresses,
+                                           mode=self.acquisition_mode, debug=debug)
+                self.workers.append(worker.start(hedge_factory))
+        except Exception:
+            self.stop_workers()
+            raise
+
+    def wait_until_ready(self, timeout=None):
+        """Block until every port has delivered a packet; returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for worker in self.workers:
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            if not worker.ready.wait(remaining):
+                return False
+        return True
+
+    def connection_state(self):
+        """{port: 'connecting' | 'connected' | 'reconnecting' | 'stopped'}"""
+        return {worker.port: worker.state for worker in self.workers}
+
+    def stop_workers(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def acquisition_counters(self):
+        return {worker.port: worker.counters() for worker in self.workers}
+
+    def clock_offsets(self):
+        """{device: {'offset_s', 'latency_ms'}} of the beacon clocks as currently estimated"""
+        offsets = {}
+        for worker in list(self.workers):
+            for device, (offset, latency) in worker.clock_offsets().items():
+                offsets[device] = {'offset_s': round(offset, 6), 'latency_ms': round(latency * 1000.0, 3)}
+        return offsets
+
+    def disconnect(self):
+        if self.process is not None:
+            # Its final status report brings the counters up to date
+            self.process.stop()
+        if self.workers:
+            self.final_counters = self.acquisition_counters()
+        print(f"Acquisition counters: {self.acquisition_counters()}")
+        self.stop_workers()
+        self.tracking_active = False
+        if self.tracking_thread and self.tracking_thread is not threading.current_thread():
+            self.tracking_thread.join(timeout=1.0)
+        if self.process is not None:
+            # Normally the tracking thread has drained the ring by now, and closed it on the way out;
+            # its counters stay readable until the next connect
+            self.process.close()
+        self.tracking_thread = None
+
+    def shutdown(self):
+        """Stop tracking and close the session file"""
+        if self.workers:
+            print("Stopping Marvelmind connection...")
+            self.disconnect()
+        self.tracking_active = False
+        if self.export_active:
+            print("Waiting for the export to finish...")
+            self.export_job.wait()
+        self.close_recorder()
+        self.dump_metrics()
+        self.stop_publisher()
+        if self.profiler:
+            paths = self.profiler.stop()
+            self.profiler = None
+            if paths:
+                print(f"Profile written to {paths[0]} and {paths[1]}")
+
+    def dump_metrics(self):
+        """Write the instrumentation snapshot to metrics_<time>.json in the session directory"""
+        try:
+            os.makedirs(self.session_dir, exist_ok=True)
+            path = os.path.join(self.session_dir, f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+            metrics.dump_json(path)
+            print(f"Metrics written to {path}")
+        except Exception as e:
+            print(f"Could not write metrics: {e}")
+
+    def register_gauges(self):
+        """Expose queue depths and loss counters through the metrics registry"""
+        metrics.gauge('merged.pending', lambda: len(self.merged))
+        metrics.gauge('merged.dropped', lambda: self.merged.dropped)
+        metrics.gauge('acquisition', lambda: self.acquisition_counters() or self.final_counters)
+        metrics.gauge('collection.points', lambda: len(self.collected_data))
+        metrics.gauge('filter.rejected', lambda: self.filter_rejected)
+        metrics.gauge('recorder.queued', lambda: self.recorder.queued if self.recorder else 0)
+        metrics.gauge('recorder.dropped', lambda: self.recorder.dropped if self.recorder else 0)
+        metrics.gauge('publisher', lambda: self.publisher.counters() if self.publisher else {})
+        metrics.gauge('clock', self.clock_offsets)
+        metrics.gauge('zones', lambda: self.zones.counters() if self.zones else {})
+        metrics.gauge('acquisition_process',
+                      lambda: self.process.child_metrics if self.process is not None else {})
+
+    def enable_profiling(self):
+        """Profile this session with cProfile and tracemalloc; results go to the session directory"""
+        if self.profiler is None:
+            self.profiler = SessionProfiler(self.session_dir).start()
+            print(f"Profiling enabled; results will be written to {self.session_dir}")
+
+    def tracking_loop(self):
+        """Consume the merged stream in timestamp order"""
+        if self.profiler:
+            self.profiler.profile_current_thread()
+        merged = self.merged
+        last_batch = None
+        while self.tracking_active:
+            try:
+                batch = merged.pop_ready()
+                if not batch:
+                    continue
+                now = time.perf_counter()
+                if last_batch is not None:
+                    metrics.observe('tracking.loop_interval', now - last_batch)
+                last_batch = now
+                for timestamp, device, position, clock in batch:
+                    metrics.observe('tracking.sample_age', clock_sync.now() - timestamp)
+                    started = time.perf_counter()
+                    self.process_position(timestamp, position, device, clock)
+                    metrics.observe('tracking.process', time.perf_counter() - started)
+            except Exception as e:
+                metrics.incr('tracking.errors')
+                print(f"Tracking error: {e}")
+                time.sleep(0.1)
+        # Deliver whatever was still waiting in the reorder window (or the ring)
+        for timestamp, device, position, clock in merged.pop_ready(timeout=0, flush=True):
+            self.process_position(timestamp, position, device, clock)
+        self.apply_pending_filter()
+        if isinstance(merged, AcquisitionProcess):
+            merged.close()
+
+    def set_filter(self, name):
+        """Select a filter preset from filters.FILTER_PRESETS ('none' disables filtering).
+
+        Filter state starts fresh. When raw values are kept, the store gains raw
+        columns and the session file is rotated so its header lists them.
+        While the tracking thread runs, the change is left for it to apply
+        between two samples, so no sample sees half of it.
+        """
+        make_filter_chain(name)  # validates the name
+        thread = self.tracking_thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            with self._filter_lock:
+                self.pending_filter = name
+        else:
+            self._apply_filter(name)
+
+    def apply_pending_filter(self):
+        """Apply a filter change left by set_filter; called on the tracking thread"""
+        with self._filter_lock:
+            name, self.pending_filter = self.pending_filter, None
+        if name is not None:
+            self._apply_filter(name)
+
+    def _apply_filter(self, name):
+        self.filter_name = name
+        self.filters = {}
+        if name != "none" and self.keep_raw and not self.collected_data.has_raw:
+            self.collected_data.enable_raw()
+            if self.recorder:
+                self.close_recorder()
+                if self.data_collection_active:
+                    self.start_recorder()
+
+    def set_coverage_cell_size(self, cell_size):
+        """Change the heatmap cell size (meters); the counts are rebuilt from the collected data"""
+        self.coverage = CoverageGrid.from_store(self.collected_data, cell_size)
+
+    def process_position(self, timestamp, position, device="", clock=None):
+        # position returns [hedge_id, x, y, z, angle, timestamp, validity_flag];
+        # timestamp is already aligned to the beacon clock, clock is (hedge_time, host_time)
+        raw = x, y, z = position[1], position[2], position[3]
+
+        if self.pending_filter is not None:
+            self.apply_pending_filter()
+        if self.filter_name != "none":
+            chain = self.filters.get(device)
+            if chain is None:
+                chain = self.filters[device] = make_filter_chain(self.filter_name)
+            filtered = chain.update(timestamp, x, y, z)
+            if filtered is None:
+                self.filter_rejected += 1
+                return
+            x, y, z = filtered
+
+        # Zone lookup runs for every sample so entries are known before collection starts
+        label = self.collection_label
+        if self.zones is not None:
+            label = self.zones.update(timestamp, x, y, device) or label
+        self.current_label = label
+
+        # Add to the merged and per-device histories
+        self.position_history.append(timestamp, x, y, z)
+        history = self.device_histories.get(device)
+        if history is None:
+            history = self.device_histories[device] = PositionRingBuffer(self.max_history)
+        history.append(timestamp, x, y, z)
+
+        # Collect data if active
+        if self.data_collection_active:
+            store = self.collected_data
+            store.append(timestamp, x, y, z, label, self.collection_type, device, raw, clock)
+            if self.recorder:
+                extra = raw if store.has_raw else ()
+                if store.has_clock:
+                    extra += clock if clock is not None else (float('nan'), float('nan'))
+                self.recorder.record(timestamp, x, y, z, label, self.collection_type, device, *extra)
+            self.label_stats.update(label, device, self.collection_type, timestamp, x, y, z)
+            # The sample is stored and recorded by now; a coverage failure must not undo that
+            try:
+                self.coverage.add(x, y)
+            except Exception as e:
+                metrics.incr('coverage.errors')
+                print(f"Coverage error: {e}")
+
+        publisher = self.publisher
+        if publisher:
+            publisher.publish(timestamp, x, y, z, device, label,
+                              self.collection_type, self.data_collection_active)
+
+        self.on_sample(timestamp, x, y, z, device)
+
+    def start_publisher(self, udp=None, tcp=None):
+        """Stream every accepted sample over UDP multicast (group, port) and/or TCP (host, port)"""
+        self.stop_publisher()
+        self.publisher = PositionPublisher(udp=udp, tcp=tcp).start()
+        targets = [f"udp://{udp[0]}:{udp[1]}"] if udp else []
+        targets += [f"tcp://{self.publisher.tcp[0]}:{self.publisher.tcp[1]}"] if tcp else []
+        print(f"Publishing positions on {', '.join(targets)}")
+
+    def stop_publisher(self):
+        if self.publisher:
+            self.publisher.stop()
+            self.publisher = None
+
+    def on_sample(self, timestamp, x, y, z, device):
+        """Hook called on the tracking thread for every accepted sample"""
+
+    def set_zones(self, path, dwell_seconds=None):
+        """Load zones from a JSON file (see zones.py); None removes them"""
+        self.zones = load_zones(path, dwell_seconds) if path else None
+        if self.zones:
+            print(f"Loaded {len(self.zones.index)} zones from {path}")
+
+    def zone_events(self):
+        """Copy of the zone events since the data was last cleared or loaded"""
+        return list(self.zones.events) if self.zones else []
+
+    def begin_collection(self, label, collection_type):
+        self.collection_label = label or f"Collection_{datetime.now().strftime('%H%M%S')}"
+        self.collection_type = collection_type
+        if self.recorder is None:
+            self.start_recorder()
+        self.collection_start = len(self.collected_data)
+        self.data_collection_active = True
+
+    def end_collection(self):
+        """Stop collecting; returns the number of points stored during this collection"""
+        self.data_collection_active = False
+        return len(self.collected_data) - self.collection_start
+
+    def collection_labels(self):
+        """Labels written during the current (or last) collection, in order of first use.
+
+        With zones loaded these are the zone names as well as the collection label.
+        """
+        codes = self.collected_data.label_codes[self.collection_start:]
+        if not len(codes):
+            return []
+        unique, first = np.unique(codes, return_index=True)
+        labels = self.collected_data.labels
+        return [labels[code] for code in unique[np.argsort(first)].tolist()]
+
+    def recover_sessions(self):
+        """Finalize session files left behind by an earlier crash"""
+        if not os.path.isdir(self.session_dir):
+            return
+        try:
+            for path, rows in recover_sessions(self.session_dir):
+                print(f"Recovered interrupted session ({rows} points): {path}")
+        except Exception as e:
+            print(f"Session recovery failed: {e}")
+
+    def start_recorder(self):
+        """Open a new streaming session file for the samples about to be collected"""
+        path = os.path.join(self.session_dir, f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        try:
+            self.recorder = StreamingRecorder(path, fieldnames=self.fieldnames()).start()
+            print(f"Recording session to: {path}")
+        except Exception as e:
+            self.recorder = None
+            print(f"Could not start session recorder: {e}")
+
+    def close_recorder(self):
+        if self.recorder:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+            print(f"Session file closed: {recorder.path} ({recorder.rows_written} points)")
+            events = self.zone_events()
+            if events:
+                try:
+                    write_events(zone_events_path(recorder.path), events)
+                except OSError as e:
+                    print(f"Could not write zone events: {e}")
+
+    def fieldnames(self):
+        """CSV columns for the current store"""
+        store = self.collected_data
+        return (FIELDNAMES + (RAW_FIELDNAMES if store.has_raw else [])
+                + (CLOCK_FIELDNAMES if store.has_clock else []))
+
+    def clear(self):
+        self.close_recorder()
+        self.collected_data.clear()
+        self.collection_start = 0
+        self.label_stats.clear()
+        self.coverage.clear()
+        self.position_history.clear()
+        for history in self.device_histories.values():
+            history.clear()
+        self.filters = {}
+        if self.zones:
+            self.zones.reset()
+
+    def load(self, filename):
+        """Replace the collected data with a saved CSV or binary session"""
+        self.close_recorder()
+        self.collected_data.clear()
+        load_any(filename, self.collected_data)
+        self.collection_start = len(self.collected_data)
+        if self.zones:
+            self.zones.reset()
+        self.label_stats = LabelStatistics.from_store(self.collected_data)
+        self.coverage = CoverageGrid.from_store(self.collected_data, self.coverage.cell_size)
+        print(f"Loaded {len(self.collected_data)} points from {filename}")
+
+    def save(self, filename, progress=None):
+        """Save as a binary session for .mms names, CSV otherwise, plus summary and zone event CSVs"""
+        self._save_snapshot(filename, self.save_snapshot(), progress)
+
+    def start_save(self, filename):
+        """Save on a background thread and return the running ExportJob.
+
+        The rows to write, the label statistics and the coverage counts are
+        fixed here, on the calling thread, so collection can continue (or
+        the data be cleared) while it runs.
+        """
+        snapshot = self.save_snapshot()
+        self.export_job = ExportJob(lambda progress: self._save_snapshot(filename, snapshot, progress),
+                                    name="session-export")
+        return self.export_job.start()
+
+    def save_snapshot(self):
+        """(rows, label statistics, coverage, zone events) as of now, safe to write from another thread"""
+        return (self.collected_data.snapshot(), self.label_stats.copy(), self.coverage.copy(),
+                self.zone_events())
+
+    @property
+    def export_active(self):
+        return self.export_job is not None and not self.export_job.finished
+
+    def _save_snapshot(self, filename, snapshot, progress):
+        data, label_stats, coverage, events = snapshot
+        print(f"Writing to file: {filename}")
+        started = time.perf_counter()
+        if filename.lower().endswith(SESSION_EXTENSION):
+            write_atomically(filename, lambda path: write_session(path, data, progress=progress))
+        else:
+            write_atomically(filename, lambda path: self.export_csv(path, data, progress))
+        if label_stats:
+            label_stats.write_summary(summary_path(filename))
+        if coverage:
+            coverage.save(coverage_path(filename))
+        if events:
+            write_events(zone_events_path(filename), events)
+        metrics.observe('save', time.perf_counter() - started)
+        print(f"File saved successfully!")
+
+    def export_csv(self, filename, data=None, progress=None):
+        data = data if data is not None else self.collected_data.snapshot()
+        rows = len(data['timestamp'])
+        recorder = self.recorder
+        if recorder and recorder.rows_recorded == rows and recorder.flush():
+            # The session file already holds these samples; copy it instead of re-serializing
+            copy_rows(recorder.partial_path, filename, rows, progress)
+            return
+
+        write_csv(filename, data, progress=progress)
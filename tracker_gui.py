@@ -0,0 +1,895 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import matplotlib.pyplot as plt
+from matplotlib.patches import Polygon as MplPolygon
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from datetime import datetime
+import signal
+import sys
+import os
+from export import ExportJob
+from filters import FILTER_PRESETS
+from instrumentation import metrics
+from label_stats import format_stats
+from lod import PointsLOD, PolylineLOD
+from playback import playback_cache_path, prepare_session
+from playback_gui import PlaybackWindow
+from ports import PortScanner, describe_port, likely_port_index
+from render import RenderScheduler
+from session_format import SESSION_EXTENSION
+from tracker_core import TrackerCore
+
+class MarvelmindTracker(TrackerCore):
+    def __init__(self, root, session_dir=None, acquisition_process=False):
+        super().__init__(session_dir=session_dir, acquisition_process=acquisition_process)
+        self.root = root
+        self.root.title("Marvelmind Indoor Tracking System - Lab Data Collector")
+        self.root.geometry("1200x800")
+        
+        self.render_fps = 30
+        self.plot_margin = 0.5  # meters
+        
+        # Data collection settings
+        self.collection_duration = 10
+        self.collection_timer = None
+        
+        # Serial ports are enumerated off the Tk thread
+        self.port_scanner = PortScanner()
+        self.ports_shown = None
+        self.connection_poll = None
+        
+        self.setup_gui()
+        self.setup_plot()
+        self.renderer = RenderScheduler(
+            self.root, self.canvas,
+            [self.coverage_image, self.hedgehog_point, self.trail_line, self.collection_points],
+            self.on_render_frame, fps=self.render_fps)
+        self.renderer.start()
+        # Zooming or panning needs a new frame so the decimated artists are rebuilt
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self.renderer.request_full_redraw())
+        self.ax.callbacks.connect('ylim_changed', lambda ax: self.renderer.request_full_redraw())
+        
+        # Setup signal handler for Ctrl+C
+        self.setup_signal_handler()
+        
+    def setup_signal_handler(self):
+        """Setup Ctrl+C signal handler for graceful shutdown"""
+        def signal_handler(sig, frame):
+            print('\nReceived Ctrl+C, shutting down gracefully...')
+            self.cleanup_and_exit()
+            
+        signal.signal(signal.SIGINT, signal_handler)
+        print("Press Ctrl+C to quit the application")
+        
+    def cleanup_and_exit(self):
+        """Clean up resources and exit gracefully"""
+        self.renderer.stop()
+        self.shutdown()
+        print("Application closed successfully.")
+        self.root.destroy()
+        sys.exit(0)
+        
+    def setup_gui(self):
+        # Main frame
+        main_frame = ttk.Frame(self.root)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Control Panel
+        control_frame = ttk.LabelFrame(main_frame, text="Control Panel", padding="10")
+        control_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        # Connection controls
+        conn_frame = ttk.Frame(control_frame)
+        conn_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        # Serial Port Selection
+        port_frame = ttk.Frame(conn_frame)
+        port_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        ttk.Label(port_frame, text="Serial Port:").pack(side=tk.LEFT)
+        
+        # Dropdown for port selection
+        self.port_var = tk.StringVar()
+        self.port_combo = ttk.Combobox(port_frame, textvariable=self.port_var, width=25, state="readonly",
+                                       postcommand=self.on_port_dropdown)
+        self.port_combo.pack(side=tk.LEFT, padx=(5, 10))
+        self.port_combo.bind('<<ComboboxSelected>>', self.on_port_selected)
+        
+        # Refresh ports button
+        ttk.Button(port_frame, text="Refresh Ports", command=self.refresh_ports).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Additional modems and hedgehog address filter for multi-device runs
+        ttk.Label(port_frame, text="Extra Ports:").pack(side=tk.LEFT)
+        self.extra_ports_var = tk.StringVar()
+        ttk.Entry(port_frame, textvariable=self.extra_ports_var, width=20).pack(side=tk.LEFT, padx=(5, 10))
+        
+        ttk.Label(port_frame, text="Addresses:").pack(side=tk.LEFT)
+        self.addresses_var = tk.StringVar()
+        ttk.Entry(port_frame, textvariable=self.addresses_var, width=12).pack(side=tk.LEFT, padx=(5, 10))
+
+        # Read the ports in a child process so redraws and saves cannot delay them
+        self.separate_process_var = tk.BooleanVar(value=self.acquisition_process)
+        ttk.Checkbutton(port_frame, text="Separate Process",
+                        variable=self.separate_process_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Quit button
+        ttk.Button(port_frame, text="Quit", command=self.cleanup_and_exit).pack(side=tk.RIGHT, padx=(10, 0))
+        
+        # Live timings, counters and queue depths
+        ttk.Button(port_frame, text="Performance Stats", command=self.toggle_stats_panel).pack(side=tk.RIGHT)
+        self.stats_window = None
+        self.stats_timer = None
+        
+        # Auto-detect and populate ports on startup
+        self.refresh_ports()
+        
+        # Connection buttons
+        button_frame = ttk.Frame(conn_frame)
+        button_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        self.connect_btn = ttk.Button(button_frame, text="Connect", command=self.connect_hedge)
+        self.connect_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.disconnect_btn = ttk.Button(button_frame, text="Disconnect", command=self.disconnect_hedge, state=tk.DISABLED)
+        self.disconnect_btn.pack(side=tk.LEFT)
+        
+        # Status
+        self.status_var = tk.StringVar(value="Disconnected")
+        ttk.Label(button_frame, text="Status:").pack(side=tk.LEFT, padx=(20, 5))
+        self.status_label = ttk.Label(button_frame, textvariable=self.status_var, foreground="red")
+        self.status_label.pack(side=tk.LEFT)
+        
+        # Instructions
+        instruction_text = "Instructions: Select port → Connect → Start Collection | Press Ctrl+C to quit"
+        ttk.Label(button_frame, text=instruction_text, font=("Arial", 8), foreground="gray").pack(side=tk.RIGHT, padx=(10, 0))
+        
+        # Data Collection Controls
+        collection_frame = ttk.LabelFrame(control_frame, text="Data Collection", padding="5")
+        collection_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        # Collection type
+        type_frame = ttk.Frame(collection_frame)
+        type_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        ttk.Label(type_frame, text="Type:").pack(side=tk.LEFT)
+        self.type_var = tk.StringVar(value="static")
+        type_radio1 = ttk.Radiobutton(type_frame, text="Static", variable=self.type_var, value="static")
+        type_radio2 = ttk.Radiobutton(type_frame, text="Dynamic", variable=self.type_var, value="dynamic")
+        type_radio1.pack(side=tk.LEFT, padx=(5, 10))
+        type_radio2.pack(side=tk.LEFT)
+        
+        # Position filter applied before samples are stored
+        ttk.Label(type_frame, text="Filter:").pack(side=tk.LEFT, padx=(20, 5))
+        self.filter_var = tk.StringVar(value=self.filter_name)
+        filter_combo = ttk.Combobox(type_frame, textvariable=self.filter_var, width=15,
+                                    values=list(FILTER_PRESETS), state="readonly")
+        filter_combo.pack(side=tk.LEFT)
+        filter_combo.bind('<<ComboboxSelected>>', self.on_filter_selected)
+        
+        # Coverage heatmap layer
+        self.show_coverage_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(type_frame, text="Coverage Heatmap", variable=self.show_coverage_var,
+                        command=self.on_coverage_toggled).pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Label(type_frame, text="Cell (m):").pack(side=tk.LEFT)
+        self.coverage_cell_var = tk.StringVar(value=str(self.coverage.cell_size))
+        cell_entry = ttk.Entry(type_frame, textvariable=self.coverage_cell_var, width=6)
+        cell_entry.pack(side=tk.LEFT, padx=(5, 0))
+        cell_entry.bind('<Return>', self.on_coverage_cell_changed)
+        
+        # Duration for static collection
+        duration_frame = ttk.Frame(collection_frame)
+        duration_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        ttk.Label(duration_frame, text="Duration (s):").pack(side=tk.LEFT)
+        self.duration_var = tk.StringVar(value="10")
+        ttk.Entry(duration_frame, textvariable=self.duration_var, width=10).pack(side=tk.LEFT, padx=(5, 10))
+        
+        # Label
+        ttk.Label(duration_frame, text="Label:").pack(side=tk.LEFT, padx=(10, 5))
+        self.label_var = tk.StringVar()
+        ttk.Entry(duration_frame, textvariable=self.label_var, width=20).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Zones label samples automatically; the manual label applies outside them
+        ttk.Button(duration_frame, text="Zones...", command=self.choose_zones).pack(side=tk.LEFT, padx=(10, 5))
+        self.zones_file_var = tk.StringVar(value="No zones")
+        ttk.Label(duration_frame, textvariable=self.zones_file_var, foreground="gray").pack(side=tk.LEFT)
+        
+        # Collection buttons
+        button_frame2 = ttk.Frame(collection_frame)
+        button_frame2.pack(fill=tk.X, pady=(5, 0))
+        
+        self.start_collection_btn = ttk.Button(button_frame2, text="Start Collection", 
+                                             command=self.start_data_collection, state=tk.DISABLED)
+        self.start_collection_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.stop_collection_btn = ttk.Button(button_frame2, text="Stop Collection", 
+                                            command=self.stop_data_collection, state=tk.DISABLED)
+        self.stop_collection_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(button_frame2, text="Save Data", command=self.save_data).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame2, text="Quick Save", command=self.quick_save).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame2, text="Load Data", command=self.load_data).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame2, text="Clear Data", command=self.clear_data).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(button_frame2, text="Playback...", command=self.open_playback).pack(side=tk.LEFT)
+        
+        # Current position display
+        pos_frame = ttk.LabelFrame(control_frame, text="Current Hedgehog Position", padding="5")
+        pos_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        self.pos_var = tk.StringVar(value="X: -- m, Y: -- m, Z: -- m")
+        ttk.Label(pos_frame, textvariable=self.pos_var).pack()
+        
+        self.data_count_var = tk.StringVar(value="Collected Points: 0")
+        ttk.Label(pos_frame, textvariable=self.data_count_var).pack()
+        
+        # Running statistics of the current label
+        self.stats_var = tk.StringVar(value="")
+        ttk.Label(pos_frame, textvariable=self.stats_var).pack()
+        
+        self.zone_var = tk.StringVar(value="")
+        ttk.Label(pos_frame, textvariable=self.zone_var).pack()
+        
+        # Plot frame
+        self.plot_frame = ttk.LabelFrame(main_frame, text="Real-time Hedgehog Tracking", padding="5")
+        self.plot_frame.pack(fill=tk.BOTH, expand=True)
+
+    def refresh_ports(self):
+        """Rescan serial ports in the background; the combobox fills in when the scan finishes"""
+        self.port_scanner.scan(force=True)
+        if not self.port_combo['values']:
+            self.port_combo['values'] = ["Scanning ports..."]
+            self.port_combo.current(0)
+        self.poll_port_scan()
+
+    def on_port_dropdown(self):
+        """Opening the port list rescans unless the cached scan is recent"""
+        if self.port_scanner.scan():
+            self.poll_port_scan()
+
+    def poll_port_scan(self):
+        scanner = self.port_scanner
+        if scanner.scanning:
+            self.root.after(100, self.poll_port_scan)
+            return
+        if scanner.version == self.ports_shown:
+            return
+        self.ports_shown = scanner.version
+        if scanner.error is not None:
+            messagebox.showerror("Error", f"Error detecting ports: {scanner.error}")
+            return
+        ports = scanner.ports
+        if ports:
+            devices = [port.device for port in ports]
+            selected = self.port_var.get()
+            self.port_combo['values'] = [describe_port(port) for port in ports]
+            # Keep the user's choice if it is still there, else try to find a likely USB serial port
+            best_port = devices.index(selected) if selected in devices else likely_port_index(ports)
+            self.port_combo.current(best_port)
+            self.port_var.set(devices[best_port])
+        else:
+            self.port_combo['values'] = ["No ports detected"]
+            self.port_combo.current(0)
+            self.port_var.set("")
+            
+    def on_port_selected(self, event=None):
+        """Handle port selection from combobox"""
+        selected_text = self.port_combo.get()
+        if selected_text and " - " in selected_text:
+            port_device = selected_text.split(" - ")[0]
+            self.port_var.set(port_device)
+        
+    def setup_plot(self):
+        # Create matplotlib figure
+        self.fig, self.ax = plt.subplots(figsize=(10, 8))
+        self.ax.set_xlabel('X Position (m)')
+        self.ax.set_ylabel('Y Position (m)')
+        self.ax.set_title('Marvelmind Hedgehog Tracking - Top View')
+        self.ax.grid(True, alpha=0.3)
+        self.ax.set_aspect('equal')
+        
+        # Initialize plot elements
+        self.hedgehog_point, = self.ax.plot([], [], 'ro', markersize=10, label='Hedgehog (Current)')
+        self.trail_line, = self.ax.plot([], [], 'b-', alpha=0.6, linewidth=1, label='Movement Trail')
+        self.collection_points, = self.ax.plot([], [], 'go', markersize=8, alpha=0.7, label='Collection Points')
+        
+        # Coverage heatmap under the trail; empty cells are masked out so they stay transparent
+        self.coverage_image = self.ax.imshow(np.ma.masked_all((1, 1)), origin='lower', extent=(0, 1, 0, 1),
+                                             cmap='viridis', alpha=0.6, interpolation='nearest', zorder=0)
+        self.coverage_image.set_visible(False)
+        self.coverage_drawn = None
+        
+        # Zone outlines and names; static, so they live in the blit background
+        self.zone_artists = []
+        
+        # Per-device (current point, trail) artists; the first device uses the ones above
+        self.device_artists = {}
+        
+        # Level-of-detail decimators for the trails and collection points
+        self.max_drawn_vertices = 10000
+        self.trail_lods = {}
+        self.points_lod = PointsLOD(self.max_drawn_vertices)
+        
+        self.ax.legend()
+        
+        # Embed plot in tkinter
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+    def connect_hedge(self):
+        selected_port = self.port_var.get()
+        
+        if not selected_port:
+            messagebox.showerror("No Port Selected", "Please select a serial port first")
+            return
+        
+        ports = [selected_port] + [p.strip() for p in self.extra_ports_var.get().split(",")
+                                   if p.strip() and p.strip() != selected_port]
+        try:
+            addresses = [int(a) for a in self.addresses_var.get().replace(",", " ").split()]
+        except ValueError:
+            messagebox.showerror("Invalid Addresses", "Addresses must be whole numbers separated by commas")
+            return
+            
+        try:
+            self.acquisition_process = self.separate_process_var.get()
+            self.connect(ports, addresses=addresses or None)
+            
+            self.status_var.set(f"Connecting to {', '.join(ports)}...")
+            self.status_label.config(foreground="orange")
+            self.poll_connection()
+            self.connect_btn.config(state=tk.DISABLED)
+            self.disconnect_btn.config(state=tk.NORMAL)
+            self.start_collection_btn.config(state=tk.NORMAL)
+            self.port_combo.config(state=tk.DISABLED)
+            
+        except Exception as e:
+            messagebox.showerror("Connection Error", f"Failed to connect to {selected_port}:\n{str(e)}")
+            
+    def poll_connection(self):
+        """Reflect the acquisition workers' state in the status line until disconnected"""
+        states = self.connection_state()
+        if not states:
+            self.connection_poll = None
+            return
+        reconnecting = [port for port, state in states.items() if state == 'reconnecting']
+        waiting = [port for port, state in states.items() if state == 'connecting']
+        if reconnecting:
+            self.status_var.set(f"Connection lost, reconnecting to {', '.join(reconnecting)}...")
+            self.status_label.config(foreground="orange")
+        elif waiting:
+            self.status_var.set(f"Waiting for data from {', '.join(waiting)}...")
+            self.status_label.config(foreground="orange")
+        else:
+            self.status_var.set(f"Connected to {', '.join(states)}")
+            self.status_label.config(foreground="green")
+        self.connection_poll = self.root.after(500, self.poll_connection)
+
+    def disconnect_hedge(self):
+        if self.connection_poll is not None:
+            self.root.after_cancel(self.connection_poll)
+            self.connection_poll = None
+        self.disconnect()
+            
+        self.status_var.set("Disconnected")
+        self.status_label.config(foreground="red")
+        self.connect_btn.config(state=tk.NORMAL)
+        self.disconnect_btn.config(state=tk.DISABLED)
+        self.start_collection_btn.config(state=tk.DISABLED)
+        self.stop_collection_btn.config(state=tk.DISABLED)
+        self.port_combo.config(state="readonly")
+        
+    def on_sample(self, timestamp, x, y, z, device):
+        # Hand the sample to the GUI thread; drawing happens there
+        self.renderer.submit((timestamp, x, y, z, device))
+    
+    def on_render_frame(self, samples):
+        """Apply a batch of queued samples on the GUI thread; returns True if limits changed"""
+        if samples:
+            timestamp, x, y, z, device = samples[-1]
+            prefix = f"[{device}] " if len(self.device_histories) > 1 else ""
+            self.pos_var.set(f"{prefix}X: {x:.3f} m, Y: {y:.3f} m, Z: {z:.3f} m")
+        self.data_count_var.set(f"Collected Points: {len(self.collected_data)}")
+        if self.zones:
+            current = self.zones.current_zones()
+            if len(current) > 1:
+                self.zone_var.set("  ".join(f"[{device}] {', '.join(names) or '-'}"
+                                            for device, names in current.items()))
+            else:
+                names = next(iter(current.values()), [])
+                self.zone_var.set(f"Zone: {', '.join(names) or '-'}")
+        if self.data_collection_active:
+            self.update_stats_display()
+        with metrics.timer('render.update_plot'):
+            return self.update_plot()
+    
+    def update_stats_display(self):
+        label = self.current_label if self.zones else self.collection_label
+        stats = self.label_stats.get(label)
+        self.stats_var.set(f"{label}: {format_stats(stats)}" if stats else "")
+    
+    def update_plot(self):
+        """Refresh the plot artists from the buffers; returns True if axis limits changed"""
+        histories = list(self.device_histories.items())
+        
+        # Auto-scale axes from the running extents of trail and collection
+        # bounds() is None for a history cleared since it was listed
+        extents = [bounds[:4] for bounds in (history.bounds() for _, history in histories) if bounds]
+        if self.collected_data:
+            extents.append(self.collected_data.bounds())
+        limits_changed = False
+        if extents:
+            limits_changed = self.update_limits(min(e[0] for e in extents), max(e[1] for e in extents),
+                                                min(e[2] for e in extents), max(e[3] for e in extents))
+        
+        # Only about one vertex per screen pixel is drawn; the buffers keep full resolution
+        view = (*self.ax.get_xlim(), *self.ax.get_ylim(), self.ax.bbox.width, self.ax.bbox.height)
+        for device, history in histories:
+            point, trail = self.get_device_artists(device)
+            if history:
+                # Ordered, zero-copy views into the ring buffer
+                first_seq = history.total
+                data = history.view()
+                first_seq -= len(data)
+                x_coords, y_coords = data[:, 1], data[:, 2]
+                
+                # Update current position and trail
+                lod = self.trail_lods.get(device)
+                if lod is None:
+                    lod = self.trail_lods[device] = PolylineLOD(self.max_drawn_vertices)
+                lod.set_view(*view)
+                point.set_data([x_coords[-1]], [y_coords[-1]])
+                trail.set_data(*lod.update(x_coords, y_coords, first_seq))
+            else:
+                point.set_data([], [])
+                trail.set_data([], [])
+        if not self.device_histories:
+            self.hedgehog_point.set_data([], [])
+            self.trail_line.set_data([], [])
+        
+        self.update_coverage()
+        
+        # Update collection points
+        if self.collected_data:
+            self.points_lod.set_view(*view)
+            self.collection_points.set_data(*self.points_lod.update(self.collected_data.x, self.collected_data.y))
+        else:
+            self.collection_points.set_data([], [])
+        
+        return limits_changed
+    
+    def update_coverage(self):
+        """Push the coverage counts to the heatmap image when they changed"""
+        coverage = self.coverage
+        visible = self.show_coverage_var.get() and bool(coverage)
+        self.coverage_image.set_visible(visible)
+        if not visible or self.coverage_drawn == (id(coverage), coverage.version):
+            return
+        self.coverage_drawn = (id(coverage), coverage.version)
+        counts = coverage.counts
+        self.coverage_image.set_data(np.ma.masked_equal(counts, 0))
+        self.coverage_image.set_extent(coverage.extent)
+        self.coverage_image.set_clim(1, max(int(counts.max()), 1))
+    
+    def on_coverage_toggled(self):
+        self.renderer.request_full_redraw()
+    
+    def on_coverage_cell_changed(self, event=None):
+        try:
+            self.set_coverage_cell_size(float(self.coverage_cell_var.get()))
+        except ValueError:
+            messagebox.showerror("Error", "Invalid heatmap cell size")
+            self.coverage_cell_var.set(str(self.coverage.cell_size))
+            return
+        self.renderer.request_full_redraw()
+    
+    def choose_zones(self):
+        """Load a zones file, or remove the zones when the dialog is cancelled and some are loaded"""
+        filename = filedialog.askopenfilename(
+            parent=self.root,
+            title="Load Zones",
+            filetypes=[("Zones file", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            if self.zones and messagebox.askyesno("Zones", "Remove the loaded zones?"):
+                self.load_zones(None)
+            return
+        self.load_zones(filename)
+
+    def load_zones(self, filename):
+        try:
+            self.set_zones(filename)
+        except Exception as e:
+            print(f"Error loading zones: {e}")
+            messagebox.showerror("Zones Error", f"Failed to load zones: {e}")
+            return
+        self.zones_file_var.set(os.path.basename(filename) if filename else "No zones")
+        self.zone_var.set("")
+        self.draw_zones()
+
+    def draw_zones(self):
+        for artist in self.zone_artists:
+            artist.remove()
+        self.zone_artists = []
+        if self.zones:
+            for zone in self.zones.index.zones:
+                patch = MplPolygon(zone.vertices, closed=True, fill=True, facecolor='orange', alpha=0.12,
+                                   edgecolor='darkorange', linewidth=1, zorder=0.5)
+                self.ax.add_patch(patch)
+                xmin, ymin, xmax, ymax = zone.bounds
+                text = self.ax.text((xmin + xmax) / 2, (ymin + ymax) / 2, zone.name, ha='center', va='center',
+                                    fontsize=8, color='darkorange', zorder=0.5)
+                self.zone_artists += [patch, text]
+            xmin = min(zone.bounds[0] for zone in self.zones.index.zones)
+            ymin = min(zone.bounds[1] for zone in self.zones.index.zones)
+            xmax = max(zone.bounds[2] for zone in self.zones.index.zones)
+            ymax = max(zone.bounds[3] for zone in self.zones.index.zones)
+            self.update_limits(xmin, xmax, ymin, ymax)
+        self.renderer.request_full_redraw()
+
+    def get_device_artists(self, device):
+        """Return (current point, trail) artists for a device, creating them on first use"""
+        artists = self.device_artists.get(device)
+        if artists is None:
+            if not self.device_artists:
+                artists = (self.hedgehog_point, self.trail_line)
+            else:
+                color = f"C{len(self.device_artists) % 10}"
+                point, = self.ax.plot([], [], 'o', color=color, markersize=10, label=f'Hedgehog {device}')
+                trail, = self.ax.plot([], [], '-', color=color, alpha=0.6, linewidth=1)
+                artists = (point, trail)
+                for artist in artists:
+                    self.renderer.add_artist(artist)
+                self.ax.legend()
+            self.device_artists[device] = artists
+        return artists
+    
+    def update_limits(self, x_min, x_max, y_min, y_max):
+        """Rescale only when data leaves the view or the view is far too large"""
+        margin = self.plot_margin
+        cur_x0, cur_x1 = self.ax.get_xlim()
+        cur_y0, cur_y1 = self.ax.get_ylim()
+        want_x = (x_max - x_min) + 2 * margin
+        want_y = (y_max - y_min) + 2 * margin
+        outside = x_min < cur_x0 or x_max > cur_x1 or y_min < cur_y0 or y_max > cur_y1
+        too_large = (cur_x1 - cur_x0) > 2 * want_x or (cur_y1 - cur_y0) > 2 * want_y
+        if not (outside or too_large):
+            return False
+        self.ax.set_xlim(x_min - margin, x_max + margin)
+        self.ax.set_ylim(y_min - margin, y_max + margin)
+        return True
+    
+    def toggle_stats_panel(self):
+        """Open or close the performance statistics window"""
+        if self.stats_window is not None:
+            self.close_stats_panel()
+            return
+        self.stats_window = tk.Toplevel(self.root)
+        self.stats_window.title("Performance Stats")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.close_stats_panel)
+        self.stats_text = tk.Text(self.stats_window, width=90, height=35, font=("Courier", 9))
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_stats_panel()
+    
+    def refresh_stats_panel(self):
+        if self.stats_window is None:
+            return
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, metrics.format_table())
+        self.stats_timer = self.root.after(1000, self.refresh_stats_panel)
+    
+    def close_stats_panel(self):
+        if self.stats_timer is not None:
+            self.root.after_cancel(self.stats_timer)
+            self.stats_timer = None
+        if self.stats_window is not None:
+            self.stats_window.destroy()
+            self.stats_window = None
+    
+    def on_filter_selected(self, event=None):
+        self.set_filter(self.filter_var.get())
+        print(f"Position filter: {self.filter_var.get()}")
+    
+    def start_data_collection(self):
+        self.begin_collection(self.label_var.get(), self.type_var.get())
+        self.start_collection_btn.config(state=tk.DISABLED)
+        self.stop_collection_btn.config(state=tk.NORMAL)
+        
+        # For static collection, auto-stop after specified duration
+        if self.collection_type == "static":
+            try:
+                duration = int(self.duration_var.get())
+                # Scheduled on the Tk loop so the stop handler runs on the GUI thread
+                self.collection_timer = self.root.after(duration * 1000, self.stop_data_collection)
+                messagebox.showinfo("Data Collection", f"Static collection started for {duration} seconds")
+            except ValueError:
+                messagebox.showerror("Error", "Invalid duration value")
+                self.stop_data_collection()
+        else:
+            messagebox.showinfo("Data Collection", "Dynamic collection started. Click 'Stop Collection' when finished.")
+    
+    def stop_data_collection(self):
+        if self.collection_timer is not None:
+            self.root.after_cancel(self.collection_timer)
+            self.collection_timer = None
+        if not self.data_collection_active:
+            return
+        label_count = self.end_collection()
+        self.start_collection_btn.config(state=tk.NORMAL)
+        self.stop_collection_btn.config(state=tk.DISABLED)
+        
+        self.update_stats_display()
+        
+        if self.collection_type == "static":
+            details = ""
+            for label in self.collection_labels():
+                stats = self.label_stats.get(label)
+                if stats:
+                    details += f"\n\n{label}: {format_stats(stats)}"
+            messagebox.showinfo("Collection Complete", f"Static data collection completed. Collected {label_count} points.{details}")
+
+    def quick_save(self):
+        """Quick save to Desktop with timestamp"""
+        if not self.collected_data:
+            messagebox.showwarning("No Data", "No data to save. Start collection first!")
+            return
+        
+        try:
+            desktop = os.path.join(os.path.expanduser("~"), "Desktop")
+            filename = os.path.join(desktop, f"marvelmind_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+            
+            result = messagebox.askyesno("Quick Save", f"Save data to Desktop?\n\n{filename}")
+            if result:
+                self.write_csv_file(filename)
+        except Exception as e:
+            messagebox.showerror("Quick Save Failed", f"Could not save to Desktop: {e}")
+
+    def save_data(self):
+        print(f"Save Data clicked. Collected data points: {len(self.collected_data)}")
+        
+        if not self.collected_data:
+            messagebox.showwarning("No Data", "No data to save. Start collection first!")
+            return
+        
+        try:
+            print("Attempting to open file dialog...")
+            
+            # Force the dialog to appear on top
+            self.root.lift()
+            self.root.attributes('-topmost', True)
+            
+            filename = filedialog.asksaveasfilename(
+                parent=self.root,
+                title="Save Marvelmind Data",
+                defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv"), ("Marvelmind session", f"*{SESSION_EXTENSION}"),
+                           ("All files", "*.*")],
+                initialname=f"marvelmind_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            )
+            
+            # Reset topmost
+            self.root.attributes('-topmost', False)
+            
+            print(f"Dialog returned: {repr(filename)}")
+            
+            if filename:
+                self.save_to_file(filename)
+            else:
+                print("No filename selected - trying fallback method")
+                self.save_data_fallback()
+                
+        except Exception as e:
+            print(f"Error with file dialog: {e}")
+            messagebox.showerror("Dialog Error", f"File dialog failed: {e}\nTrying fallback save method...")
+            self.save_data_fallback()
+
+    def save_to_file(self, filename):
+        """Save as a binary session for .mms names, CSV otherwise, on a background thread"""
+        if self.export_active:
+            messagebox.showwarning("Save In Progress", "Wait for the current save to finish")
+            return
+        try:
+            job = self.start_save(filename)
+        except Exception as e:
+            print(f"Error writing file: {e}")
+            messagebox.showerror("Write Error", f"Failed to write file: {e}")
+            return
+        self.show_job_progress(job, "Saving", f"Saving to:\n{filename}",
+                               lambda: messagebox.showinfo("Save Complete", f"Data saved to:\n{filename}"),
+                               "Write Error", "The save was cancelled; no file was written.")
+
+    def show_job_progress(self, job, title, text, on_success, error_title, cancelled_text):
+        """Progress dialog for an ExportJob; polled from the Tk loop so the GUI keeps running"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        ttk.Label(dialog, text=text).pack(padx=10, pady=(10, 5))
+        bar = ttk.Progressbar(dialog, length=320, maximum=100)
+        bar.pack(padx=10, pady=5)
+        percent_var = tk.StringVar(value="0%")
+        ttk.Label(dialog, textvariable=percent_var).pack()
+
+        def cancel():
+            job.cancel()
+            cancel_btn.config(state=tk.DISABLED)
+            percent_var.set("Cancelling...")
+
+        cancel_btn = ttk.Button(dialog, text="Cancel", command=cancel)
+        cancel_btn.pack(pady=(5, 10))
+        dialog.protocol("WM_DELETE_WINDOW", cancel)
+
+        def poll():
+            if not job.finished:
+                bar['value'] = job.fraction * 100
+                if str(cancel_btn['state']) != tk.DISABLED:
+                    percent_var.set(f"{job.fraction:.0%}")
+                self.root.after(100, poll)
+                return
+            dialog.destroy()
+            if job.error is not None:
+                messagebox.showerror(error_title, f"{error_title}: {job.error}")
+            elif job.cancelled:
+                messagebox.showinfo(f"{title} Cancelled", cancelled_text)
+            else:
+                on_success()
+
+        poll()
+
+    def load_data(self):
+        """Load a saved CSV or binary session into the collected data"""
+        if self.data_collection_active:
+            messagebox.showwarning("Collection Active", "Stop the current collection before loading data")
+            return
+        if self.export_active:
+            messagebox.showwarning("Save In Progress", "Wait for the current save to finish")
+            return
+        filename = filedialog.askopenfilename(
+            parent=self.root,
+            title="Load Marvelmind Data",
+            filetypes=[("Marvelmind data", f"*.csv *{SESSION_EXTENSION}"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        if self.collected_data and not messagebox.askyesno(
+                "Load Data", "Replace the current collected data with the loaded session?"):
+            return
+        try:
+            self.load(filename)
+            self.points_lod.invalidate()
+            self.data_count_var.set(f"Collected Points: {len(self.collected_data)}")
+            self.renderer.request_full_redraw()
+        except Exception as e:
+            print(f"Error loading file: {e}")
+            messagebox.showerror("Load Error", f"Failed to load file: {e}")
+
+    def open_playback(self):
+        """Open a saved session in a playback window; CSV sessions are converted to .mms once and cached"""
+        filename = filedialog.askopenfilename(
+            parent=self.root,
+            title="Play Back Session",
+            filetypes=[("Marvelmind data", f"*.csv *{SESSION_EXTENSION}"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        cache_dir = os.path.join(self.session_dir, "playback_cache")
+        if filename.lower().endswith(SESSION_EXTENSION) or os.path.exists(playback_cache_path(filename, cache_dir)):
+            self.show_playback(prepare_session(filename, cache_dir))
+            return
+        prepared = []
+        job = ExportJob(lambda progress: prepared.append(prepare_session(filename, cache_dir, progress)),
+                        name="playback-index").start()
+        self.show_job_progress(job, "Indexing", f"Preparing for playback:\n{filename}",
+                               lambda: self.show_playback(prepared[0]),
+                               "Playback Error", "Indexing was cancelled.")
+
+    def show_playback(self, path):
+        try:
+            PlaybackWindow(self.root, path)
+        except Exception as e:
+            print(f"Error opening playback: {e}")
+            messagebox.showerror("Playback Error", f"Failed to open session: {e}")
+
+    def write_csv_file(self, filename):
+        """Write data to CSV file"""
+        self.save_to_file(filename)
+
+    def save_data_fallback(self):
+        """Fallback save method - let user choose directory"""
+        try:
+            # Try to open a directory dialog instead
+            print("Trying directory dialog...")
+            
+            directory = filedialog.askdirectory(
+                parent=self.root,
+                title="Choose Directory to Save Data",
+                initialdir=os.path.expanduser("~/Desktop")  # Start at Desktop
+            )
+            
+            if directory:
+                filename = os.path.join(directory, f"marvelmind_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+                print(f"Saving to chosen directory: {filename}")
+                self.write_csv_file(filename)
+            else:
+                # If directory dialog also fails, use manual entry
+                print("Directory dialog failed, using manual entry")
+                self.save_data_manual_entry()
+                    
+        except Exception as e:
+            print(f"Directory dialog failed: {e}")
+            self.save_data_manual_entry()
+
+    def save_data_manual_entry(self):
+        """Manual filename entry if dialog fails"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Enter Filename")
+        dialog.geometry("500x150")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        ttk.Label(dialog, text="Enter full path and filename:").pack(pady=10)
+        
+        # Get current directory as default
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        default_filename = os.path.join(current_dir, f"marvelmind_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        
+        filename_var = tk.StringVar(value=default_filename)
+        entry = ttk.Entry(dialog, textvariable=filename_var, width=60)
+        entry.pack(pady=5, padx=10)
+        
+        def save_manual():
+            filename = filename_var.get()
+            if filename:
+                dialog.destroy()
+                self.save_to_file(filename)
+            else:
+                messagebox.showerror("Error", "Please enter a filename")
+        
+        def cancel_manual():
+            dialog.destroy()
+        
+        button_frame = ttk.Frame(dialog)
+        button_frame.pack(pady=10)
+        
+        ttk.Button(button_frame, text="Save", command=save_manual).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel", command=cancel_manual).pack(side=tk.LEFT, padx=5)
+        
+        entry.focus()
+        entry.select_range(0, tk.END)
+    
+    def clear_data(self):
+        if self.data_collection_active:
+            messagebox.showwarning("Collection Active", "Stop the current collection before clearing data")
+            return
+        if self.export_active:
+            messagebox.showwarning("Save In Progress", "Wait for the current save to finish")
+            return
+        if messagebox.askyesno("Clear Data", "Are you sure you want to clear all collected data?"):
+            self.clear()
+            self.points_lod.invalidate()
+            self.data_count_var.set("Collected Points: 0")
+            self.stats_var.set("")
+            self.renderer.request_full_redraw()
+
+def run_gui(session_dir=None, profile=False, publish_udp=None, publish_tcp=None, zones=None,
+            acquisition_process=False):
+    root = tk.Tk()
+    app = MarvelmindTracker(root, session_dir=session_dir, acquisition_process=acquisition_process)
+    if zones:
+        app.load_zones(zones)
+    if profile:
+        app.enable_profiling()
+    if publish_udp or publish_tcp:
+        app.start_publisher(udp=publish_udp, tcp=publish_tcp)
+    
+    # Handle window close button (X)
+    def on_closing():
+        app.cleanup_and_exit()
+    
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    
+    try:
+        root.mainloop()
+    except KeyboardInterrupt:
+        app.cleanup_and_exit()
@@ -0,0 +1,338 @@
+"""User-defined zones with a grid index and entry/exit/dwell events.
+
+Zones are loaded from a JSON file::
+
+    {
+      "cell_size": 0.5,
+      "dwell_seconds": 5.0,
+      "zones": [
+        {"name": "Kitchen", "rect": [0.0, 0.0, 4.0, 3.0]},
+        {"name": "Hall", "polygon": [[4.0, 0.0], [9.0, 0.0], [9.0, 2.0], [4.0, 2.0]]}
+      ]
+    }
+
+``rect`` is [xmin, ymin, xmax, ymax]; ``polygon`` lists the vertices in
+order. ``cell_size`` and ``dwell_seconds`` are optional. Where zones
+overlap, a sample is labelled with the one listed first.
+
+Relabel a saved session by zone and write its events:
+
+    python zones.py zones.json run1.mms run1_zoned.csv
+"""
+
+import argparse
+import collections
+import csv
+import json
+import math
+import os
+
+import numpy as np
+
+from recorder import format_datetimes
+
+EVENT_FIELDNAMES = ['timestamp', 'datetime', 'event', 'zone', 'device', 'duration_s']
+
+# One zone event; duration is the time inside the zone for 'exit' and 'dwell', else 0
+ZoneEvent = collections.namedtuple('ZoneEvent', 'timestamp kind zone device duration')
+
+
+class ZoneError(Exception):
+    pass
+
+
+class Zone:
+    """A named polygon; rectangles are stored as four-vertex polygons"""
+
+    def __init__(self, name, vertices):
+        try:
+            vertices = np.asarray(vertices, dtype=np.float64)
+        except (TypeError, ValueError):
+            vertices = np.empty((0, 2))
+        if (vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3
+                or not np.isfinite(vertices).all()):
+            raise ZoneError(f"zone {name!r}: a polygon needs at least three [x, y] vertices")
+        self.name = name
+        self.vertices = vertices
+        self.bounds = (float(vertices[:, 0].min()), float(vertices[:, 1].min()),
+                       float(vertices[:, 0].max()), float(vertices[:, 1].max()))
+        # (x1, y1, x2, y2) per edge as plain floats for the per-sample test
+        closed = np.vstack([vertices, vertices[:1]])
+        self._edges = [tuple(edge) for edge in np.hstack([closed[:-1], closed[1:]]).tolist()]
+
+    @classmethod
+    def rectangle(cls, name, xmin, ymin, xmax, ymax):
+        if not (xmin < xmax and ymin < ymax):
+            raise ZoneError(f"zone {name!r}: rect must be [xmin, ymin, xmax, ymax]")
+        return cls(name, [(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)])
+
+    def contains(self, x, y):
+        """Even-odd point-in-polygon test"""
+        inside = False
+        for x1, y1, x2, y2 in self._edges:
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def contains_many(self, x, y):
+        """Vectorized :meth:`contains` over arrays of points"""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        inside = np.zeros(x.shape, dtype=bool)
+        for x1, y1, x2, y2 in self._edges:
+            if y1 == y2:
+                continue
+            crosses = (y1 > y) != (y2 > y)
+            inside ^= crosses & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+        return inside
+
+
+class ZoneIndex:
+    """Uniform grid over the zones for constant-time point lookups.
+
+    Every cell of ``cell_size`` meters lists the zones that cover it
+    completely and the zones whose boundary passes through it. A lookup
+    reads one cell: covering zones match outright and only boundary zones
+    need a point-in-polygon test, so the cost depends on how many zones
+    meet at that spot rather than on how many there are.
+    """
+
+    def __init__(self, zones, cell_size=None):
+        self.zones = list(zones)
+        names = [zone.name for zone in self.zones]
+        if len(set(names)) != len(names):
+            raise ZoneError("zone names must be unique")
+        self.cell_size = float(cell_size) if cell_size else self.default_cell_size(self.zones)
+        if self.cell_size <= 0:
+            raise ZoneError("cell_size must be positive")
+        self._cells = {}    # (col, row) -> (covering zone indices, boundary zone indices)
+        covering = collections.defaultdict(list)
+        boundary = collections.defaultdict(list)
+        for i, zone in enumerate(self.zones):
+            cells, on_edge = self._rasterize(zone)
+            for cell, edge in zip(cells, on_edge):
+                (boundary if edge else covering)[cell].append(i)
+        for cell in covering.keys() | boundary.keys():
+            self._cells[cell] = (tuple(covering.get(cell, ())), tuple(boundary.get(cell, ())))
+
+    @staticmethod
+    def default_cell_size(zones):
+        """Half the median of the zones' shorter sides, within 0.1 .. 5 m"""
+        if not zones:
+            return 1.0
+        sides = [min(zone.bounds[2] - zone.bounds[0], zone.bounds[3] - zone.bounds[1]) for zone in zones]
+        return min(max(float(np.median(sides)) / 2, 0.1), 5.0)
+
+    def _rasterize(self, zone):
+        """Cells a zone touches, and for each whether its boundary crosses it"""
+        size = self.cell_size
+        xmin, ymin, xmax, ymax = zone.bounds
+        col0, row0 = math.floor(xmin / size), math.floor(ymin / size)
+        cols = math.floor(xmax / size) - col0 + 1
+        rows = math.floor(ymax / size) - row0 + 1
+        edge = np.zeros((rows, cols), dtype=bool)
+        for x1, y1, x2, y2 in zone._edges:
+            # Within the edge's bounding box the line and the segment coincide, so a
+            # cell is crossed when the line separates (or touches) its corners
+            c_lo, c_hi = sorted((math.floor(x1 / size), math.floor(x2 / size)))
+            r_lo, r_hi = sorted((math.floor(y1 / size), math.floor(y2 / size)))
+            cx = np.arange(c_lo, c_hi + 2) * size
+            cy = np.arange(r_lo, r_hi + 2) * size
+            side = (x2 - x1) * (cy[:, None] - y1) - (y2 - y1) * (cx[None, :] - x1)
+            corners = np.stack([side[:-1, :-1], side[:-1, 1:], side[1:, :-1], side[1:, 1:]])
+            crossed = (corners.min(axis=0) <= 0) & (corners.max(axis=0) >= 0)
+            edge[r_lo - row0:r_hi - row0 + 1, c_lo - col0:c_hi - col0 + 1] |= crossed
+        # Cells the boundary misses are wholly inside or wholly outside: test their centres
+        centre_x = (np.arange(cols) + col0 + 0.5) * size
+        centre_y = (np.arange(rows) + row0 + 0.5) * size
+        inside = zone.contains_many(*np.meshgrid(centre_x, centre_y))
+        keep_rows, keep_cols = np.nonzero(edge | inside)
+        cells = list(zip((keep_cols + col0).tolist(), (keep_rows + row0).tolist()))
+        return cells, edge[keep_rows, keep_cols].tolist()
+
+    def lookup(self, x, y):
+        """Indices of the zones containing (x, y), in file order"""
+        entry = self._cells.get((math.floor(x / self.cell_size), math.floor(y / self.cell_size)))
+        if entry is None:
+            return ()
+        covering, boundary = entry
+        if not boundary:
+            return covering
+        zones = self.zones
+        hits = tuple(i for i in boundary if zones[i].contains(x, y))
+        if not hits:
+            return covering
+        return tuple(sorted(covering + hits)) if covering else hits
+
+    def __len__(self):
+        return len(self.zones)
+
+
+class ZoneTracker:
+    """Follows each device through the zones, collecting entry, exit and dwell events.
+
+    Samples are labelled from the zone they fall in right now. Events are
+    debounced: a membership change only counts once it has held for
+    ``debounce`` seconds, so a hedgehog standing on a boundary does not
+    flicker in and out with position noise, and the event is then dated
+    from when the change first appeared. A 'dwell' event fires once per
+    visit after ``dwell_seconds`` inside the zone.
+    """
+
+    def __init__(self, index, dwell_seconds=5.0, debounce=0.3):
+        self.index = index
+        self.dwell_seconds = dwell_seconds
+        self.debounce = debounce
+        self.events = []
+        self._devices = {}   # device -> (inside {zone: entered}, pending {zone: since}, dwelled set)
+
+    def reset(self):
+        """Forget events and where devices are"""
+        self.events = []
+        self._devices = {}
+
+    def update(self, timestamp, x, y, device=""):
+        """Feed one sample; returns the name of the zone it lies in, '' outside every zone"""
+        current = self.index.lookup(x, y)
+        state = self._devices.get(device)
+        if state is None:
+            state = self._devices[device] = ({}, {}, set())
+        inside, pending, dwelled = state
+        zones = self.index.zones
+
+        if pending or len(current) != len(inside) or any(zone not in inside for zone in current):
+            for zone in set(current).symmetric_difference(inside):
+                since = pending.setdefault(zone, timestamp)
+                if timestamp - since < self.debounce:
+                    continue
+                del pending[zone]
+                if zone in inside:
+                    entered = inside.pop(zone)
+                    dwelled.discard(zone)
+                    self.events.append(ZoneEvent(since, 'exit', zones[zone].name, device, since - entered))
+                else:
+                    inside[zone] = since
+                    self.events.append(ZoneEvent(since, 'enter', zones[zone].name, device, 0.0))
+            for zone in [zone for zone in pending if (zone in current) == (zone in inside)]:
+                del pending[zone]
+
+        for zone, entered in inside.items():
+            if zone not in dwelled and zone not in pending and timestamp - entered >= self.dwell_seconds:
+                dwelled.add(zone)
+                self.events.append(ZoneEvent(timestamp, 'dwell', zones[zone].name, device, timestamp - entered))
+        return zones[min(current)].name if current else ""
+
+    def current_zones(self):
+        """{device: [zone names]} as of the latest samples"""
+        zones = self.index.zones
+        return {device: [zones[zone].name for zone in sorted(state[0])]
+                for device, state in list(self._devices.items())}
+
+    def counters(self):
+        counts = collections.Counter(event.kind for event in self.events)
+        return {'zones': len(self.index), 'enter': counts['enter'], 'exit': counts['exit'],
+                'dwell': counts['dwell']}
+
+
+def load_zones(path, dwell_seconds=None, debounce=0.3):
+    """Read a zones JSON file (see the module docstring) into a ZoneTracker"""
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            spec = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ZoneError(f"{path}: {e}")
+    if isinstance(spec, list):
+        spec = {'zones': spec}
+    zones = []
+    for i, item in enumerate(spec.get('zones', [])):
+        if not isinstance(item, dict):
+            raise ZoneError(f"{path}: zone {i + 1} must be an object with a name and a rect or polygon")
+        name = str(item.get('name') or f"Zone_{i + 1}")
+        try:
+            if 'rect' in item:
+                try:
+                    xmin, ymin, xmax, ymax = (float(value) for value in item['rect'])
+                except (TypeError, ValueError):
+                    raise ZoneError(f"zone {name!r}: rect must be [xmin, ymin, xmax, ymax]")
+                zones.append(Zone.rectangle(name, xmin, ymin, xmax, ymax))
+            elif 'polygon' in item:
+                zones.append(Zone(name, item['polygon']))
+            else:
+                raise ZoneError(f"zone {name!r} needs a 'rect' or a 'polygon'")
+        except ZoneError as e:
+            raise ZoneError(f"{path}: {e}")
+    if not zones:
+        raise ZoneError(f"{path}: no zones defined")
+    index = ZoneIndex(zones, spec.get('cell_size'))
+    dwell = dwell_seconds if dwell_seconds is not None else float(spec.get('dwell_seconds', 5.0))
+    return ZoneTracker(index, dwell_seconds=dwell, debounce=debounce)
+
+
+def zone_events_path(data_path):
+    """Events file written next to a data file: run1.csv -> run1_zones.csv"""
+    return f"{os.path.splitext(data_path)[0]}_zones.csv"
+
+
+def write_events(path, events):
+    """Write ZoneEvents to CSV in EVENT_FIELDNAMES order, sorted by time"""
+    # Debounced entries and exits are recorded late but dated from the change itself
+    events = sorted(events, key=lambda event: event.timestamp)
+    dates = format_datetimes([event.timestamp for event in events])
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(EVENT_FIELDNAMES)
+        writer.writerows((event.timestamp, date, event.kind, event.zone, event.device, event.duration)
+                         for event, date in zip(events, dates))
+
+
+def label_session(store, tracker):
+    """Replay a SampleStore through ``tracker``; returns a new store labelled by zone.
+
+    Samples outside every zone keep their original label.
+    """
+    from sample_store import SampleStore
+
+    result = SampleStore(initial_capacity=max(len(store), 1), keep_raw=store.has_raw,
+                         keep_clock=store.has_clock)
+    columns = store.snapshot()
+    names = ['timestamp', 'x', 'y', 'z'] + list(store.extra_columns())
+    values = [columns[name].tolist() for name in names]
+    labels, devices = columns['labels'], columns['devices']
+    types = SampleStore.TYPES
+    raw_slice = slice(4, 7) if store.has_raw else slice(0, 0)
+    clock_slice = slice(4 + 3 * store.has_raw, 6 + 3 * store.has_raw) if store.has_clock else slice(0, 0)
+    for row, label_code, type_code, device_code in zip(zip(*values), columns['label_codes'].tolist(),
+                                                        columns['type_codes'].tolist(),
+                                                        columns['device_codes'].tolist()):
+        timestamp, x, y, z = row[:4]
+        device = devices[device_code]
+        label = tracker.update(timestamp, x, y, device) or labels[label_code]
+        result.append(timestamp, x, y, z, label, types[type_code], device,
+                      row[raw_slice] or None, row[clock_slice] or None)
+    return result
+
+
+def main(argv=None):
+    from session_format import load_any, save_any
+
+    parser = argparse.ArgumentParser(description="Label a saved Marvelmind session by zone")
+    parser.add_argument('zones', help="zones JSON file")
+    parser.add_argument('input', help=".csv or .mms session")
+    parser.add_argument('output', help=".csv or .mms file to write; events go to <output>_zones.csv")
+    parser.add_argument('--dwell', type=float, default=None, help="dwell time in seconds (default: from file, else 5)")
+    parser.add_argument('--debounce', type=float, default=0.3,
+                        help="seconds a zone change must hold before it counts (default: 0.3)")
+    args = parser.parse_args(argv)
+
+    tracker = load_zones(args.zones, args.dwell, args.debounce)
+    store = load_any(args.input)
+    result = label_session(store, tracker)
+    save_any(args.output, result)
+    write_events(zone_events_path(args.output), tracker.events)
+    counts = tracker.counters()
+    print(f"Labelled {len(result)} samples; {counts['enter']} entries, {counts['exit']} exits, "
+          f"{counts['dwell']} dwells in {counts['zones']} zones; wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()